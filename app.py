@@ -1,54 +1,341 @@
-from flask import Flask, request, jsonify
+import time
+IMPORT_STARTED = time.perf_counter()   # cold-start measurement, reported by /ready
+from flask import Flask, Blueprint, current_app, request, jsonify, Response, stream_with_context, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
 from dotenv import load_dotenv
-from datetime import datetime, timezone
-import os, json, hashlib
+from datetime import datetime, timezone, timedelta
+import os, json, hashlib, threading, time, functools, asyncio, logging, random, re, itertools, socket, tempfile
+import click
+from flask.helpers import get_debug_flag
+from werkzeug.serving import is_running_from_reloader
 from flask_cors import CORS
-from web3 import Web3
+from hexbytes import HexBytes
+from web3.logs import DISCARD
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects import postgresql, sqlite
+import merkle
+import nonce_manager
+import chain_client
+import metrics
+import payload_codec
+import provenance_archive
+import provenance_export
+import provenance_capture
+import hash_pool
+import hash_codec
+import blob_store
+import live_feed
+from hash_pool import canonical_hash
+try:
+    import fcntl
+except ImportError:   # Windows: no cross-process guard for the background threads
+    fcntl = None
 
-def iso_utc(dt: datetime | None) -> str | None:
+def as_utc(dt: datetime | None) -> datetime | None:
     if dt is None:
         return None
-    # mark UTC (or convert to UTC) and serialize with trailing Z
+    # mark UTC (or convert to UTC)
     if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    else:
-        dt = dt.astimezone(timezone.utc)
-    return dt.isoformat().replace("+00:00", "Z")
-
-# Connect to local Ethereum node (Hardhat or Ganache)
-w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
-
-# Address of your deployed contract
-CONTRACT_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
-
-# Your ABI (from artifacts/contracts/Provenance.sol/Provenance.json)
-import json
-with open("blockchain/artifacts/contracts/Provenance.sol/Provenance.json") as f:
-    contract_json = json.load(f)
-    abi = contract_json["abi"]
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
 
-contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=abi)
-w3.eth.default_account = w3.eth.accounts[0]
+def iso_utc(dt: datetime | None) -> str | None:
+    if dt is None:
+        return None
+    # serialize UTC with trailing Z
+    return as_utc(dt).isoformat().replace("+00:00", "Z")
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+# Local Ethereum node (Hardhat or Ganache); nothing connects to it before first use
+RPC_URL = os.getenv('RPC_URL', "http://127.0.0.1:8545")
+
+# Address of your deployed contract
+CONTRACT_ADDRESS = os.getenv('CONTRACT_ADDRESS', "0x5FbDB2315678afecb367f032d93F642f64180aa3")
+
+# Your ABI (from artifacts/contracts/Provenance.sol/Provenance.json), cached
+# pre-parsed in CONTRACT_ABI_CACHE (see chain_client.py)
+CONTRACT_ARTIFACT = os.getenv('CONTRACT_ARTIFACT', "blockchain/artifacts/contracts/Provenance.sol/Provenance.json")
+CONTRACT_ABI_CACHE = os.getenv('CONTRACT_ABI_CACHE', CONTRACT_ARTIFACT.removesuffix(".json") + ".abi.pickle")
 
-CORS(app)
+# After moving to ProvenanceV2.sol (bytes32 hashes, CONTRACT_ARTIFACT pointing
+# at ProvenanceV2.json): the address of the Provenance.sol contract used so
+# far. Records whose last anchor is there keep verifying against it, and its
+# RecordLogged events are still indexed. Empty: a single contract.
+CONTRACT_LEGACY_ADDRESS = os.getenv('CONTRACT_LEGACY_ADDRESS', '')
+CONTRACT_LEGACY_ARTIFACT = os.getenv('CONTRACT_LEGACY_ARTIFACT', "blockchain/artifacts/contracts/Provenance.sol/Provenance.json")
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = (
+DATABASE_URI = (
     f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
     f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 )
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'connect_args': {'options': '-c timezone=utc'}
-}   
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+# Connection pools (per process and engine; the replicas get their own pool)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv('DB_POOL_RECYCLE_SECONDS', '1800'))
+DB_REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', str(DB_POOL_SIZE)))
+
+# Read replicas: DB_REPLICA_HOSTS=host[:port],... (same user, password and
+# database as the primary) or full DATABASE_REPLICA_URIS=uri,... Read-only
+# endpoints (listings, search, history, verification reads, export) query a
+# replica chosen per request; writes always go to the primary, and so does
+# everything a request reads after its first write. A client that wrote is
+# served from the primary for READ_REPLICA_STICKY_SECONDS afterwards (cookie),
+# so it reads its own writes despite replication lag.
+DATABASE_REPLICA_URIS = [u.strip() for u in os.getenv('DATABASE_REPLICA_URIS', '').split(',') if u.strip()] or [
+    f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
+    f"{host if ':' in host else host + ':' + str(os.getenv('DB_PORT'))}/{os.getenv('DB_NAME')}"
+    for host in (h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',')) if host
+]
+READ_REPLICA_STICKY_SECONDS = float(os.getenv('READ_REPLICA_STICKY_SECONDS', '5'))
+READ_REPLICA_STICKY_COOKIE = 'provenance_primary_until'
+
+# WARMUP=1: create the schema, load the ABI and connect to the node in a
+# background readiness phase right after startup instead of on first use
+WARMUP = os.getenv('WARMUP', '0') == '1'
+
+# Anchoring configuration
+#   ANCHOR_MODE=sync  -> send logAction() inside the request (default)
+#   ANCHOR_MODE=async -> commit the provenance row as 'pending' and let the
+#                        outbox workers anchor it in the background
+#   ANCHOR_MODE=merkle -> like async, but the workers collect pending hashes
+#                        into Merkle batches (ANCHOR_MERKLE_SIZE rows or
+#                        ANCHOR_MERKLE_WINDOW_SECONDS, whichever comes first)
+#                        and anchor only the root with anchorBatch()
+# Rows that fail to anchor in either mode stay in the outbox and are retried
+# with exponential backoff until ANCHOR_MAX_ATTEMPTS is reached.
+ANCHOR_MODE = os.getenv('ANCHOR_MODE', 'sync')
+ANCHOR_WORKERS = int(os.getenv('ANCHOR_WORKERS', '2'))
+ANCHOR_BATCH_SIZE = int(os.getenv('ANCHOR_BATCH_SIZE', '20'))
+ANCHOR_POLL_SECONDS = float(os.getenv('ANCHOR_POLL_SECONDS', '1'))
+ANCHOR_LEASE_SECONDS = float(os.getenv('ANCHOR_LEASE_SECONDS', '120'))
+ANCHOR_MAX_ATTEMPTS = int(os.getenv('ANCHOR_MAX_ATTEMPTS', '10'))
+ANCHOR_BACKOFF_SECONDS = float(os.getenv('ANCHOR_BACKOFF_SECONDS', '2'))
+ANCHOR_BACKOFF_MAX_SECONDS = float(os.getenv('ANCHOR_BACKOFF_MAX_SECONDS', '600'))
+ANCHOR_MERKLE_SIZE = int(os.getenv('ANCHOR_MERKLE_SIZE', '1024'))
+ANCHOR_MERKLE_WINDOW_SECONDS = float(os.getenv('ANCHOR_MERKLE_WINDOW_SECONDS', '10'))
+
+# Background threads (outbox workers, event indexer, tamper sweeper)
+#   BACKGROUND_WORKERS=1 -> create_app() starts them in the serving process;
+#                           of several server processes on one host only the
+#                           one holding BACKGROUND_LOCK_FILE runs them
+#   BACKGROUND_WORKERS=0 -> run them as a separate process (flask --app app workers)
+# Never started for CLI commands or in the debug reloader's watcher process.
+# /ready fails while no outbox worker, in this or another process, has
+# checked in within WORKER_HEARTBEAT_STALE_SECONDS.
+BACKGROUND_WORKERS = os.getenv('BACKGROUND_WORKERS', '1') == '1'
+BACKGROUND_LOCK_FILE = os.getenv('BACKGROUND_LOCK_FILE', '')   # default: per database, in the temp dir
+WORKER_HEARTBEAT_SECONDS = float(os.getenv('WORKER_HEARTBEAT_SECONDS', '10'))
+WORKER_HEARTBEAT_STALE_SECONDS = float(os.getenv('WORKER_HEARTBEAT_STALE_SECONDS', '60'))
+
+# upper bound on items accepted by one /add_bulk, /update_bulk or /delete_bulk call
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '5000'))
+
+# Per-record hash chaining: every new entry also commits to the hash of the
+# record's previous entry, so a whole history verifies locally in one pass
+# and only the chain head needs an on-chain comparison.
+PROVENANCE_HASH_CHAIN = os.getenv('PROVENANCE_HASH_CHAIN', '0') == '1'
+# /verify_bulk: max records per request and ids per contract read
+VERIFY_BULK_MAX = int(os.getenv('VERIFY_BULK_MAX', '5000'))
+VERIFY_BULK_RPC_CHUNK = int(os.getenv('VERIFY_BULK_RPC_CHUNK', '500'))
+# /records: largest page for ?limit= and rows fetched per server-side cursor batch when streaming
+RECORDS_MAX_LIMIT = int(os.getenv('RECORDS_MAX_LIMIT', '1000'))
+RECORDS_STREAM_BATCH = int(os.getenv('RECORDS_STREAM_BATCH', '1000'))
+
+# RecordLogged event indexer (local copy of the chain history for /history)
+INDEXER_CHECKPOINT_NAME = 'RecordLogged'
+INDEXER_START_BLOCK = int(os.getenv('INDEXER_START_BLOCK', '0'))        # contract deployment block
+INDEXER_CHUNK_BLOCKS = int(os.getenv('INDEXER_CHUNK_BLOCKS', '2000'))   # blocks per eth_getLogs call
+INDEXER_CONFIRMATIONS = int(os.getenv('INDEXER_CONFIRMATIONS', '0'))    # stay this far behind the head
+INDEXER_POLL_SECONDS = float(os.getenv('INDEXER_POLL_SECONDS', '2'))
+BLOCK_TIMESTAMP_CACHE_SIZE = int(os.getenv('BLOCK_TIMESTAMP_CACHE_SIZE', '100000'))
+# cache for contract view calls (getRecordHash, getBatchRoot, ...); 0 disables it.
+# Entries stay valid until a newer block shows up (head polled at most every
+# CHAIN_CACHE_HEAD_CHECK_SECONDS) or, with the event indexer running, until a
+# RecordLogged event touches the same record.
+CHAIN_CACHE_SIZE = int(os.getenv('CHAIN_CACHE_SIZE', '10000'))
+CHAIN_CACHE_HEAD_CHECK_SECONDS = float(os.getenv('CHAIN_CACHE_HEAD_CHECK_SECONDS', '1'))
+# shared async RPC client (see rpc_client.py): independent calls of one
+# request run concurrently over a keep-alive pool of RPC_POOL_SIZE connections,
+# at most RPC_MAX_IN_FLIGHT at a time
+RPC_MAX_IN_FLIGHT = int(os.getenv('RPC_MAX_IN_FLIGHT', '16'))
+RPC_POOL_SIZE = int(os.getenv('RPC_POOL_SIZE', '32'))
+RPC_TIMEOUT_SECONDS = float(os.getenv('RPC_TIMEOUT_SECONDS', '30'))
+# Transaction senders (node-unlocked accounts, comma separated; default: the
+# node's first account). Nonces are allocated locally per sender (see
+# nonce_manager.py), so the outbox workers keep many logAction transactions in
+# flight and confirm them later; a sent row whose receipt has not shown up
+# after ANCHOR_RECEIPT_TIMEOUT_SECONDS is checked for being dropped/replaced
+# and sent again.
+ANCHOR_SENDERS = [a.strip() for a in os.getenv('ANCHOR_SENDERS', '').split(',') if a.strip()]
+ANCHOR_RECEIPT_TIMEOUT_SECONDS = float(os.getenv('ANCHOR_RECEIPT_TIMEOUT_SECONDS', '120'))
+# ANCHOR_LOCAL_NONCES=0 lets the node assign nonces again. The default (auto)
+# does that on SQLite only: its single writer lock, held by the request that
+# anchors, would block the separate nonce transaction.
+ANCHOR_LOCAL_NONCES = os.getenv('ANCHOR_LOCAL_NONCES', 'auto')
+# "nonce too high": an earlier nonce (e.g. from another process) is still on its way to the node, try again
+NONCE_GAP_RETRIES = int(os.getenv('NONCE_GAP_RETRIES', '5'))
+NONCE_GAP_RETRY_SECONDS = float(os.getenv('NONCE_GAP_RETRY_SECONDS', '0.2'))
+# Structured logging: a PROVENANCE_LOG_SAMPLE_RATE share of new provenance
+# entries is logged as one JSON line on the "provenance" logger (0 = off, 1 = all)
+PROVENANCE_LOG_SAMPLE_RATE = float(os.getenv('PROVENANCE_LOG_SAMPLE_RATE', '0.01'))
+PROVENANCE_LOG_LEVEL = os.getenv('PROVENANCE_LOG_LEVEL', 'INFO')
+# worker warnings, startup timings and other operational messages (logger "provenance.app")
+APP_LOG_LEVEL = os.getenv('APP_LOG_LEVEL', 'INFO')
+# Payload storage (see payload_codec.py). PROVENANCE_PAYLOAD_ENCODING=diff
+# stores UPDATE/DELETE payloads as field-level diffs against the record's
+# previous entry, with a full snapshot every PROVENANCE_SNAPSHOT_EVERY entries;
+# json (default) keeps full old/new snapshots. Either way the hash covers the
+# full payload. `flask --app app compact-payloads` compresses rows older than
+# PROVENANCE_COMPRESS_AFTER_DAYS.
+PROVENANCE_PAYLOAD_ENCODING = os.getenv('PROVENANCE_PAYLOAD_ENCODING', 'json')
+PROVENANCE_SNAPSHOT_EVERY = int(os.getenv('PROVENANCE_SNAPSHOT_EVERY', '16'))
+PROVENANCE_COMPRESS_AFTER_DAYS = float(os.getenv('PROVENANCE_COMPRESS_AFTER_DAYS', '30'))
+# Cold storage (see provenance_archive.py): `flask --app app archive-provenance`
+# moves settled provenance rows of whole months into immutable segment files
+# in ARCHIVE_DIR and anchors each file's SHA-256; /verify and /history read
+# archived entries transparently. On PostgreSQL `partition-provenance-log`
+# splits provenance_log into monthly range partitions (created
+# PARTITION_MONTHS_AHEAD months in advance), so archiving a month drops its
+# partition instead of deleting rows.
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+# Provenance export (/export, `flask --app app export-provenance`): rows per
+# server-side cursor batch (= per output flush / resume checkpoint), and
+# decoded payloads kept around to decode diff-encoded rows
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '5000'))
+EXPORT_PAYLOAD_MEMO = int(os.getenv('EXPORT_PAYLOAD_MEMO', '100000'))
+# /provenance/search ?count=1 and ?group_by= read at most this many matching
+# rows; larger counts are planner estimates on PostgreSQL (lower bounds
+# elsewhere) and groups cover the newest SEARCH_COUNT_LIMIT matches
+SEARCH_COUNT_LIMIT = int(os.getenv('SEARCH_COUNT_LIMIT', '100000'))
+# Tamper sweep: re-verifies every row of the captured tables against its
+# latest provenance entry and the chain, in chunks of TAMPER_SWEEP_CHUNK rows
+# decoded and hashed by TAMPER_SWEEP_WORKERS processes (default: one per
+# core). The background
+# sweeper runs an incremental pass (only records with provenance entries
+# newer than the last pass, plus open findings) every
+# TAMPER_SWEEP_INTERVAL_SECONDS (0 = off) and a full pass every
+# TAMPER_SWEEP_FULL_HOURS; edits that bypass provenance (like /tamper) leave
+# no change marker and are found by the full pass.
+TAMPER_SWEEP_CHUNK = int(os.getenv('TAMPER_SWEEP_CHUNK', '5000'))
+TAMPER_SWEEP_WORKERS = int(os.getenv('TAMPER_SWEEP_WORKERS', str(os.cpu_count() or 1)))
+TAMPER_SWEEP_INTERVAL_SECONDS = float(os.getenv('TAMPER_SWEEP_INTERVAL_SECONDS', '3600'))
+TAMPER_SWEEP_FULL_HOURS = float(os.getenv('TAMPER_SWEEP_FULL_HOURS', '24'))
+TAMPER_SWEEP_LEASE_SECONDS = float(os.getenv('TAMPER_SWEEP_LEASE_SECONDS', '300'))
+
+# Point-in-time reads (/records?as_of=, /records/<id>?as_of=) replay only the
+# entries after the nearest materialized checkpoint. The anchor workers take a
+# new checkpoint once PROVENANCE_CHECKPOINT_EVERY entries were written since
+# the last one (0: only `flask --app app checkpoint-records`); checkpoints stay
+# PROVENANCE_CHECKPOINT_SETTLE_SECONDS behind now, so transactions still in
+# flight are not missed.
+PROVENANCE_CHECKPOINT_EVERY = int(os.getenv('PROVENANCE_CHECKPOINT_EVERY', '100000'))
+PROVENANCE_CHECKPOINT_SETTLE_SECONDS = float(os.getenv('PROVENANCE_CHECKPOINT_SETTLE_SECONDS', '60'))
+
+# Blob-backed records (/blobs, see blob_store.py): uploads are streamed into
+# BLOB_CHUNK_BYTES chunks stored once per SHA-256 under BLOB_DIR; a blob's
+# provenance entries hold only its content digest and size. BLOB_MAX_BYTES
+# caps a single upload (0: no limit).
+BLOB_DIR = os.getenv('BLOB_DIR', 'blobs')
+BLOB_CHUNK_BYTES = int(os.getenv('BLOB_CHUNK_BYTES', str(blob_store.CHUNK_SIZE)))
+BLOB_MAX_BYTES = int(os.getenv('BLOB_MAX_BYTES', '0'))
+
+# Live feed (GET /live, Server-Sent Events, see live_feed.py): new provenance
+# entries and their anchoring / verification status changes, pushed as they
+# commit. On PostgreSQL (LIVE_FEED_NOTIFY=auto) writers NOTIFY
+# LIVE_FEED_CHANNEL and every process serving /live LISTENs on it, so clients
+# see the writes of all workers; otherwise only those of their own process.
+# A client that falls more than LIVE_FEED_QUEUE events behind catches up from
+# the database; a resume replays at most LIVE_FEED_REPLAY_MAX entries before
+# the client is told to reload instead.
+LIVE_FEED_NOTIFY = os.getenv('LIVE_FEED_NOTIFY', 'auto')
+LIVE_FEED_CHANNEL = os.getenv('LIVE_FEED_CHANNEL', 'provenance_live')
+LIVE_FEED_QUEUE = int(os.getenv('LIVE_FEED_QUEUE', '1000'))
+LIVE_FEED_REPLAY_MAX = int(os.getenv('LIVE_FEED_REPLAY_MAX', '10000'))
+LIVE_FEED_HEARTBEAT_SECONDS = float(os.getenv('LIVE_FEED_HEARTBEAT_SECONDS', '15'))
+
+class RoutingSession(FlaskSession):
+    """
+    Session that sends the reads of a read-only request to the replica bind
+    named in session.info["replica"] (see read_replica()). Flushes, DML
+    statements and SELECT ... FOR UPDATE go to the primary and mark the
+    session as written; from then on all of its reads use the primary too.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if replica is not None and bind is None:
+            writes = self._flushing or getattr(clause, "is_dml", False) or getattr(clause, "_for_update_arg", None) is not None
+            if writes:
+                self.info["wrote"] = True
+            elif not self.info.get("wrote") and (mapper is not None or clause is not None):
+                return self._db.engines[replica]
+        elif self._flushing:
+            self.info["wrote"] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+bp = Blueprint('provenance', __name__, cli_group=None)
+
+# -------------------------------
+# Metrics (GET /metrics) and sampled logging
+# Per-process counters and histograms in Prometheus text format (see
+# metrics.py); cheap enough to stay on under full load.
+# -------------------------------
+registry = metrics.Registry()
+REQUEST_SECONDS = registry.histogram('provenance_request_seconds', 'HTTP request latency', ('endpoint', 'method', 'status'))
+STAGE_SECONDS = registry.histogram('provenance_stage_seconds', 'Time spent per stage of a request or worker pass', ('endpoint', 'stage'))
+ANCHORED = registry.counter('provenance_anchored_total', 'Provenance rows and Merkle batches anchored on-chain', ('kind',))
+ANCHOR_FAILURES = registry.counter('provenance_anchor_failures_total', 'Failed anchoring attempts (outcome: retry or gave_up)', ('kind', 'outcome'))
+VERIFICATIONS = registry.counter('provenance_verifications_total', 'Verification outcomes by reason', ('verified', 'reason'))
+RPC_SECONDS = registry.histogram('provenance_rpc_seconds', 'Latency of calls through the async RPC client')
+RPC_ERRORS = registry.counter('provenance_rpc_errors_total', 'Failed RPC calls by error type', ('error',))
+OUTBOX_ROWS = registry.gauge('provenance_outbox_rows', 'Provenance rows per open anchor_status (settled rows: provenance_anchored_total)', ('status',))
+CHAIN_CACHE = registry.gauge('provenance_chain_cache', 'On-chain read cache statistics', ('stat',))
+LIVE_FEED = registry.gauge('provenance_live_feed', 'Live feed clients and events published in this process', ('stat',))
+
+provenance_log = logging.getLogger('provenance')
+# operational messages of workers, requests and startup (CLI commands print
+# their results); configured in create_app(), level APP_LOG_LEVEL
+log = logging.getLogger('provenance.app')
+
+
+def endpoint_label():
+    """Current route name, or the thread name for background work (anchor-worker, event-indexer, ...)."""
+    if has_request_context():
+        return (request.endpoint or 'unmatched').rsplit('.', 1)[-1]
+    return re.sub(r'-\d+$', '', threading.current_thread().name)
+
+
+def stage(name):
+    """Timing span around one stage of the current request or worker pass."""
+    return STAGE_SECONDS.time(endpoint=endpoint_label(), stage=name)
+
+
+def observe_rpc(seconds, error):
+    RPC_SECONDS.observe(seconds)
+    if error is not None:
+        RPC_ERRORS.inc(error=type(error).__name__)
+
+
+def log_provenance_entry(prov_obj, rhash):
+    """Log a sample of new provenance entries (PROVENANCE_LOG_SAMPLE_RATE) as JSON lines."""
+    if random.random() >= PROVENANCE_LOG_SAMPLE_RATE or not provenance_log.isEnabledFor(logging.INFO):
+        return
+    provenance_log.info(json.dumps({
+        "event": "provenance_entry",
+        "endpoint": endpoint_label(),
+        "hash": rhash,
+        "entry": prov_obj,
+        "sample_rate": PROVENANCE_LOG_SAMPLE_RATE,
+    }, default=str))
 
 # -------------------------------
 # Database Model
@@ -60,6 +347,38 @@ class Record(db.Model):
     modified_by = db.Column(db.String(50), nullable=False)
     timestamp = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
+class BlobRecord(db.Model):
+    __tablename__ = 'blob_record'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(255), nullable=False)
+    content_digest = db.Column(db.String(64), nullable=False)   # SHA-256 of the content (stored in BLOB_DIR)
+    size = db.Column(db.BigInteger, nullable=False)
+    modified_by = db.Column(db.String(50), nullable=False)
+    timestamp = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+class AnchorBatch(db.Model):
+    __tablename__ = 'anchor_batch'
+    batch_id = db.Column(db.Integer, primary_key=True, autoincrement=True)   # key passed to anchorBatch()
+    merkle_root = db.Column(db.String(64), nullable=False)
+    leaf_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    blockchain_tx = db.Column(db.String(256), nullable=True)
+    # same outbox states as ProvenanceLog.anchor_status
+    anchor_status = db.Column(db.String(16), nullable=True, default='pending')
+    anchor_attempts = db.Column(db.Integer, nullable=True, default=0)
+    anchor_next_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    anchor_error = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_anchor_batch_outbox', 'anchor_status', 'anchor_next_at'),
+    )
+
+# anchor_status values not settled for good ('failed' waits for an operator);
+# only these are counted by /outbox and /metrics and kept in ix_provenance_log_open
+OPEN_STATES = ("pending", "submitting", "sent", "batched", "failed")
+OPEN_STATES_SQL = "anchor_status IN (%s)" % ", ".join(f"'{state}'" for state in OPEN_STATES)
+
 class ProvenanceLog(db.Model):
     __tablename__ = 'provenance_log'
     log_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -68,465 +387,4171 @@ class ProvenanceLog(db.Model):
     operation = db.Column(db.String(1), nullable=False)     # 'I','U','D'
     record_hash = db.Column(db.String(128), nullable=False)
     payload = db.Column(db.JSON, nullable=True)             # snapshot or diff
+    # NULL = full payload in `payload`; 'diff' / '...+zlib' see payload_codec.py
+    payload_encoding = db.Column(db.String(16), nullable=True)
+    payload_blob = db.Column(db.LargeBinary, nullable=True)  # compressed payload document
     user_id = db.Column(db.String(128), nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False)
     blockchain_tx = db.Column(db.String(256), nullable=True)  # will store Ethereum tx later
     verified = db.Column(db.Boolean, default=False)
     verified_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # anchoring outbox: 'pending' -> 'submitting' -> ('sent' ->) 'anchored'
+    # ('sent' while an async-mode transaction waits for its receipt, 'failed'
+    # once retries are exhausted, 'superseded' if a newer entry for the same
+    # record reached the chain first, 'batched' while its Merkle batch waits
+    # to be anchored)
+    anchor_status = db.Column(db.String(16), nullable=True, default='pending')
+    anchor_attempts = db.Column(db.Integer, nullable=True, default=0)
+    anchor_next_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    anchor_error = db.Column(db.Text, nullable=True)
+    # Merkle-batched anchoring: batch the hash was anchored in + inclusion proof
+    batch_id = db.Column(db.Integer, db.ForeignKey('anchor_batch.batch_id'), nullable=True, index=True)
+    merkle_proof = db.Column(db.JSON, nullable=True)
+    # hash chaining: record_hash of the record's previous entry (NULL = chain start / unchained)
+    prev_hash = db.Column(db.String(128), nullable=True)
+    # sender account and nonce of the logAction transaction while it is 'sent'
+    anchor_sender = db.Column(db.String(42), nullable=True)
+    anchor_nonce = db.Column(db.BigInteger, nullable=True)
 
-# Create tables if not existing
-with app.app_context():
-    db.create_all()
+    __table_args__ = (
+        # outbox claims and status counts; partial, so it stays small however
+        # many rows are anchored
+        db.Index('ix_provenance_log_open', 'anchor_status', 'anchor_next_at',
+                 postgresql_where=db.text(OPEN_STATES_SQL), sqlite_where=db.text(OPEN_STATES_SQL)),
+        # per-record lookups (history, verify, outbox ordering) and time ranges
+        db.Index('ix_provenance_log_record', 'table_name', 'record_pk', 'log_id'),
+        db.Index('ix_provenance_log_created_at', 'created_at'),
+        # /provenance/search: one index per filter, in the (created_at, log_id) keyset order
+        db.Index('ix_provenance_log_user', 'user_id', 'created_at', 'log_id'),
+        db.Index('ix_provenance_log_operation', 'operation', 'created_at', 'log_id'),
+        db.Index('ix_provenance_log_table_time', 'table_name', 'created_at', 'log_id'),
+        db.Index('ix_provenance_log_verified', 'verified', 'created_at', 'log_id'),
+        db.Index('ix_provenance_log_user_verified', 'user_id', 'verified', 'created_at', 'log_id'),
+        db.Index('ix_provenance_log_unverified', 'created_at', 'log_id',
+                 postgresql_where=db.text('verified IS NOT TRUE'), sqlite_where=db.text('verified IS NOT 1')),
+        # never hand out the log_id of an archived row again
+        {'sqlite_autoincrement': True},
+    )
 
-# -------------------------------
-# Utility: canonical hash
-# -------------------------------
+    # True on (transient) entries read back from an archive segment
+    archived = False
 
-def canonical_hash(obj):
-    # Sort keys & remove whitespace to make it deterministic
-    encoded = json.dumps(obj, sort_keys=True, separators=(',', ':'))
-    return hashlib.sha256(encoded.encode()).hexdigest()
+class ArchiveSegment(db.Model):
+    """Immutable segment file in ARCHIVE_DIR holding provenance rows moved out of provenance_log."""
+    __tablename__ = 'archive_segment'
+    segment_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    file_name = db.Column(db.String(255), nullable=False, unique=True)
+    table_name = db.Column(db.String(128), nullable=True)     # NULL = rows of every table
+    period_start = db.Column(db.DateTime(timezone=True), nullable=False)
+    period_end = db.Column(db.DateTime(timezone=True), nullable=False)   # exclusive
+    min_log_id = db.Column(db.Integer, nullable=False)
+    max_log_id = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    # the checksum is anchored like a Merkle root (anchorBatch(batch_id, sha256, row_count))
+    batch_id = db.Column(db.Integer, db.ForeignKey('anchor_batch.batch_id'), nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
 
-# -------------------------------
-# Routes
-# -------------------------------
-@app.route('/')
-def home():
-    return "✅ CRUD API for Records is active!"
+class ProvenanceCheckpoint(db.Model):
+    """State of a table materialized from its provenance entries with created_at <= as_of."""
+    __tablename__ = 'provenance_checkpoint'
+    checkpoint_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    table_name = db.Column(db.String(128), nullable=False)
+    as_of = db.Column(db.DateTime(timezone=True), nullable=False)
+    record_count = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_provenance_checkpoint_table', 'table_name', 'as_of'),
+    )
 
-# -------------------------------
-# CRUD endpoints (create / update / delete)
-# Each will write a provenance_log row with record_hash (no blockchain yet)
-# -------------------------------
+class ProvenanceCheckpointRow(db.Model):
+    """One record alive at a checkpoint: its state and the entry that produced it."""
+    __tablename__ = 'provenance_checkpoint_row'
+    checkpoint_id = db.Column(db.Integer, db.ForeignKey('provenance_checkpoint.checkpoint_id'), primary_key=True)
+    record_pk = db.Column(db.String(256), primary_key=True)
+    record_id = db.Column(db.BigInteger, nullable=False)   # record_pk as a number, for id-ordered reads
+    log_id = db.Column(db.Integer, nullable=False)
+    record_hash = db.Column(db.String(128), nullable=False)
+    user_id = db.Column(db.String(128), nullable=False)
+    changed_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    state = db.Column(db.JSON, nullable=False)
 
-# Create
-@app.route('/add', methods=['POST'])
-def add_record():
-    data = request.json.get('data')
-    user = request.json.get('user')
-    if not data:
-        return jsonify({'error':'data required'}), 400
-    if not user:
-        return jsonify({'error':'user is required in request body'}), 400
+    __table_args__ = (
+        db.Index('ix_provenance_checkpoint_row_id', 'checkpoint_id', 'record_id'),
+    )
 
-    # create record
-    new_record = Record(data=data, modified_by=user)
-    db.session.add(new_record)
-    db.session.flush()  # get new_record.id
+class TamperSweepRun(db.Model):
+    """One pass of the tamper sweep; an unfinished pass resumes from its cursor."""
+    __tablename__ = 'tamper_sweep_run'
+    run_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    mode = db.Column(db.String(16), nullable=False)           # 'full' | 'incremental'
+    table_name = db.Column(db.String(128), nullable=False, default='record')   # captured table being walked
+    phase = db.Column(db.String(16), nullable=False)          # source being walked, see SWEEP_PHASES
+    cursor = db.Column(db.String(256), nullable=False, default='')  # last key done in `phase` ('' = none yet)
+    since_log_id = db.Column(db.Integer, nullable=False, default=0)   # incremental: entries after this one
+    watermark_log_id = db.Column(db.Integer, nullable=False, default=0)  # newest log_id when the pass started
+    checked = db.Column(db.Integer, nullable=False, default=0)
+    findings = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
-    # provenance payload and hash
-    payload = {"new": {"id": new_record.id, "data": new_record.data}}
-    
-    timestamp_now = datetime.now(timezone.utc)
+class TamperFinding(db.Model):
+    """A record (of any captured table) that failed the tamper sweep; resolved_at is set once it verifies again."""
+    __tablename__ = 'tamper_finding'
+    finding_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('tamper_sweep_run.run_id'), nullable=False)
+    table_name = db.Column(db.String(128), nullable=False, default='record')
+    record_pk = db.Column(db.String(256), nullable=False)
+    log_id = db.Column(db.Integer, nullable=True)
+    reason = db.Column(db.String(64), nullable=False)          # key of VERIFICATION_REASONS
+    detail = db.Column(db.JSON, nullable=True)
+    found_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    resolved_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
-    prov_obj = {
-        "table_name": "record",
-        "record_pk": str(new_record.id),
-        "operation": "I",
-        "payload": payload,
-        "user_id": user,
-        "timestamp": iso_utc(timestamp_now)  # <-- Use the variable
-    }
+    __table_args__ = (
+        db.Index('ix_tamper_finding_open', 'resolved_at', 'record_pk'),
+    )
 
-    # 5. Calculate the hash
-    rhash = canonical_hash(prov_obj)
-    
-    print("Original obj = ")
-    print(prov_obj)
-    print("Original Hash = "+rhash)
-
-    # store provenance row (blockchain_tx left NULL for now)
-    prov = ProvenanceLog(
-        table_name="record",
-        record_pk=str(new_record.id),
-        operation="I",
-        record_hash=rhash,         # <-- Pass in the hash
-        payload=payload,
-        user_id=user,
-        created_at=timestamp_now   # <-- Pass in the same timestamp
+class ProvenanceHead(db.Model):
+    """Latest provenance entry per record, moved forward in the same transaction as each write."""
+    __tablename__ = 'provenance_head'
+    table_name = db.Column(db.String(128), primary_key=True)
+    record_pk = db.Column(db.String(256), primary_key=True)
+    log_id = db.Column(db.Integer, nullable=False)
+    record_hash = db.Column(db.String(128), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    # /verify?full=1 checkpoint: last entry whose hash chain was verified locally
+    verified_log_id = db.Column(db.Integer, nullable=True)
+    verified_hash = db.Column(db.String(128), nullable=True)
+
+class ChainEvent(db.Model):
+    """RecordLogged events copied from the chain by the event indexer."""
+    __tablename__ = 'chain_event'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    block_number = db.Column(db.Integer, nullable=False)
+    log_index = db.Column(db.Integer, nullable=False)
+    tx_hash = db.Column(db.String(66), nullable=False)
+    record_id = db.Column(db.BigInteger, nullable=False)
+    operation = db.Column(db.String(16), nullable=False)
+    record_hash = db.Column(db.String(128), nullable=False)
+    block_timestamp = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('tx_hash', 'log_index', name='uq_chain_event_log'),
+        db.Index('ix_chain_event_record', 'record_id', 'block_number', 'log_index'),
     )
-    
-    # 7. Add the complete object. The flush for the blockchain
-    #    step (or the final commit) will now succeed.
-    db.session.add(prov)
 
-    # Send hash to blockchain using record ID as key
-    try:
-        db.session.flush()
-        tx_hash = contract.functions.logAction(
-            new_record.id,   # <-- use the record's ID as key
-            "INSERT",
-            rhash
-        ).transact()
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        prov.blockchain_tx = receipt.transactionHash.hex()
-    except Exception as e:
-        print(f"⚠️ Blockchain logging failed: {e}")
-        prov.blockchain_tx = None
+class SenderNonce(db.Model):
+    """Next transaction nonce to hand out per sender account (see nonce_manager.py)."""
+    __tablename__ = 'sender_nonce'
+    account = db.Column(db.String(42), primary_key=True)
+    next_nonce = db.Column(db.BigInteger, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
-    # Commit everything
-    db.session.commit()
+class IndexerCheckpoint(db.Model):
+    """Last block an indexer has fully processed."""
+    __tablename__ = 'indexer_checkpoint'
+    name = db.Column(db.String(64), primary_key=True)
+    block_number = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
-    return jsonify({
-        'message': 'Record added',
-        'id': new_record.id,
-        'prov_log_id': prov.log_id,
-        'blockchain_tx': prov.blockchain_tx
-    }), 201
+class WorkerHeartbeat(db.Model):
+    """Last pass of a background worker per process, so /ready can see workers running elsewhere."""
+    __tablename__ = 'worker_heartbeat'
+    worker = db.Column(db.String(200), primary_key=True)   # host:pid
+    kind = db.Column(db.String(20), primary_key=True)      # anchor / indexer
+    beat_at = db.Column(db.DateTime(timezone=True), nullable=False)
 
 
-# Read
-@app.route('/records', methods=['GET'])
-def get_records():
-    records = Record.query.all()
-    output = [
-        {
-            'id': r.id,
-            'data': r.data,
-            'modified_by': r.modified_by,
-            'timestamp': iso_utc(r.timestamp)
-        }
-        for r in records
-    ]
-    return jsonify(output)
+# replaced by a newer index (ix_provenance_log_outbox -> the partial ix_provenance_log_open)
+OBSOLETE_INDEXES = ("ix_provenance_log_outbox",)
 
 
-# Update
-@app.route('/update/<int:id>', methods=['PUT'])
-def update_record(id):
-    rec = Record.query.get(id)
-    if not rec:
-        return jsonify({'error':'Record not found'}), 404
+def upgrade_schema():
+    """
+    Bring an existing database up to the current models.
+    db.create_all() only creates missing tables, so columns and indexes added
+    to a model later are created here (columns are always added as nullable).
+    """
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        for name in OBSOLETE_INDEXES:
+            conn.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
 
-    user = request.json.get('user')
-    if not user:
-        return jsonify({'error':'user is required in request body'}), 400
-    
-    new_data = request.json.get('data', rec.data)
+        # rows written before the outbox existed: anything without a tx goes
+        # back into the outbox so it finally gets anchored
+        conn.execute(db.text(
+            "UPDATE provenance_log SET "
+            "anchor_status = CASE WHEN blockchain_tx IS NULL THEN 'pending' ELSE 'anchored' END, "
+            "anchor_attempts = 0, anchor_next_at = created_at "
+            "WHERE anchor_status IS NULL"
+        ))
+        # tamper sweeps from before other captured tables were swept covered record only
+        for table in ("tamper_sweep_run", "tamper_finding"):
+            conn.execute(db.text(f"UPDATE {table} SET table_name = 'record' WHERE table_name IS NULL"))
+        ensure_upcoming_partitions(conn)
 
-    old_snapshot = {"id": rec.id, "data": rec.data}
-    rec.data = new_data
-    rec.modified_by = user
-    rec.timestamp = datetime.now(timezone.utc)
-    db.session.flush()
+def dialect_insert(model):
+    """INSERT construct with ON CONFLICT support for the configured database."""
+    return {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}[db.engine.dialect.name](model)
 
-    payload = {"old": old_snapshot, "new": {"id": rec.id, "data": rec.data}}
-    timestamp_now = datetime.now(timezone.utc)
-    prov_obj = {
-        "table_name": "record",
-        "record_pk": str(rec.id),
-        "operation": "U",
-        "payload": payload,
-        "user_id": user,
-        "timestamp": iso_utc(timestamp_now) # <-- Use the variable
-    }
-    rhash = canonical_hash(prov_obj)
 
-    prov = ProvenanceLog(
-        table_name="record",
-        record_pk=str(rec.id),
-        operation="U",
-        record_hash=rhash,
-        payload=payload,
-        user_id=user,
-        created_at=timestamp_now   # <-- Pass in the same timestamp
+def upsert_heads(stmt):
+    """Add the ON CONFLICT clause that moves a provenance head forward (never backwards)."""
+    return stmt.on_conflict_do_update(
+        index_elements=['table_name', 'record_pk'],
+        set_={
+            'log_id': stmt.excluded.log_id,
+            'record_hash': stmt.excluded.record_hash,
+            'updated_at': stmt.excluded.updated_at,
+        },
+        where=stmt.excluded.log_id > ProvenanceHead.log_id
     )
-    db.session.add(prov)
 
-    # Send hash to blockchain using record ID as key
-    try:
-        db.session.flush() 
-        tx_hash = contract.functions.logAction(
-            rec.id,   # <-- use the record's ID as key
-            "UPDATE",
-            rhash
-        ).transact()
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        prov.blockchain_tx = receipt.transactionHash.hex()
-    except Exception as e:
-        print(f"⚠️ Blockchain logging failed: {e}")
-        prov.blockchain_tx = None
 
-    db.session.commit()
-    return jsonify({
-        'message':'Record updated',
-        'id': rec.id, 
-        'prov_log_id': prov.log_id, 
-        'blockchain_tx': prov.blockchain_tx
-    })
+def advance_heads(entries):
+    """
+    Point provenance_head at the newest of `entries` for each record, inside
+    the caller's transaction (one statement). Entries are ProvenanceLog
+    objects or dicts of their column values including log_id.
+    """
+    latest = {}
+    for e in entries:
+        if not isinstance(e, dict):
+            e = {'table_name': e.table_name, 'record_pk': e.record_pk, 'log_id': e.log_id,
+                 'record_hash': e.record_hash, 'created_at': e.created_at}
+        key = (e['table_name'], e['record_pk'])
+        if key not in latest or e['log_id'] > latest[key]['log_id']:
+            latest[key] = e
+    if not latest:
+        return
+    stmt = dialect_insert(ProvenanceHead).values([
+        {
+            'table_name': e['table_name'],
+            'record_pk': e['record_pk'],
+            'log_id': e['log_id'],
+            'record_hash': e['record_hash'],
+            'updated_at': e['created_at'],
+        }
+        for e in latest.values()
+    ])
+    db.session.execute(upsert_heads(stmt))
 
 
-# Delete
-@app.route('/delete/<int:id>', methods=['DELETE'])
-def delete_record(id):
-    rec = Record.query.get(id)
-    if not rec:
-        return jsonify({'error':'not found'}), 404
+def latest_provenance(record_pk, table_name="record"):
+    """
+    Latest provenance entry for a record: a primary-key lookup through
+    provenance_head, falling back to the (indexed) log for records whose
+    head has not been backfilled yet.
+    """
+    head = db.session.get(ProvenanceHead, (table_name, str(record_pk)))
+    prov = db.session.get(ProvenanceLog, head.log_id) if head else None
+    if prov is None:
+        prov = (
+            ProvenanceLog.query
+            .filter_by(table_name=table_name, record_pk=str(record_pk))
+            .order_by(ProvenanceLog.log_id.desc())
+            .first()
+        )
+    if prov is None:
+        # every entry of the record has been moved to the archive
+        archived = archived_entries(record_pk, table_name)
+        prov = archived[-1] if archived else None
+    return prov
 
-    user = request.json.get('user')
-    if not user:
-        return jsonify({'error':'user is required in request body'}), 400
-    payload = {"deleted": {"id": rec.id, "data": rec.data}}
-    timestamp_now = datetime.now(timezone.utc)
-    prov_obj = {
-        "table_name": "record",
-        "record_pk": str(rec.id),
-        "operation": "D",
-        "payload": payload,
-        "user_id": user,
-        "timestamp": iso_utc(timestamp_now)
-    }
-    rhash = canonical_hash(prov_obj)
 
-    prov = ProvenanceLog(
-        table_name="record",
-        record_pk=str(rec.id),
-        operation="D",
-        record_hash=rhash,
-        payload=payload,
-        user_id=user,
-        created_at=timestamp_now
-    )
-    db.session.add(prov)
+def chain_prev_hash(record_pk, table_name="record"):
+    """
+    prev_hash for a new entry of this record when hash chaining is enabled
+    (None otherwise). Locks the head row so concurrent writers of the same
+    record cannot fork its chain.
+    """
+    if not PROVENANCE_HASH_CHAIN:
+        return None
+    head = db.session.get(ProvenanceHead, (table_name, str(record_pk)), with_for_update=True)
+    if head:
+        return head.record_hash
+    prov = latest_provenance(record_pk, table_name)
+    return prov.record_hash if prov else None
 
 
-    # Send hash to blockchain using record ID as key
-    try:
-        db.session.flush()  # get prov.log_id
-        tx_hash = contract.functions.logAction(
-            rec.id,   # <-- use the record's ID as key
-            "DELETE",
-            rhash
-        ).transact()
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        prov.blockchain_tx = receipt.transactionHash.hex()
-    except Exception as e:
-        print(f"⚠️ Blockchain logging failed: {e}")
-        prov.blockchain_tx = None
+def chain_prev_hashes(record_pks, table_name="record"):
+    """chain_prev_hash() for many records with one (locking) query."""
+    if not PROVENANCE_HASH_CHAIN or not record_pks:
+        return {}
+    heads = (
+        ProvenanceHead.query
+        .filter(ProvenanceHead.table_name == table_name, ProvenanceHead.record_pk.in_([str(pk) for pk in record_pks]))
+        .with_for_update()
+    )
+    return {h.record_pk: h.record_hash for h in heads}
 
-    # remove the record after logging snapshot
-    db.session.delete(rec)
+
+@bp.cli.command('migrate-provenance-head')
+def migrate_provenance_head_command():
+    """Backfill provenance_head from the existing log (safe to re-run)."""
+    ensure_schema()
+    latest = (
+        db.select(ProvenanceLog.table_name, ProvenanceLog.record_pk,
+                  db.func.max(ProvenanceLog.log_id).label('log_id'))
+        .group_by(ProvenanceLog.table_name, ProvenanceLog.record_pk)
+        .subquery()
+    )
+    source = (
+        db.select(ProvenanceLog.table_name, ProvenanceLog.record_pk, ProvenanceLog.log_id,
+                  ProvenanceLog.record_hash, ProvenanceLog.created_at)
+        .join(latest, latest.c.log_id == ProvenanceLog.log_id)
+        .where(db.true())   # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+    )
+    stmt = dialect_insert(ProvenanceHead).from_select(
+        ['table_name', 'record_pk', 'log_id', 'record_hash', 'updated_at'], source)
+    result = db.session.execute(upsert_heads(stmt))
     db.session.commit()
-    return jsonify({
-        'message':'Record deleted', 
-        'id': id, 
-        'prov_log_id': prov.log_id,
-        'blockchain_tx': prov.blockchain_tx    
-    })
+    print(f"✅ provenance_head backfilled ({result.rowcount} rows written)")
 
+def ensure_schema():
+    """Create missing tables/columns/indexes once per app (first request, worker or CLI command)."""
+    state = current_app.extensions['startup']
+    if state.get('schema_seconds') is not None:
+        return
+    with state['lock']:
+        if state.get('schema_seconds') is None:
+            started = time.perf_counter()
+            db.create_all()
+            upgrade_schema()
+            state['schema_seconds'] = round(time.perf_counter() - started, 6)
 
-@app.route('/verify/<int:record_id>', methods=['GET'])
-def verify_record(record_id):
-    # 1) get latest provenance entry for the record
-    prov = ProvenanceLog.query.filter_by(record_pk=str(record_id)).order_by(ProvenanceLog.log_id.desc()).first()
-    if not prov and record:
-        return jsonify({
-            "status": "error",
-            "record_id": record_id,
-            "message": "🚨 Record exists but has no provenance log. Possible unlogged insertion or tampering."
-        }), 400
+# -------------------------------
+# Utility: canonical hash (canonical_hash() itself lives in hash_pool.py)
+# -------------------------------
 
-    # 4️⃣ Case: no record AND no provenance — it was purged completely
-    if not prov and not record:
-        return jsonify({
-            "status": "error",
-            "record_id": record_id,
-            "message": "❌ Record and provenance log both missing. Data loss or external tampering."
-        }), 404
+def provenance_object(table_name, record_pk, operation, payload, user_id, created_at, prev_hash=None):
+    """The object hashed for a provenance entry (see hash_pool.provenance_object())."""
+    return hash_pool.provenance_object(table_name, record_pk, operation, payload, user_id, iso_utc(created_at), prev_hash)
 
 
-    # 2) recompute provenance-hash (the one originally stored on-chain)
-    prov_obj = {
-        "table_name": prov.table_name,
-        "record_pk": prov.record_pk,
-        "operation": prov.operation,
-        "payload": prov.payload,
-        "user_id": prov.user_id,
-        # use the exact DB timestamp that was used when prov was created
-        "timestamp": iso_utc(prov.created_at)
+def provenance_values(record_pk, operation, payload, user, timestamp_now, table_name="record", prev_hash=None,
+                      base=None):
+    """Column values (including the canonical hash) for one ProvenanceLog row; `base` see payload_columns()."""
+    prov_obj = provenance_object(table_name, record_pk, operation, payload, user, timestamp_now, prev_hash)
+    return {
+        "table_name": table_name,
+        "record_pk": str(record_pk),
+        "operation": operation,
+        "record_hash": canonical_hash(prov_obj),
+        "prev_hash": prev_hash,
+        **payload_columns(operation, payload, base),
+        "user_id": user,
+        "created_at": timestamp_now,
+        "anchor_status": "pending",
+        "anchor_attempts": 0,
+        "anchor_next_at": timestamp_now,
     }
-    prov_hash_recomputed = canonical_hash(prov_obj)
 
-    # 3) recompute hash from current record table state (if record exists)
-    record = Record.query.get(int(prov.record_pk))
-    record_hash_recomputed = None
-    if record:
-        # Build payload in the same shape as you used when creating provenance (new snapshot)
-        if prov.operation == "I":
-            payload_current = {"new": {"id": record.id, "data": record.data}}
-        elif prov.operation == "U":
-            payload_current = {
-                "old": prov.payload.get("old", {}),
-                "new": {"id": record.id, "data": record.data}
-            }
-        elif prov.operation == "D":
-            payload_current = {"deleted": {"id": record.id, "data": record.data}}
-        else:
-            payload_current = {"new": {"id": record.id, "data": record.data}}
-
-        record_obj = {
-            "table_name": prov.table_name,
-            "record_pk": prov.record_pk,
-            "operation": prov.operation,
-            "payload": payload_current,
-            "user_id": prov.user_id,
-            "timestamp": iso_utc(prov.created_at)
-        }
-        record_hash_recomputed = canonical_hash(record_obj)
 
-    # 4) get on-chain hash
-    # onchain_hash = None
-    try:
-        onchain_hash = contract.functions.getRecordHash(int(prov.record_pk)).call()
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': 'Could not call getRecordHash()',
-            'exception': str(e)
-        }), 500
+def entry_hash(prov, rows=None, memo=None):
+    """Recompute the canonical hash of a stored provenance entry (`rows`/`memo` see entry_payload())."""
+    # use the exact DB timestamp that was used when prov was created
+    return canonical_hash(provenance_object(prov.table_name, prov.record_pk, prov.operation,
+                                            entry_payload(prov, rows, memo),
+                                            prov.user_id, prov.created_at, prov.prev_hash))
 
-    # 5) final verification logic:
-    # - If record exists: require onchain_hash == prov_hash_recomputed == record_hash_recomputed
-    # - If record was deleted (no record row), require onchain_hash == prov_hash_recomputed
-    verified = False
-    reason = ""
-    if onchain_hash:
-        if record:
-            if onchain_hash == prov_hash_recomputed == record_hash_recomputed:
-                verified = True
-                reason = "✅ On-chain, provenance log, and DB record all match."
-            elif onchain_hash == prov_hash_recomputed:
-                # chain equals original provenance snapshot, but current record differs → tampered after logging
-                verified = False
-                reason = "⚠️ On-chain matches provenance log, but DB record has been tampered."
-            else:
-                verified = False
-                reason = "❌ On-chain hash does not match provenance log."
-        else:
-            # record missing: we must ensure this deletion was legitimate
-            # i.e., the last provenance operation for this record should be a "D" (DELETE)
-            if prov.operation == "D":
-                # ok, it was logged as deleted
-                if onchain_hash == prov_hash_recomputed:
-                    verified = True
-                    reason = "✅ Record deleted legitimately — provenance and blockchain match."
-                else:
-                    verified = False
-                    reason = "❌ Record marked deleted, but blockchain mismatch."
-            else:
-                # record is missing but provenance doesn’t say it was deleted — suspicious
-                verified = False
-                reason = "🚨 Integrity violation: Record missing from DB without a DELETE provenance entry. Possible tampering."
-    else:
-        verified = False
-        reason = "❌ No on-chain hash found."
+# -------------------------------
+# Payload storage: full JSON, diffs against an earlier entry, compressed
+# (see payload_codec.py). Always read payloads through entry_payload().
+# -------------------------------
 
-    # 6) persist verification result, can remove this section from here and place it to upper if else block as it becomes not verified if the data is tampered even if it is verified previously, it s a choice.
-    prov.verified = verified
-    prov.verified_at = datetime.now(timezone.utc)
-    db.session.commit()
+def entry_payload(prov, rows=None, memo=None):
+    """
+    Full payload of a provenance row, whatever its storage encoding. None if
+    a diff's base entry is gone (the entry can then no longer be verified).
+    Decoded payloads are deliberately not cached across requests: a stored
+    row changed behind our back must show up as a hash mismatch. `rows`
+    ({log_id: row}, e.g. a record's whole history) and `memo` (shared by the
+    calls of one walk) avoid re-reading and re-decoding diff bases.
+    """
+    if memo is not None and prov.log_id in memo:
+        return memo[prov.log_id][1]
+    encoding = prov.payload_encoding
+    payload = payload_codec.stored_document(encoding, prov.payload, prov.payload_blob)
+    if payload_codec.is_diff(encoding):
+        try:
+            payload = payload_codec.decode_diff(prov.operation, payload, diff_base_state(prov, payload, rows, memo))
+        except payload_codec.PayloadUnavailable as e:
+            log.warning("⚠️ Payload of provenance log %s cannot be decoded: %s", prov.log_id, e)
+            payload = None
+    if memo is not None:
+        memo[prov.log_id] = (prov.operation, payload)
+    return payload
 
-    # 7) return detailed result
-    return jsonify({
-        "record_id": record_id,
-        "verified": verified,
-        "reason": reason,
-        "onchain_hash": onchain_hash,
-        "recomputed": {
-            "provenance_log_hash": prov_hash_recomputed,
-            "record_table_hash": record_hash_recomputed
-        },
-        "blockchain_tx": prov.blockchain_tx
-    }), 200
 
+def diff_base_state(prov, doc, rows=None, memo=None):
+    """Record state after the entry a diff document refers to."""
+    base_id = doc["base"]
+    if memo is not None and base_id in memo:
+        return payload_codec.state_after(*memo[base_id])
+    if rows is None or base_id not in rows:
+        # the record's entries since the last full snapshot, in one query
+        rows = {p.log_id: p for p in ProvenanceLog.query.filter(
+            ProvenanceLog.table_name == prov.table_name,
+            ProvenanceLog.record_pk == prov.record_pk,
+            ProvenanceLog.log_id >= doc["root"],
+            ProvenanceLog.log_id < prov.log_id,
+        )}
+    base = rows.get(base_id)
+    if base is None:
+        base = next((e for e in archived_entries(prov.record_pk, prov.table_name) if e.log_id == base_id), None)
+    if base is None:
+        raise payload_codec.PayloadUnavailable(f"base entry {base_id} is missing")
+    return payload_codec.state_after(base.operation, entry_payload(base, rows, memo))
 
 
-@app.route('/history/<int:record_id>', methods=['GET'])
-def get_history(record_id):
+def payload_columns(operation, payload, base=None):
     """
-    Fetch complete provenance history for a record ID.
-    If provenance logs exist locally, return them.
-    If logs are missing, fall back to blockchain events.
+    payload / payload_encoding values for a new entry: a diff against `base`
+    (the record's latest entry) when diff encoding is on and the diff is
+    smaller, the full payload otherwise.
     """
+    full = {"payload": payload, "payload_encoding": None}
+    if PROVENANCE_PAYLOAD_ENCODING != payload_codec.DIFF or base is None or operation not in ("U", "D"):
+        return full
+    depth, root = 1, base.log_id
+    if payload_codec.is_diff(base.payload_encoding):
+        base_doc = payload_codec.stored_document(base.payload_encoding, base.payload, base.payload_blob)
+        depth, root = base_doc["depth"] + 1, base_doc["root"]
+    if depth >= PROVENANCE_SNAPSHOT_EVERY:
+        return full   # periodic full snapshot bounds the replay on read
+    base_payload = entry_payload(base)
+    doc = payload_codec.encode_diff(operation, payload, payload_codec.state_after(base.operation, base_payload),
+                                    base.log_id, root, depth) if base_payload is not None else None
+    if doc is None or len(json.dumps(doc)) >= len(json.dumps(payload)):
+        return full
+    return {"payload": doc, "payload_encoding": payload_codec.DIFF}
 
-    history = []
-    source = None
 
-    # 1️⃣ Try to fetch provenance logs from DB
-    prov_logs = ProvenanceLog.query.filter_by(record_pk=str(record_id)).order_by(ProvenanceLog.created_at.asc()).all()
+def payload_base(record_pk, table_name="record"):
+    """Entry a new diff-encoded payload of this record would refer to (None with full payloads)."""
+    if PROVENANCE_PAYLOAD_ENCODING != payload_codec.DIFF:
+        return None
+    return latest_provenance(record_pk, table_name)
 
-    if prov_logs and len(prov_logs) > 0:
-        source = "database"
-        for p in prov_logs:
-            history.append({
-                "log_id": p.log_id,
-                "operation": p.operation,
-                "record_hash": p.record_hash,
-                "payload": p.payload,
-                "user_id": p.user_id,
-                "timestamp": iso_utc(p.created_at),   # ✅ consistent key
-                "blockchain_tx": p.blockchain_tx,
-                "verified": p.verified
-            })
-    else:
-        # 2️⃣ Fallback: Fetch directly from blockchain events
-        source = "blockchain"
-        try:
-            # filter events by indexed recordId
-            event_filter = contract.events.RecordLogged.create_filter(
-                fromBlock=0,
-                toBlock="latest",
-                argument_filters={"recordId": record_id}
-            )
-            logs = event_filter.get_all_entries()
-
-            for log in logs:
-                args = log["args"]
-                blk_ts = w3.eth.get_block(log["blockNumber"])["timestamp"]
-                history.append({
-                    "recordId": args["recordId"],
-                    "operation": args["operation"],
-                    "record_hash": args["recordHash"],
-                    "blockNumber": log["blockNumber"],
-                    "txHash": log["transactionHash"].hex(),
-                    "timestamp": iso_utc(datetime.fromtimestamp(blk_ts, tz=timezone.utc))
-                })
 
-        except Exception as e:
-            return jsonify({
-                "status": "error",
-                "message": f"⚠️ Unable to fetch blockchain logs: {str(e)}"
-            }), 500
+def latest_provenances(record_pks, table_name="record"):
+    """latest_provenance() for many records: {record_pk (str): ProvenanceLog} in two queries at most."""
+    pks = [str(pk) for pk in record_pks]
+    if not pks:
+        return {}
+    provs = {
+        p.record_pk: p
+        for p in ProvenanceLog.query
+        .join(ProvenanceHead, ProvenanceHead.log_id == ProvenanceLog.log_id)
+        .filter(ProvenanceHead.table_name == table_name, ProvenanceHead.record_pk.in_(pks))
+    }
+    missing = [pk for pk in pks if pk not in provs]
+    if missing:
+        # records whose head has not been backfilled yet
+        latest_ids = (
+            db.session.query(db.func.max(ProvenanceLog.log_id))
+            .filter(ProvenanceLog.table_name == table_name, ProvenanceLog.record_pk.in_(missing))
+            .group_by(ProvenanceLog.record_pk)
+        )
+        provs.update((p.record_pk, p) for p in ProvenanceLog.query.filter(ProvenanceLog.log_id.in_(latest_ids)))
+    missing = [pk for pk in pks if pk not in provs]
+    if missing:
+        segments = archive_segments(table_name)
+        for pk in missing if segments else ():
+            archived = archived_entries(pk, table_name, segments)
+            if archived:
+                provs[pk] = archived[-1]
+    return provs
 
-    if not history:
-        return jsonify({
-            "status": "error",
+
+@bp.cli.command('compact-payloads')
+@click.option('--older-than-days', type=float, default=PROVENANCE_COMPRESS_AFTER_DAYS, show_default=True)
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+def compact_payloads_command(older_than_days, batch_size):
+    """Compress the payloads of provenance rows older than N days (zlib, into payload_blob)."""
+    ensure_schema()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    after, rows_done, saved = 0, 0, 0
+    while True:
+        rows = (
+            ProvenanceLog.query
+            .filter(ProvenanceLog.log_id > after,
+                    ProvenanceLog.created_at < cutoff,
+                    ProvenanceLog.payload_blob.is_(None))
+            .order_by(ProvenanceLog.log_id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for prov in rows:
+            doc = prov.payload
+            blob = payload_codec.compress(doc)
+            saved += len(json.dumps(doc, separators=(',', ':'))) - len(blob)
+            prov.payload_blob = blob
+            prov.payload = db.null()
+            prov.payload_encoding = (prov.payload_encoding or "json") + payload_codec.ZLIB_SUFFIX
+        after = rows[-1].log_id
+        rows_done += len(rows)
+        db.session.commit()
+    print(f"🗜️ Compressed {rows_done} provenance payloads older than {older_than_days:g} days (~{saved // 1024} KiB saved)")
+
+# -------------------------------
+# Cold archive: settled rows of whole months move from provenance_log into
+# immutable segment files (see provenance_archive.py), registered in
+# archive_segment. Readers merge archived entries back in; on PostgreSQL
+# provenance_log can be range-partitioned by month so a month is dropped
+# as a whole.
+# -------------------------------
+
+# columns kept for an archived entry (payloads are stored decoded, in full)
+ARCHIVED_COLUMNS = (
+    "log_id", "table_name", "record_pk", "operation", "record_hash", "payload", "user_id", "created_at",
+    "blockchain_tx", "verified", "verified_at", "anchor_status", "batch_id", "merkle_proof", "prev_hash",
+)
+ARCHIVED_DATETIMES = ("created_at", "verified_at")
+# anchor states a row must have left before it can be archived
+SETTLED_STATES = ("anchored", "failed", "superseded")
+
+
+def get_archive():
+    return current_app.extensions['archive']
+
+
+def archive_key(record_pk, table_name="record"):
+    return f"{table_name}/{record_pk}"
+
+
+def archive_segments(table_name="record"):
+    """File names of the segments that may hold entries of `table_name`, oldest first."""
+    return db.session.execute(
+        db.select(ArchiveSegment.file_name)
+        .where(db.or_(ArchiveSegment.table_name == table_name, ArchiveSegment.table_name.is_(None)))
+        .order_by(ArchiveSegment.segment_id.asc())
+    ).scalars().all()
+
+
+def archived_entries(record_pk, table_name="record", segments=None):
+    """A record's archived entries as (transient) ProvenanceLog objects, in log order."""
+    segments = archive_segments(table_name) if segments is None else segments
+    if not segments:
+        return []
+    entries = []
+    for row in get_archive().get(segments, archive_key(record_pk, table_name)):
+        values = {c: row.get(c) for c in ARCHIVED_COLUMNS}
+        for c in ARCHIVED_DATETIMES:
+            values[c] = datetime.fromisoformat(values[c]) if values[c] else None
+        entry = ProvenanceLog(**values)
+        entry.archived = True
+        entries.append(entry)
+    return sorted(entries, key=lambda e: e.log_id)
+
+
+def with_archived(record_pk, hot_entries, after=0, table_name="record"):
+    """Archived entries (log_id > after) followed by `hot_entries`: a record's full history in log order."""
+    archived = [e for e in archived_entries(record_pk, table_name) if e.log_id > after]
+    return archived + list(hot_entries) if archived else hot_entries
+
+
+def sqlite_reuses_log_ids():
+    """SQLite tables created before sqlite_autoincrement reuse the highest rowid once its row is deleted."""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    ddl = db.session.execute(db.text("SELECT sql FROM sqlite_master WHERE name = 'provenance_log'")).scalar()
+    return 'AUTOINCREMENT' not in (ddl or '').upper()
+
+
+def month_start(dt):
+    return as_utc(dt).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(dt):
+    return month_start(month_start(dt) + timedelta(days=32))
+
+
+def partition_name(month):
+    return f"provenance_log_{month:%Y_%m}"
+
+
+def provenance_log_partitioned(conn):
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return conn.execute(db.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.oid = to_regclass('provenance_log'))"
+    )).scalar()
+
+
+def ensure_partitions(conn, start, end):
+    """Create the monthly partitions covering [start, end) that do not exist yet."""
+    month, created = month_start(start), 0
+    while month < end:
+        if conn.execute(db.text("SELECT to_regclass(:name)"), {"name": partition_name(month)}).scalar() is None:
+            conn.execute(db.text(
+                f"CREATE TABLE {partition_name(month)} PARTITION OF provenance_log "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+            ))
+            created += 1
+        month = next_month(month)
+    return created
+
+
+def ensure_upcoming_partitions(conn):
+    """Keep PARTITION_MONTHS_AHEAD monthly partitions ahead of now (no-op unless partitioned)."""
+    if not provenance_log_partitioned(conn):
+        return 0
+    now = datetime.now(timezone.utc)
+    end = now
+    for _ in range(PARTITION_MONTHS_AHEAD + 1):
+        end = next_month(end)
+    return ensure_partitions(conn, now, end)
+
+
+@bp.cli.command('partition-provenance-log')
+def partition_provenance_log_command():
+    """
+    PostgreSQL: convert provenance_log into a table range-partitioned by
+    created_at (one partition per month plus a DEFAULT one), copying all
+    rows. Once partitioned, re-running it only creates upcoming partitions.
+    """
+    ensure_schema()
+    if db.engine.dialect.name != 'postgresql':
+        print(f"⚠️ Partitioning needs PostgreSQL ({db.engine.dialect.name} keeps the single provenance_log table; "
+              f"archive-provenance works on it all the same)")
+        return
+    now = datetime.now(timezone.utc)
+    with db.engine.begin() as conn:
+        if provenance_log_partitioned(conn):
+            print(f"🗓️ provenance_log is already partitioned; {ensure_upcoming_partitions(conn)} new partitions created")
+            return
+        # the primary key of a partitioned table has to include the partition
+        # key; log_id stays unique through its sequence
+        conn.execute(db.text("LOCK TABLE provenance_log IN ACCESS EXCLUSIVE MODE"))
+        sequence = conn.execute(db.text("SELECT pg_get_serial_sequence('provenance_log', 'log_id')")).scalar()
+        first = conn.execute(db.text("SELECT min(created_at) FROM provenance_log")).scalar() or now
+        conn.execute(db.text("ALTER TABLE provenance_log RENAME TO provenance_log_unpartitioned"))
+        conn.execute(db.text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+        conn.execute(db.text(
+            "CREATE TABLE provenance_log (LIKE provenance_log_unpartitioned INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        ))
+        conn.execute(db.text("ALTER TABLE provenance_log ADD PRIMARY KEY (log_id, created_at)"))
+        conn.execute(db.text("ALTER TABLE provenance_log ADD FOREIGN KEY (batch_id) REFERENCES anchor_batch (batch_id)"))
+        partitions = ensure_partitions(conn, first, next_month(now))
+        partitions += ensure_upcoming_partitions(conn)
+        # rows outside every monthly range (clock skew, partitions not created in time)
+        conn.execute(db.text("CREATE TABLE provenance_log_default PARTITION OF provenance_log DEFAULT"))
+        copied = conn.execute(db.text("INSERT INTO provenance_log SELECT * FROM provenance_log_unpartitioned")).rowcount
+        conn.execute(db.text("DROP TABLE provenance_log_unpartitioned"))
+        conn.execute(db.text(f"ALTER SEQUENCE {sequence} OWNED BY provenance_log.log_id"))
+        for index in ProvenanceLog.__table__.indexes:
+            index.create(conn)
+    print(f"🗓️ provenance_log partitioned by month: {partitions} partitions, {copied} rows copied")
+
+
+def archive_month(start, end, table_name=None):
+    """
+    Move the provenance rows created in [start, end) (of one table, or all)
+    into a new segment file, register it and queue its checksum for
+    anchoring. Skipped while any of those rows is still waiting to be
+    anchored. Returns the ArchiveSegment (None if nothing was archived).
+    """
+    filters = [ProvenanceLog.created_at >= start, ProvenanceLog.created_at < end]
+    if table_name is not None:
+        filters.append(ProvenanceLog.table_name == table_name)
+    unsettled = ProvenanceLog.query.filter(*filters, ProvenanceLog.anchor_status.notin_(SETTLED_STATES)).count()
+    if unsettled:
+        print(f"⏳ {start:%Y-%m}: {unsettled} rows are not anchored yet, month skipped")
+        return None
+    rows = ProvenanceLog.query.filter(*filters).order_by(ProvenanceLog.log_id.asc()).all()
+    if not rows:
+        return None
+    if sqlite_reuses_log_ids() and rows[-1].log_id == db.session.query(db.func.max(ProvenanceLog.log_id)).scalar():
+        print(f"⚠️ {start:%Y-%m}: this SQLite provenance_log (created without AUTOINCREMENT) would hand out "
+              f"log {rows[-1].log_id} again once it is archived, month skipped until newer entries exist")
+        return None
+
+    by_id, memo, rows_by_key = {p.log_id: p for p in rows}, {}, {}
+    for p in rows:
+        payload = entry_payload(p, by_id, memo)
+        if payload is None and p.payload_encoding is not None:
+            print(f"⚠️ {start:%Y-%m}: payload of provenance log {p.log_id} cannot be decoded, month skipped")
+            return None
+        key = archive_key(p.record_pk, p.table_name)
+        row = {c: getattr(p, c) for c in ARCHIVED_COLUMNS}
+        row.update({c: iso_utc(row[c]) for c in ARCHIVED_DATETIMES}, payload=payload, _key=key)
+        rows_by_key.setdefault(key, []).append(row)
+
+    now = datetime.now(timezone.utc)
+    scope = table_name or "all"
+    file_name = f"provenance-{scope}-{start:%Y-%m}-{now:%Y%m%dT%H%M%S%f}.seg"
+    path = os.path.join(get_archive().directory, file_name)
+    os.makedirs(get_archive().directory, exist_ok=True)
+    checksum = provenance_archive.write_segment(path, rows_by_key, {
+        "table_name": table_name,
+        "period_start": iso_utc(start),
+        "period_end": iso_utc(end),
+        "rows": len(rows),
+        "records": len(rows_by_key),
+        "min_log_id": rows[0].log_id,
+        "max_log_id": rows[-1].log_id,
+    })
+
+    try:
+        sync = ANCHOR_MODE == "sync"
+        batch = AnchorBatch(
+            merkle_root=checksum,
+            leaf_count=len(rows),
+            created_at=now,
+            anchor_status="submitting" if sync else "pending",
+            anchor_attempts=0,
+            anchor_next_at=now + timedelta(seconds=ANCHOR_LEASE_SECONDS) if sync else now
+        )
+        db.session.add(batch)
+        db.session.flush()  # get batch.batch_id
+        segment = ArchiveSegment(
+            file_name=file_name, table_name=table_name, period_start=start, period_end=end,
+            min_log_id=rows[0].log_id, max_log_id=rows[-1].log_id, row_count=len(rows),
+            record_count=len(rows_by_key), sha256=checksum, batch_id=batch.batch_id, created_at=now,
+        )
+        db.session.add(segment)
+        partition = partition_name(start)
+        conn = db.session.connection()
+        if (table_name is None and end == next_month(start) and provenance_log_partitioned(conn)
+                and conn.execute(db.text("SELECT to_regclass(:name)"), {"name": partition}).scalar() is not None):
+            # whole month of every table: drop the partition instead of deleting row by row
+            conn.execute(db.text(f"DROP TABLE {partition}"))
+        else:
+            ids = [p.log_id for p in rows]
+            for i in range(0, len(ids), 1000):
+                ProvenanceLog.query.filter(ProvenanceLog.log_id.in_(ids[i:i + 1000])).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.chmod(path, 0o644)
+        os.remove(path)
+        raise
+    if sync:
+        anchor_merkle_batch(batch)
+    return segment
+
+
+@bp.cli.command('archive-provenance')
+@click.option('--before', required=True, type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Archive whole calendar months (UTC) that end on or before this date.')
+@click.option('--table-name', default=None, help='Only archive entries of this table (default: all tables).')
+def archive_provenance_command(before, table_name):
+    """Move settled provenance rows of old months into immutable, anchored segment files in ARCHIVE_DIR."""
+    ensure_schema()
+    before = as_utc(before)
+    filters = [ProvenanceLog.created_at < before]
+    if table_name is not None:
+        filters.append(ProvenanceLog.table_name == table_name)
+    oldest = db.session.query(db.func.min(ProvenanceLog.created_at)).filter(*filters).scalar()
+    month, segments = (month_start(oldest) if oldest else before), 0
+    cut = min(month_start(before), datetime.now(timezone.utc))
+    latest = nearest_checkpoint(cut)
+    if oldest and table_name in (None, CONTRACT_KEYED_TABLE) and (latest is None or as_utc(latest.as_of) < cut):
+        # point-in-time reads after the archived months then start here instead of at their entries
+        checkpoint = take_checkpoint(cut)
+        if checkpoint is not None:
+            print(f"📸 Checkpoint {checkpoint.checkpoint_id} as of {iso_utc(checkpoint.as_of)} taken before archiving")
+    while next_month(month) <= before:
+        # (a month that has not ended yet is archived up to the checkpoint)
+        segment = archive_month(month, min(next_month(month), cut), table_name)
+        if segment is not None:
+            segments += 1
+            print(f"🧊 {month:%Y-%m}: {segment.row_count} rows of {segment.record_count} records -> "
+                  f"{segment.file_name} (sha256 {segment.sha256[:16]}…, anchor batch {segment.batch_id})")
+        month = next_month(month)
+    with db.engine.begin() as conn:
+        ensure_upcoming_partitions(conn)
+    print(f"✅ {segments} archive segments written")
+
+
+@bp.cli.command('verify-archive')
+def verify_archive_command():
+    """Check every archive segment file against its recorded and its anchored SHA-256."""
+    ensure_schema()
+    segments = ArchiveSegment.query.order_by(ArchiveSegment.segment_id.asc()).all()
+    roots, = read_chain_in_chunks(
+        ({s.batch_id for s in segments if s.batch_id is not None}, 'getBatchRoots', 'getBatchRoot', root_is_set))
+    problems = 0
+    for s in segments:
+        path = os.path.join(get_archive().directory, s.file_name)
+        root = roots.get(s.batch_id)
+        if not os.path.exists(path):
+            problem = "file is missing"
+        elif provenance_archive.file_checksum(path) != s.sha256:
+            problem = "file contents changed (checksum mismatch)"
+        elif root is not None and any(root) and root.hex() != s.sha256:
+            problem = "recorded checksum differs from the anchored one"
+        elif root is None or not any(root):
+            print(f"⏳ {s.file_name}: intact, checksum not anchored yet")
+            continue
+        else:
+            print(f"✅ {s.file_name}: intact and anchored ({s.row_count} rows)")
+            continue
+        problems += 1
+        print(f"❌ {s.file_name}: {problem}")
+    print(f"{'❌' if problems else '✅'} {len(segments)} segments checked, {problems} problems")
+    if problems:
+        raise SystemExit(1)
+
+# -------------------------------
+# Blockchain anchoring (outbox)
+# -------------------------------
+
+# provenance operation code -> operation name sent to logAction()
+OPERATION_NAMES = {"I": "INSERT", "U": "UPDATE", "D": "DELETE"}
+
+# rows the outbox workers may pick up ('submitting' only once its lease expired)
+OUTBOX_STATES = ("pending", "submitting")
+# + transactions sent but not confirmed yet
+UNCONFIRMED_STATES = OUTBOX_STATES + ("sent",)
+# entries whose hash is not on-chain yet (but will be)
+ANCHOR_WAITING_STATES = UNCONFIRMED_STATES + ("batched",)
+# the contract keys single hashes (logAction / getRecordHash) by record id, so
+# only this table's entries are anchored one by one; entries of other tables
+# captured by provenance_capture.py always go into Merkle batches
+CONTRACT_KEYED_TABLE = "record"
+
+anchor_stop = threading.Event()
+anchor_threads = []
+
+def get_chain():
+    """The app's lazily connected node/contract access (see chain_client.py)."""
+    return current_app.extensions['chain']
+
+
+def root_is_set(root):
+    """getBatchRoot() results worth caching: an unset (zero) root may still be anchored later."""
+    return any(root)
+
+
+def view_is_unset(name, value):
+    """True for what a single-id view returns for an id the contract has nothing for (empty hash / zero root)."""
+    if name == "getRecordHash":
+        return not value
+    if name == "getBatchRoot":
+        return not any(value)
+    return False
+
+
+def decode_view(name, value):
+    """Record hashes as hex strings, whichever format the contract keeps them in (see hash_codec.py)."""
+    if name == "getRecordHash":
+        return hash_codec.decode(value)
+    if name == "getRecordHashes":
+        return [hash_codec.decode(v) for v in value]
+    return value
+
+
+async def read_view(chain, name, *args):
+    """One contract view call; a record hash or batch root unset in the contract is looked up in the legacy one."""
+    value = decode_view(name, await getattr(chain.async_contract.functions, name)(*args).call())
+    if chain.legacy_address and view_is_unset(name, value):
+        value = decode_view(name, await getattr(chain.legacy_async_contract.functions, name)(*args).call())
+    return value
+
+
+def chain_view(name, *args, cacheable=None):
+    """Call a contract view function through the on-chain read cache."""
+    chain = get_chain()
+    def load():
+        return chain.rpc.call(lambda: read_view(chain, name, *args))
+    return chain.reads.get((name, *args), load, cacheable)
+
+
+def local_nonces():
+    if ANCHOR_LOCAL_NONCES == 'auto':
+        return db.engine.dialect.name != 'sqlite'
+    return ANCHOR_LOCAL_NONCES == '1'
+
+
+def anchor_senders():
+    chain = get_chain()
+    return [chain.checksum(a) for a in ANCHOR_SENDERS] or [chain.default_account]
+
+
+async def send_transaction(fn, sender, nonce):
+    """Send a contract call from `sender` with a locally allocated nonce (None: node-assigned); returns the tx hash."""
+    tx = {"from": sender} if nonce is None else {"from": sender, "nonce": nonce}
+    for attempt in range(NONCE_GAP_RETRIES):
+        try:
+            return await fn.transact(tx)
+        except Exception as e:
+            if not nonce_manager.is_nonce_gap(e) or attempt == NONCE_GAP_RETRIES - 1:
+                raise
+            await asyncio.sleep(NONCE_GAP_RETRY_SECONDS * (attempt + 1))
+
+
+def send_transactions(calls):
+    """
+    Send contract calls as transactions, spread round-robin over the anchor
+    senders with locally allocated nonces. Each sender's transactions go out
+    back to back in nonce order, all senders concurrently; nothing waits for
+    receipts. Returns (tx hash or the exception that made it fail, sender,
+    nonce) per call.
+    """
+    chain = get_chain()
+    senders = anchor_senders()
+    assigned = [senders[i % len(senders)] for i in range(len(calls))]
+    if local_nonces():
+        allocated = {s: iter(chain.nonces.allocate(s, assigned.count(s))) for s in set(assigned)}
+        assigned = [(s, next(allocated[s])) for s in assigned]
+    else:
+        assigned = [(s, None) for s in assigned]
+
+    streams = {}
+    for i, (fn, (sender, nonce)) in enumerate(zip(calls, assigned)):
+        streams.setdefault(sender, []).append((i, fn, nonce))
+
+    async def send_stream(sender, items):
+        out, failed = [], None
+        for i, fn, nonce in items:
+            if failed is not None:
+                # later nonces cannot be mined before the failed one anyway
+                out.append((i, RuntimeError(f"not sent: nonce {failed} of {sender} failed")))
+                continue
+            try:
+                out.append((i, await send_transaction(fn, sender, nonce)))
+            except Exception as e:
+                out.append((i, e))
+                failed = nonce
+        return out
+
+    results = [None] * len(calls)
+    for stream in chain.rpc.gather([functools.partial(send_stream, s, items) for s, items in streams.items()]):
+        for i, result in stream:
+            results[i] = result
+
+    # the unsent nonces after a failure would leave a hole the node waits on
+    # forever: hand them back, or resync if the node rejected the nonce itself
+    for sender, items in streams.items() if local_nonces() else ():
+        failed = next(((nonce, results[i]) for i, _, nonce in items if isinstance(results[i], Exception)), None)
+        if failed is None:
+            continue
+        first_unused, error = failed
+        allocated_to = items[-1][2] + 1
+        try:
+            if nonce_manager.is_nonce_error(error):
+                chain.nonces.resync(sender, allocated_to=allocated_to)
+            else:
+                chain.nonces.release(sender, first_unused, allocated_to)
+        except Exception as e:
+            log.warning("⚠️ Nonce resync for %s failed: %s", sender, e)
+    return [(r, s, n) for r, (s, n) in zip(results, assigned)]
+
+
+def transact_and_wait(fn):
+    """Send a contract call as a transaction, wait for it to be mined and return the receipt."""
+    with stage("transact"):
+        tx_hash, _, _ = send_transactions([fn])[0]
+    if isinstance(tx_hash, Exception):
+        raise tx_hash
+    rpc = get_chain().rpc
+    with stage("receipt_wait"):
+        receipt = rpc.call(lambda: rpc.w3.eth.wait_for_transaction_receipt(tx_hash))
+    if receipt.status != 1:
+        raise RuntimeError(f"transaction {receipt.transactionHash.hex()} reverted")
+    return receipt
+
+
+def anchor_call(prov):
+    """logAction() call for one provenance row."""
+    chain = get_chain()
+    return chain.async_contract.functions.logAction(
+        int(prov.record_pk),   # <-- use the record's ID as key
+        OPERATION_NAMES[prov.operation],
+        chain.codec.encode(prov.record_hash)   # hex string or bytes32, as the contract takes it
+    )
+
+
+def mark_anchored(prov, receipt):
+    prov.blockchain_tx = receipt.transactionHash.hex()
+    prov.anchor_status = "anchored"
+    prov.anchor_error = None
+    prov.anchor_next_at = None
+    live_events.add(db.session, [anchor_event(prov)])
+    ANCHORED.inc(kind="row")
+    record_id = int(prov.record_pk)
+    reads = get_chain().reads
+    reads.put(("getRecordHash", record_id), prov.record_hash, receipt.blockNumber)
+    reads.invalidate([("getRecordDetails", record_id)])
+
+
+def submit_anchor(prov):
+    """Send one provenance hash to the contract, wait for it and mark the row anchored."""
+    mark_anchored(prov, transact_and_wait(anchor_call(prov)))
+
+
+def schedule_retry(prov, error):
+    """Put a provenance row (or Merkle batch) back into the outbox with exponential backoff."""
+    prov.anchor_attempts = (prov.anchor_attempts or 0) + 1
+    prov.anchor_error = str(error)[:1000]
+    prov.blockchain_tx = None
+    kind = "batch" if isinstance(prov, AnchorBatch) else "row"
+    if prov.anchor_attempts >= ANCHOR_MAX_ATTEMPTS:
+        ANCHOR_FAILURES.inc(kind=kind, outcome="gave_up")
+        prov.anchor_status = "failed"
+        prov.anchor_next_at = None
+    else:
+        ANCHOR_FAILURES.inc(kind=kind, outcome="retry")
+        delay = min(ANCHOR_BACKOFF_MAX_SECONDS, ANCHOR_BACKOFF_SECONDS * 2 ** (prov.anchor_attempts - 1))
+        prov.anchor_status = "pending"
+        prov.anchor_next_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+    if kind == "row":
+        live_events.add(db.session, [anchor_event(prov, anchor_error=prov.anchor_error)])
+
+
+def anchor_or_enqueue(prov):
+    """
+    Anchor a new provenance row on-chain (sync mode) or leave it in the
+    outbox for the background workers (async mode).
+    Must be called before the surrounding commit.
+    """
+    prov.anchor_status = "pending"
+    prov.anchor_attempts = 0
+    prov.anchor_next_at = prov.created_at
+    if ANCHOR_MODE != "sync":
+        return
+
+    # Send hash to blockchain using record ID as key
+    try:
+        db.session.flush()  # get prov.log_id
+        submit_anchor(prov)
+    except Exception as e:
+        log.warning("⚠️ Blockchain logging failed, queued for retry: %s", e)
+        schedule_retry(prov, e)
+
+
+def claim_outbox_batch(limit):
+    """
+    Lock up to `limit` due outbox rows, mark them 'submitting' under a lease
+    and commit. Entries of one record are released strictly in log order, so
+    an older hash can never overwrite a newer one in the contract mapping.
+    """
+    now = datetime.now(timezone.utc)
+    older = aliased(ProvenanceLog)
+    blocked = (
+        db.session.query(older.log_id)
+        .filter(
+            older.table_name == ProvenanceLog.table_name,
+            older.record_pk == ProvenanceLog.record_pk,
+            older.log_id < ProvenanceLog.log_id,
+            older.anchor_status.in_(UNCONFIRMED_STATES),
+        )
+        .exists()
+    )
+    rows = (
+        ProvenanceLog.query
+        .filter(
+            ProvenanceLog.anchor_status.in_(OUTBOX_STATES),
+            ProvenanceLog.anchor_next_at <= now,
+            ProvenanceLog.table_name == CONTRACT_KEYED_TABLE,
+            ~blocked,
+        )
+        .order_by(ProvenanceLog.log_id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    lease_until = now + timedelta(seconds=ANCHOR_LEASE_SECONDS)
+    for prov in rows:
+        prov.anchor_status = "submitting"
+        prov.anchor_next_at = lease_until
+    db.session.commit()
+    return rows
+
+
+def superseded(prov):
+    """True (and marks the row) if a newer entry of the same record is already anchored."""
+    newer_anchored = (
+        ProvenanceLog.query
+        .filter(
+            ProvenanceLog.table_name == prov.table_name,
+            ProvenanceLog.record_pk == prov.record_pk,
+            ProvenanceLog.log_id > prov.log_id,
+            ProvenanceLog.anchor_status == "anchored",
+        )
+        .first()
+    )
+    if newer_anchored:
+        # the contract keeps only the latest hash per record; anchoring this
+        # one now would roll the on-chain state back
+        prov.anchor_status = "superseded"
+        prov.anchor_next_at = None
+        live_events.add(db.session, [anchor_event(prov)])
+        return True
+    return False
+
+
+def drain_outbox_once(limit=ANCHOR_BATCH_SIZE):
+    """
+    Claim one batch of due outbox rows and send their transactions
+    concurrently (claimed rows always belong to different records) without
+    waiting for receipts: the rows become 'sent' and track_receipts_once()
+    confirms them. Returns how many rows were processed.
+    """
+    rows = claim_outbox_batch(limit)
+    to_send = [prov for prov in rows if not superseded(prov)]
+    receipt_deadline = datetime.now(timezone.utc) + timedelta(seconds=ANCHOR_RECEIPT_TIMEOUT_SECONDS)
+    for prov, (result, sender, nonce) in zip(to_send, send_transactions([anchor_call(p) for p in to_send])):
+        if isinstance(result, Exception):
+            log.warning("⚠️ Anchoring log %s failed (attempt %s): %s", prov.log_id, (prov.anchor_attempts or 0) + 1, result)
+            schedule_retry(prov, result)
+        else:
+            prov.blockchain_tx = result.hex()
+            prov.anchor_status = "sent"
+            prov.anchor_sender = sender
+            prov.anchor_nonce = nonce
+            prov.anchor_next_at = receipt_deadline
+            live_events.add(db.session, [anchor_event(prov)])
+    db.session.commit()
+    return len(rows)
+
+
+def track_receipts_once(limit=ANCHOR_BATCH_SIZE):
+    """
+    Look up receipts of 'sent' rows concurrently. Mined rows become
+    'anchored', reverted ones go back into the outbox. A row still without a
+    receipt after its deadline was dropped (its nonce is unused on-chain: the
+    sender is resynced) or replaced (another tx took the nonce); either way it
+    is sent again. Returns how many rows were settled.
+    """
+    rows = (
+        ProvenanceLog.query
+        .filter(ProvenanceLog.anchor_status == "sent")
+        .order_by(ProvenanceLog.log_id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    chain = get_chain()
+    rpc = chain.rpc
+
+    async def receipt_or_none(tx_hash):
+        try:
+            return await rpc.w3.eth.get_transaction_receipt(tx_hash)
+        except chain.TransactionNotFound:
+            return None
+
+    receipts = rpc.gather([functools.partial(receipt_or_none, HexBytes(p.blockchain_tx)) for p in rows], return_exceptions=True)
+    now = datetime.now(timezone.utc)
+    overdue = [p for p, r in zip(rows, receipts) if r is None and as_utc(p.anchor_next_at) <= now]
+    senders = sorted({p.anchor_sender for p in overdue})
+    mined_counts = dict(zip(senders, rpc.gather(
+        [functools.partial(rpc.w3.eth.get_transaction_count, s, "latest") for s in senders]
+    )))
+
+    settled, dropped_senders = 0, set()
+    for prov, receipt in zip(rows, receipts):
+        if isinstance(receipt, Exception):
+            log.warning("⚠️ Receipt lookup for log %s failed: %s", prov.log_id, receipt)
+        elif receipt is not None:
+            if receipt.status == 1:
+                mark_anchored(prov, receipt)
+            else:
+                schedule_retry(prov, f"transaction {prov.blockchain_tx} reverted")
+            settled += 1
+        elif prov in overdue:
+            if prov.anchor_nonce is not None and mined_counts[prov.anchor_sender] > prov.anchor_nonce:
+                schedule_retry(prov, f"transaction {prov.blockchain_tx} replaced (nonce {prov.anchor_nonce} used by another tx)")
+            else:
+                schedule_retry(prov, f"transaction {prov.blockchain_tx} dropped")
+                dropped_senders.add(prov.anchor_sender)
+            settled += 1
+    db.session.commit()
+    for sender in dropped_senders if local_nonces() else ():
+        chain.nonces.resync(sender, force=True)
+    return settled
+
+
+def claim_merkle_leaves(other_tables=False):
+    """
+    Lock the next window of unbatched outbox rows (other_tables=True: only
+    rows of tables other than CONTRACT_KEYED_TABLE). Returns [] (and releases
+    the lock) until either ANCHOR_MERKLE_SIZE rows are waiting or the oldest
+    one has waited ANCHOR_MERKLE_WINDOW_SECONDS.
+    """
+    now = datetime.now(timezone.utc)
+    filters = [
+        ProvenanceLog.anchor_status.in_(OUTBOX_STATES),
+        ProvenanceLog.anchor_next_at <= now,
+        ProvenanceLog.batch_id.is_(None),
+    ]
+    if other_tables:
+        filters.append(ProvenanceLog.table_name != CONTRACT_KEYED_TABLE)
+    rows = (
+        ProvenanceLog.query
+        .filter(*filters)
+        .order_by(ProvenanceLog.log_id.asc())
+        .limit(ANCHOR_MERKLE_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    window_open = rows and as_utc(rows[0].created_at) > now - timedelta(seconds=ANCHOR_MERKLE_WINDOW_SECONDS)
+    if not rows or (len(rows) < ANCHOR_MERKLE_SIZE and window_open):
+        db.session.rollback()
+        return []
+    return rows
+
+
+def seal_merkle_batch(entries, lease=True):
+    """
+    Build the Merkle tree over `entries` ((log_id, record_hash) pairs), store
+    the batch and every row's proof, and commit.
+    With lease=True the caller anchors the batch right away; otherwise it is
+    left 'pending' for the outbox workers.
+    """
+    now = datetime.now(timezone.utc)
+    root, proofs = merkle.build_tree([rhash for _, rhash in entries])
+    batch = AnchorBatch(
+        merkle_root=root,
+        leaf_count=len(entries),
+        created_at=now,
+        anchor_status="submitting" if lease else "pending",
+        anchor_attempts=0,
+        anchor_next_at=now + timedelta(seconds=ANCHOR_LEASE_SECONDS) if lease else now
+    )
+    db.session.add(batch)
+    db.session.flush()  # get batch.batch_id
+    db.session.execute(db.update(ProvenanceLog), [
+        {
+            "log_id": log_id,
+            "batch_id": batch.batch_id,
+            "merkle_proof": proof,
+            "anchor_status": "batched",
+            "anchor_next_at": None,
+        }
+        for (log_id, _), proof in zip(entries, proofs)
+    ])
+    db.session.commit()
+    return batch
+
+
+def claim_due_batches(limit=ANCHOR_BATCH_SIZE):
+    """Lock Merkle batches whose anchoring is due for a (re)try and lease them."""
+    now = datetime.now(timezone.utc)
+    batches = (
+        AnchorBatch.query
+        .filter(AnchorBatch.anchor_status.in_(OUTBOX_STATES), AnchorBatch.anchor_next_at <= now)
+        .order_by(AnchorBatch.batch_id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for batch in batches:
+        batch.anchor_status = "submitting"
+        batch.anchor_next_at = now + timedelta(seconds=ANCHOR_LEASE_SECONDS)
+    db.session.commit()
+    return batches
+
+
+def anchor_merkle_batch(batch):
+    """Anchor a sealed batch root with anchorBatch() and mark all its rows anchored."""
+    try:
+        root = bytes.fromhex(batch.merkle_root)
+        try:
+            receipt = transact_and_wait(get_chain().async_contract.functions.anchorBatch(
+                batch.batch_id,
+                root,
+                batch.leaf_count
+            ))
+            get_chain().reads.put(("getBatchRoot", batch.batch_id), root, receipt.blockNumber)
+            tx = receipt.transactionHash.hex()
+        except Exception as e:
+            # contracts deployed before anchorBatch() accepted its own root again:
+            # an earlier attempt went through, only its receipt got lost
+            if "batch already anchored" not in str(e) or chain_view("getBatchRoot", batch.batch_id, cacheable=root_is_set) != root:
+                raise
+            tx = batch.blockchain_tx
+        batch.blockchain_tx = tx
+        batch.anchor_status = "anchored"
+        batch.anchor_error = None
+        batch.anchor_next_at = None
+        rows = ProvenanceLog.query.filter_by(batch_id=batch.batch_id).update({
+            "blockchain_tx": tx,
+            "anchor_status": "anchored",
+            "anchor_error": None,
+        })
+        live_events.add(db.session, [
+            anchor_event(p) for p in db.session.execute(
+                db.select(*[getattr(ProvenanceLog, f) for f in LIVE_STATUS_FIELDS])
+                .where(ProvenanceLog.batch_id == batch.batch_id)
+            )
+        ])
+        ANCHORED.inc(kind="batch")
+        ANCHORED.inc(rows, kind="row")
+    except Exception as e:
+        log.warning("⚠️ Anchoring Merkle batch %s failed (attempt %s): %s", batch.batch_id, (batch.anchor_attempts or 0) + 1, e)
+        schedule_retry(batch, e)
+    db.session.commit()
+
+
+def drain_batches_once():
+    """Anchor (or retry) Merkle batches that are due; returns how many were processed."""
+    batches = claim_due_batches()
+    for batch in batches:
+        anchor_merkle_batch(batch)
+    return len(batches)
+
+
+def drain_merkle_once(other_tables=False):
+    """Seal and anchor a new Merkle batch if its size or time window is full."""
+    rows = claim_merkle_leaves(other_tables)
+    if not rows:
+        return 0
+    anchor_merkle_batch(seal_merkle_batch([(p.log_id, p.record_hash) for p in rows]))
+    return 1
+
+
+def anchor_bulk(entries):
+    """
+    Anchor provenance rows written by one bulk request together as a single
+    Merkle batch: inline in sync mode, by the outbox workers otherwise.
+    Commits the session. Returns the batch (None if there was nothing to anchor).
+    """
+    if not entries:
+        db.session.commit()
+        return None
+    batch = seal_merkle_batch(entries, lease=ANCHOR_MODE == "sync")
+    if ANCHOR_MODE == "sync":
+        anchor_merkle_batch(batch)
+    return batch
+
+
+def batch_onchain_hash(prov, prov_hash_recomputed):
+    """
+    Resolve which provenance hash the on-chain Merkle root of prov's batch
+    commits to, so verification can compare it like a getRecordHash() result.
+    Returns None if the batch root is not on-chain (yet).
+    """
+    root = chain_view("getBatchRoot", prov.batch_id, cacheable=root_is_set)
+    return resolve_batch_hash(prov, prov_hash_recomputed, root)
+
+
+def resolve_batch_hash(prov, prov_hash_recomputed, root):
+    """batch_onchain_hash() for an already fetched batch root."""
+    if not any(root):
+        return None
+    # neither the recomputed nor the stored hash under the anchored root: "merkle-root:<root>"
+    return hash_pool.proven_hash((prov_hash_recomputed, prov.record_hash), prov.merkle_proof, root.hex())
+
+
+last_heartbeats = {}
+
+
+def heartbeat(kind):
+    """Note in worker_heartbeat that this process's `kind` worker is alive (at most every WORKER_HEARTBEAT_SECONDS)."""
+    now = time.monotonic()
+    if now - last_heartbeats.get(kind, float('-inf')) < WORKER_HEARTBEAT_SECONDS:
+        return
+    last_heartbeats[kind] = now
+    stmt = dialect_insert(WorkerHeartbeat).values(
+        worker=f"{socket.gethostname()}:{os.getpid()}", kind=kind, beat_at=datetime.now(timezone.utc))
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['worker', 'kind'], set_={'beat_at': stmt.excluded.beat_at}))
+    db.session.commit()
+
+
+def anchor_worker_loop(app):
+    if ANCHOR_MODE == "merkle":
+        drain_once = drain_merkle_once
+    else:
+        def drain_once():
+            return drain_outbox_once() + drain_merkle_once(other_tables=True)
+    while not anchor_stop.is_set():
+        processed = 0
+        try:
+            with app.app_context():
+                ensure_schema()
+                processed = drain_batches_once() + drain_once() + track_receipts_once()
+                maybe_checkpoint()
+                heartbeat("anchor")
+        except Exception as e:
+            log.exception("⚠️ Anchor worker error: %s", e)
+        if not processed:
+            anchor_stop.wait(ANCHOR_POLL_SECONDS)
+
+
+def start_anchor_workers(app, count=ANCHOR_WORKERS):
+    """Start the background pool that drains the anchoring outbox."""
+    for i in range(count):
+        t = threading.Thread(target=anchor_worker_loop, args=(app,), name=f"anchor-worker-{i}", daemon=True)
+        t.start()
+        anchor_threads.append(t)
+    return anchor_threads
+
+
+@bp.cli.command('anchor-worker')
+def anchor_worker_command():
+    """Run the outbox workers in the foreground (separate process deployment)."""
+    print(f"⛓️ Starting {ANCHOR_WORKERS} anchor workers")
+    start_anchor_workers(current_app._get_current_object())
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        anchor_stop.set()
+
+
+@bp.cli.command('anchor-retry')
+def anchor_retry_command():
+    """Move provenance rows and Merkle batches whose anchoring permanently failed back into the outbox."""
+    requeue = {
+        "anchor_status": "pending",
+        "anchor_attempts": 0,
+        "anchor_next_at": datetime.now(timezone.utc),
+    }
+    ensure_schema()
+    count = ProvenanceLog.query.filter_by(anchor_status="failed").update(requeue)
+    batches = AnchorBatch.query.filter_by(anchor_status="failed").update(requeue)
+    db.session.commit()
+    print(f"🔁 Re-queued {count} provenance rows and {batches} Merkle batches for anchoring")
+
+
+@bp.cli.command('nonce-resync')
+def nonce_resync_command():
+    """Reset the local nonce counters of all anchor senders to their pending tx count on the chain."""
+    ensure_schema()
+    for sender in anchor_senders():
+        print(f"🔢 {sender}: next nonce {get_chain().nonces.resync(sender, force=True)}")
+
+# -------------------------------
+# Blockchain event indexer
+# Tails RecordLogged events from a saved block checkpoint into chain_event,
+# so the /history blockchain fallback is a local indexed query.
+# -------------------------------
+
+indexer_stop = threading.Event()
+indexer_threads = []
+
+
+def block_timestamps(block_numbers):
+    """{block_number: aware UTC datetime}; uncached blocks are fetched concurrently."""
+    chain = get_chain()
+    out, missing = {}, []
+    for n in set(block_numbers):
+        ts = chain.block_timestamps.get(n)
+        if ts is None:
+            missing.append(n)
+        else:
+            out[n] = ts
+    blocks = chain.rpc.gather([functools.partial(chain.rpc.w3.eth.get_block, n) for n in missing])
+    for n, blk in zip(missing, blocks):
+        out[n] = datetime.fromtimestamp(blk["timestamp"], tz=timezone.utc)
+        chain.block_timestamps.put(n, out[n])
+    return out
+
+
+def chain_event_rows(logs):
+    """RecordLogged logs as chain_event column dicts."""
+    timestamps = block_timestamps(log["blockNumber"] for log in logs)
+    return [
+        {
+            "block_number": log["blockNumber"],
+            "log_index": log["logIndex"],
+            "tx_hash": log["transactionHash"].hex(),
+            "record_id": log["args"]["recordId"],
+            "operation": log["args"]["operation"],
+            "record_hash": hash_codec.decode(log["args"]["recordHash"]),
+            "block_timestamp": timestamps[log["blockNumber"]],
+        }
+        for log in logs
+    ]
+
+
+def record_events_since(record_id, from_block, to_block):
+    """
+    RecordLogged events of one record in blocks the index has not reached
+    yet, read from the node with recordId-filtered eth_getLogs calls of at
+    most INDEXER_CHUNK_BLOCKS blocks. Nothing is stored.
+    """
+    chain = get_chain()
+    logs = []
+    for start in range(from_block, to_block + 1, INDEXER_CHUNK_BLOCKS):
+        end = min(to_block, start + INDEXER_CHUNK_BLOCKS - 1)
+        for contract in chain.event_contracts:
+            logs.extend(contract.events.RecordLogged().get_logs(
+                from_block=start, to_block=end, argument_filters={"recordId": record_id}))
+    return chain_event_rows(logs)
+
+
+def index_chain_events(max_blocks=INDEXER_CHUNK_BLOCKS):
+    """
+    Store RecordLogged events from the block after the checkpoint up to the
+    chain head (at most `max_blocks` blocks) and move the checkpoint.
+    Returns the number of blocks scanned; 0 if up to date or if another
+    indexer currently holds the checkpoint.
+    """
+    chain = get_chain()
+    cp = (
+        IndexerCheckpoint.query
+        .filter_by(name=INDEXER_CHECKPOINT_NAME)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if cp is None:
+        if db.session.get(IndexerCheckpoint, INDEXER_CHECKPOINT_NAME) is not None:
+            db.session.rollback()   # locked by another indexer
+            return 0
+        cp = IndexerCheckpoint(name=INDEXER_CHECKPOINT_NAME, block_number=INDEXER_START_BLOCK - 1)
+        db.session.add(cp)
+
+    start = cp.block_number + 1
+    end = min(chain.w3.eth.block_number - INDEXER_CONFIRMATIONS, start + max_blocks - 1)
+    if end < start:
+        db.session.rollback()
+        return 0
+
+    # the legacy contract (if any) no longer gets new events, but a fresh index still needs its old ones
+    logs = [
+        log
+        for contract in chain.event_contracts
+        for log in contract.events.RecordLogged().get_logs(from_block=start, to_block=end)
+    ]
+    rows = chain_event_rows(logs)
+    if rows:
+        db.session.execute(
+            dialect_insert(ChainEvent).values(rows).on_conflict_do_nothing(index_elements=['tx_hash', 'log_index'])
+        )
+    cp.block_number = end
+    cp.updated_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+    # every change to per-record hashes up to `end` is now known: drop only what changed
+    touched = {r["record_id"] for r in rows}
+    chain.reads.apply_events(start, end, [(view, rid) for rid in touched for view in ("getRecordHash", "getRecordDetails")])
+    return end - start + 1
+
+
+def event_indexer_loop(app):
+    while not indexer_stop.is_set():
+        scanned = 0
+        try:
+            with app.app_context():
+                ensure_schema()
+                scanned = index_chain_events()
+                heartbeat("indexer")
+        except Exception as e:
+            log.exception("⚠️ Event indexer error: %s", e)
+        if not scanned:
+            indexer_stop.wait(INDEXER_POLL_SECONDS)
+
+
+def start_event_indexer(app):
+    """Start the background thread that keeps chain_event up to date."""
+    t = threading.Thread(target=event_indexer_loop, args=(app,), name="event-indexer", daemon=True)
+    t.start()
+    indexer_threads.append(t)
+    return t
+
+
+@bp.cli.command('index-events')
+@click.option('--follow', is_flag=True, help='Keep tailing new blocks after catching up.')
+def index_events_command(follow):
+    """Index RecordLogged events from the saved checkpoint up to the chain head."""
+    ensure_schema()
+    total = 0
+    while True:
+        scanned = index_chain_events()
+        total += scanned
+        if not scanned:
+            if not follow:
+                break
+            time.sleep(INDEXER_POLL_SECONDS)
+    cp = db.session.get(IndexerCheckpoint, INDEXER_CHECKPOINT_NAME)
+    print(f"✅ Indexed {total} blocks, checkpoint at block {cp.block_number if cp else None}")
+
+# -------------------------------
+# Read replicas (see RoutingSession): read-only endpoints are decorated with
+# @read_replica; writes and read-your-writes stay on the primary.
+# -------------------------------
+
+REPLICA_BIND_PREFIX = "replica"
+
+
+def replica_binds(app=None):
+    """Bind keys of the configured read replicas (SQLALCHEMY_BINDS keys starting with "replica")."""
+    binds = (app or current_app).config.get('SQLALCHEMY_BINDS') or {}
+    return sorted(k for k in binds if k and k.startswith(REPLICA_BIND_PREFIX))
+
+
+def wrote_recently():
+    """Whether this client wrote within READ_REPLICA_STICKY_SECONDS (sticky-primary cookie)."""
+    try:
+        return float(request.cookies.get(READ_REPLICA_STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_replica(view):
+    """Serve a read-only endpoint from a read replica, if any is configured."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas = current_app.extensions['read_replicas']
+        if replicas and not wrote_recently():
+            db.session.info["replica"] = random.choice(replicas)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@bp.after_app_request
+def stick_to_primary(response):
+    # after a write, this client's next reads go to the primary until replicas caught up
+    if current_app.extensions['read_replicas'] and db.session.registry.has() and db.session.info.get("wrote"):
+        response.set_cookie(READ_REPLICA_STICKY_COOKIE, f"{time.time() + READ_REPLICA_STICKY_SECONDS:.3f}",
+                            max_age=max(1, int(READ_REPLICA_STICKY_SECONDS) + 1), httponly=True, samesite="Lax")
+    return response
+
+
+# -------------------------------
+# Routes
+# -------------------------------
+@bp.route('/')
+def home():
+    return "✅ CRUD API for Records is active!"
+
+
+# -------------------------------
+# Automatic provenance capture (see provenance_capture.py): every ORM flush
+# that inserts, updates or deletes a registered model writes the provenance
+# rows of all its changes with one INSERT ... RETURNING, in the same
+# transaction. New tables only need a capture.register() call.
+# -------------------------------
+
+def write_captured_provenance(session, changes):
+    """after_flush callback: hash the flush's changes and insert their provenance rows at once."""
+    default_user = session.info.get('provenance_user')
+    unattributed = next((c for c in changes if not (c.user or default_user)), None)
+    if unattributed:
+        raise RuntimeError(f"{unattributed.table_name} {unattributed.record_pk} changed without a provenance user "
+                           f"(call provenance_user() before the flush)")
+    timestamp_now = datetime.now(timezone.utc)
+    prov_rows = []
+    for table_name in dict.fromkeys(c.table_name for c in changes):
+        group = [c for c in changes if c.table_name == table_name]
+        # a new record starts its own hash chain (no prev_hash) and has no diff base
+        existing = [c.record_pk for c in group if c.operation != "I"]
+        prev_hashes = chain_prev_hashes(existing, table_name)
+        bases = latest_provenances(existing, table_name) if PROVENANCE_PAYLOAD_ENCODING == payload_codec.DIFF else {}
+        with stage("hash"):
+            for c in group:
+                user = c.user or default_user
+                prev_hash = prev_hashes.get(c.record_pk)
+                values = provenance_values(c.record_pk, c.operation, c.payload, user, timestamp_now, table_name,
+                                           prev_hash=prev_hash, base=bases.get(c.record_pk))
+                log_provenance_entry(provenance_object(table_name, c.record_pk, c.operation, c.payload, user,
+                                                       timestamp_now, prev_hash), values['record_hash'])
+                prov_rows.append(values)
+    # the returned rows carry their own columns, so no parameter-order sorting
+    # is needed (with it SQLite would insert row by row)
+    entries = sorted(session.scalars(db.insert(ProvenanceLog).returning(ProvenanceLog), prov_rows).all(),
+                     key=lambda p: p.log_id)
+    # move the records' provenance heads in the same transaction
+    advance_heads(entries)
+    session.info.setdefault('provenance_entries', []).extend(entries)
+    live_events.add(session, [provenance_event(p) for p in entries])
+
+
+capture = provenance_capture.ProvenanceCapture(write_captured_provenance)
+capture.register(Record, "record", ("id", "data"))
+capture.register(BlobRecord, "blob_record", ("id", "name", "content_type", "content_digest", "size"))
+capture.listen(db.session)
+
+
+def provenance_user(user, obj=None):
+    """
+    User the provenance entries of this session's following flushes are
+    attributed to; with `obj`, only the next captured change of that object.
+    """
+    if obj is not None:
+        provenance_capture.attribute(obj, user)
+    else:
+        db.session.info['provenance_user'] = user
+
+
+def anchor_captured():
+    """
+    Anchor the provenance rows captured since the last call, before the
+    commit: rows of CONTRACT_KEYED_TABLE one by one (inline in sync mode, or
+    left in the outbox), rows of other tables as one Merkle batch. Returns
+    the captured rows in flush order.
+    """
+    entries = db.session.info.pop('provenance_entries', [])
+    for prov in entries:
+        if prov.table_name == CONTRACT_KEYED_TABLE:
+            anchor_or_enqueue(prov)
+    others = [(p.log_id, p.record_hash) for p in entries if p.table_name != CONTRACT_KEYED_TABLE]
+    if others:
+        anchor_bulk(others)
+    return entries
+
+
+# -------------------------------
+# CRUD endpoints (create / update / delete)
+# The record change is flushed; its provenance row comes from the capture hooks
+# -------------------------------
+
+# Create
+@bp.route('/add', methods=['POST'])
+def add_record():
+    data = request.json.get('data')
+    user = request.json.get('user')
+    if not data:
+        return jsonify({'error':'data required'}), 400
+    if not user:
+        return jsonify({'error':'user is required in request body'}), 400
+
+    # create record (the flush also writes its provenance row and moves its head)
+    provenance_user(user)
+    new_record = Record(data=data, modified_by=user)
+    db.session.add(new_record)
+    with stage("db_flush"):
+        db.session.flush()
+
+    # anchor inline (sync) or leave it in the outbox (async)
+    prov = anchor_captured()[-1]
+
+    # Commit everything
+    with stage("commit"):
+        db.session.commit()
+
+    return jsonify({
+        'message': 'Record added',
+        'id': new_record.id,
+        'prov_log_id': prov.log_id,
+        'blockchain_tx': prov.blockchain_tx,
+        'anchor_status': prov.anchor_status
+    }), 201
+
+
+# Read
+def record_json(r):
+    return {
+        'id': r.id,
+        'data': r.data,
+        'modified_by': r.modified_by,
+        'timestamp': iso_utc(r.timestamp)
+    }
+
+
+def records_query(after=None):
+    """Record columns ordered by id (keyset on id), optionally starting after an id."""
+    stmt = db.select(Record.id, Record.data, Record.modified_by, Record.timestamp).order_by(Record.id.asc())
+    if after is not None:
+        stmt = stmt.where(Record.id > after)
+    return stmt
+
+
+def stream_json_lines(rows, array=False):
+    """
+    Serialize rows one by one, flushing every RECORDS_STREAM_BATCH rows,
+    either as NDJSON or as the elements of a single JSON array.
+    """
+    buf = ["["] if array else []
+    first = True
+    for row in rows:
+        line = current_app.json.dumps(row, separators=(',', ':'))
+        if array:
+            buf.append(line if first else "," + line)
+        else:
+            buf.append(line + "\n")
+        first = False
+        if len(buf) >= RECORDS_STREAM_BATCH:
+            yield "".join(buf)
+            buf = []
+    if array:
+        buf.append("]")
+    if buf:
+        yield "".join(buf)
+
+
+@bp.route('/records', methods=['GET'])
+@read_replica
+def get_records():
+    """
+    List records ordered by id.
+    ?limit=N[&after=<id>] -> one keyset page: {"records": [...], "next_after": <id or null>}
+    ?format=ndjson[&after=<id>] -> every record, one JSON object per line
+    no parameters -> every record as a JSON array (streamed)
+    ?as_of=<ISO 8601> (with any of the above) -> the table as it was then,
+    rebuilt from provenance (see records_as_of()); &verify=1 with limit=N
+    adds each state's check against the anchored hash
+    Streaming reads go through a server-side cursor, so memory stays flat
+    regardless of table size.
+    """
+    if request.args.get('as_of'):
+        try:
+            as_of = parse_as_of(request.args['as_of'])
+        except ValueError:
+            return jsonify({'error': 'as_of must be an ISO 8601 timestamp'}), 400
+        return records_as_of(as_of)
+
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+
+    if limit is not None:
+        limit = max(1, min(limit, RECORDS_MAX_LIMIT))
+        rows = db.session.execute(records_query(after).limit(limit + 1)).all()
+        page = [record_json(r) for r in rows[:limit]]
+        return jsonify({
+            'records': page,
+            'next_after': page[-1]['id'] if len(rows) > limit else None
+        })
+
+    ndjson = request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+    rows = db.session.execute(records_query(after).execution_options(yield_per=RECORDS_STREAM_BATCH))
+    return Response(
+        stream_with_context(stream_json_lines(map(record_json, rows), array=not ndjson)),
+        mimetype='application/x-ndjson' if ndjson else 'application/json'
+    )
+
+
+# Update
+@bp.route('/update/<int:id>', methods=['PUT'])
+def update_record(id):
+    rec = Record.query.get(id)
+    if not rec:
+        return jsonify({'error':'Record not found'}), 404
+
+    user = request.json.get('user')
+    if not user:
+        return jsonify({'error':'user is required in request body'}), 400
+
+    provenance_user(user)
+    rec.data = request.json.get('data', rec.data)
+    rec.modified_by = user
+    rec.timestamp = datetime.now(timezone.utc)
+    with stage("db_flush"):
+        db.session.flush()
+
+    # anchor inline (sync) or leave it in the outbox (async)
+    prov = anchor_captured()[-1]
+
+    with stage("commit"):
+        db.session.commit()
+    return jsonify({
+        'message':'Record updated',
+        'id': rec.id, 
+        'prov_log_id': prov.log_id, 
+        'blockchain_tx': prov.blockchain_tx,
+        'anchor_status': prov.anchor_status
+    })
+
+
+# Delete
+@bp.route('/delete/<int:id>', methods=['DELETE'])
+def delete_record(id):
+    rec = Record.query.get(id)
+    if not rec:
+        return jsonify({'error':'not found'}), 404
+
+    user = request.json.get('user')
+    if not user:
+        return jsonify({'error':'user is required in request body'}), 400
+
+    # the flush logs the record's last snapshot before removing it
+    provenance_user(user)
+    db.session.delete(rec)
+    with stage("db_flush"):
+        db.session.flush()
+
+    # anchor inline (sync) or leave it in the outbox (async)
+    prov = anchor_captured()[-1]
+
+    with stage("commit"):
+        db.session.commit()
+    return jsonify({
+        'message':'Record deleted', 
+        'id': id, 
+        'prov_log_id': prov.log_id,
+        'blockchain_tx': prov.blockchain_tx,
+        'anchor_status': prov.anchor_status
+    })
+
+
+# -------------------------------
+# Blob-backed records
+# The request body is the content, of any size (chunked transfer encoding
+# works too): it is hashed and stored chunk by chunk as it arrives (see
+# blob_store.py). The blob_record row, and so its provenance entry, holds
+# only the content digest and size. Blob entries are anchored in Merkle
+# batches; /verify/<id>?table=blob_record also re-hashes the stored content.
+# -------------------------------
+
+def get_blobs():
+    return current_app.extensions['blobs']
+
+
+def captured_model(table_name):
+    """Model registered for provenance capture under `table_name` (None if there is none)."""
+    return next((model for model, (name, _) in capture.models.items() if name == table_name), None)
+
+
+def blob_json(b):
+    return {
+        'id': b.id,
+        'name': b.name,
+        'content_type': b.content_type,
+        'content_digest': b.content_digest,
+        'size': b.size,
+        'modified_by': b.modified_by,
+        'timestamp': iso_utc(b.timestamp)
+    }
+
+
+def blob_user():
+    """?user=... (the body is the content), or "user" of a JSON body for DELETE."""
+    return request.args.get('user') or (request.get_json(silent=True) or {}).get('user')
+
+
+def store_upload():
+    """Stream the request body into the blob store: (BlobInfo, None) or (None, error response)."""
+    try:
+        with stage("blob_store"):
+            return get_blobs().put(request.stream, max_size=BLOB_MAX_BYTES or None), None
+    except blob_store.BlobTooLarge as e:
+        return None, (jsonify({'error': str(e)}), 413)
+
+
+def verify_blob_content(blob):
+    """Re-hash a blob's stored chunks (memory-mapped, never loaded whole) against its record."""
+    try:
+        digest, size = get_blobs().recompute(blob.content_digest)
+    except blob_store.BlobNotFound as e:
+        return {"intact": False, "error": str(e)}
+    return {"intact": digest == blob.content_digest and size == blob.size, "digest": digest, "size": size}
+
+
+def blob_write_response(message, blob, info, prov, status_code=200):
+    return jsonify({
+        'message': message,
+        **blob_json(blob),
+        'chunks': info.chunks,
+        'new_chunks': info.new_chunks,
+        'stored_bytes': info.new_bytes,
+        'prov_log_id': prov.log_id,
+        'batch_id': prov.batch_id,
+        'anchor_status': prov.anchor_status
+    }), status_code
+
+
+# Create: POST /blobs?name=...&user=... with the content as request body
+@bp.route('/blobs', methods=['POST'])
+def add_blob():
+    name, user = request.args.get('name'), blob_user()
+    if not name:
+        return jsonify({'error': 'name required'}), 400
+    if not user:
+        return jsonify({'error': 'user is required'}), 400
+
+    info, error = store_upload()
+    if error:
+        return error
+
+    provenance_user(user)
+    blob = BlobRecord(name=name, content_type=request.content_type or 'application/octet-stream',
+                      content_digest=info.digest, size=info.size, modified_by=user)
+    db.session.add(blob)
+    with stage("db_flush"):
+        db.session.flush()
+
+    # a one-leaf Merkle batch: anchored inline (sync) or by the outbox workers
+    prov = anchor_captured()[-1]
+
+    with stage("commit"):
+        db.session.commit()
+    return blob_write_response('Blob added', blob, info, prov, 201)
+
+
+# New version: PUT /blobs/<id>?user=...[&name=...] with the new content as request body
+@bp.route('/blobs/<int:id>', methods=['PUT'])
+def update_blob(id):
+    blob = db.session.get(BlobRecord, id)
+    if not blob:
+        return jsonify({'error': 'Blob not found'}), 404
+    user = blob_user()
+    if not user:
+        return jsonify({'error': 'user is required'}), 400
+
+    info, error = store_upload()
+    if error:
+        return error
+
+    provenance_user(user)
+    blob.name = request.args.get('name', blob.name)
+    blob.content_type = request.content_type or blob.content_type
+    blob.content_digest = info.digest
+    blob.size = info.size
+    blob.modified_by = user
+    blob.timestamp = datetime.now(timezone.utc)
+    with stage("db_flush"):
+        db.session.flush()
+
+    prov = anchor_captured()[-1]
+
+    with stage("commit"):
+        db.session.commit()
+    return blob_write_response('Blob updated', blob, info, prov)
+
+
+@bp.route('/blobs/<int:id>', methods=['GET'])
+@read_replica
+def get_blob(id):
+    blob = db.session.get(BlobRecord, id)
+    if not blob:
+        return jsonify({'error': 'Blob not found'}), 404
+    return jsonify(blob_json(blob))
+
+
+@bp.route('/blobs/<int:id>/content', methods=['GET'])
+@read_replica
+def get_blob_content(id):
+    """The blob's current content, streamed from its chunks."""
+    blob = db.session.get(BlobRecord, id)
+    if not blob:
+        return jsonify({'error': 'Blob not found'}), 404
+    if not get_blobs().exists(blob.content_digest):
+        return jsonify({'error': f'content {blob.content_digest} missing from the blob store'}), 500
+    return Response(
+        get_blobs().iter_content(blob.content_digest),
+        mimetype=blob.content_type,
+        headers={'Content-Length': str(blob.size), 'ETag': f'"{blob.content_digest}"'}
+    )
+
+
+# Delete (the chunks stay: earlier provenance entries still reference them)
+@bp.route('/blobs/<int:id>', methods=['DELETE'])
+def delete_blob(id):
+    blob = db.session.get(BlobRecord, id)
+    if not blob:
+        return jsonify({'error': 'not found'}), 404
+    user = blob_user()
+    if not user:
+        return jsonify({'error': 'user is required'}), 400
+
+    provenance_user(user)
+    db.session.delete(blob)
+    with stage("db_flush"):
+        db.session.flush()
+
+    prov = anchor_captured()[-1]
+
+    with stage("commit"):
+        db.session.commit()
+    return jsonify({
+        'message': 'Blob deleted',
+        'id': id,
+        'prov_log_id': prov.log_id,
+        'batch_id': prov.batch_id,
+        'anchor_status': prov.anchor_status
+    })
+
+
+# -------------------------------
+# Live feed (GET /live, Server-Sent Events, see live_feed.py)
+# New provenance entries and their anchoring / verification status changes
+# are queued on the session and pushed when the transaction commits: through
+# NOTIFY on PostgreSQL (every worker's clients see them), else on this
+# process's bus. Clients resume from the last log_id they saw.
+# -------------------------------
+
+LIVE_ENTRY_FIELDS = ("log_id", "table_name", "record_pk", "operation", "record_hash", "user_id",
+                     "created_at", "anchor_status", "batch_id", "blockchain_tx", "verified")
+LIVE_STATUS_FIELDS = ("log_id", "table_name", "record_pk", "anchor_status", "batch_id", "blockchain_tx")
+
+
+def live_feed_notifies():
+    if LIVE_FEED_NOTIFY == 'auto':
+        return db.engine.dialect.name == 'postgresql'
+    return LIVE_FEED_NOTIFY == '1'
+
+
+def live_notify(session, events):
+    """before_commit: NOTIFY the events inside the transaction (PostgreSQL sends them on commit)."""
+    if not live_feed_notifies():
+        return False
+    for payload in live_feed.notify_payloads(events):
+        session.execute(db.text("SELECT pg_notify(:channel, :payload)"),
+                        {"channel": LIVE_FEED_CHANNEL, "payload": payload})
+    return True
+
+
+def live_publish(events):
+    current_app.extensions['live_bus'].publish(events)
+
+
+live_events = live_feed.SessionQueue(before_commit=live_notify, after_commit=live_publish)
+live_events.listen(db.session)
+
+
+def live_connection(app):
+    """DB-API connection for the LISTEN thread, detached from the pool (it lives as long as the thread)."""
+    with app.app_context():
+        raw = db.engine.raw_connection()
+    raw.detach()
+    return raw.driver_connection
+
+
+def provenance_event(values):
+    """Live event of a new entry (a ProvenanceLog, or a dict / row mapping of its columns)."""
+    get = values.get if hasattr(values, 'get') else functools.partial(getattr, values)
+    ev = {"type": "provenance", **{f: get(f, None) for f in LIVE_ENTRY_FIELDS}}
+    ev["created_at"] = iso_utc(ev["created_at"])
+    ev["verified"] = bool(ev["verified"])
+    return ev
+
+
+def anchor_event(prov, **fields):
+    """Live event of an entry's new anchor_status (`prov`: a ProvenanceLog or a row of LIVE_STATUS_FIELDS)."""
+    return {"type": "anchor", **{f: getattr(prov, f) for f in LIVE_STATUS_FIELDS}, **fields}
+
+
+def verification_event(prov, verified):
+    return {"type": "verification", "log_id": prov.log_id, "table_name": prov.table_name,
+            "record_pk": prov.record_pk, "verified": verified}
+
+
+def live_filters(args):
+    """(tables, record_pks) of ?table=a,b&record_id=1,2 (None = all); record ids default to table "record"."""
+    tables = [t for t in args.get('table', '').split(',') if t] or None
+    record_pks = [r for r in args.get('record_id', '').split(',') if r] or None
+    if record_pks and not tables:
+        tables = [CONTRACT_KEYED_TABLE]
+    return tables, record_pks
+
+
+def live_backlog(tables, record_pks, after, limit):
+    """Provenance events of the entries after log_id `after`, in log order, at most `limit`."""
+    query = db.select(*[getattr(ProvenanceLog, f) for f in LIVE_ENTRY_FIELDS]).where(ProvenanceLog.log_id > after)
+    if tables:
+        query = query.where(ProvenanceLog.table_name.in_(tables))
+    if record_pks:
+        query = query.where(ProvenanceLog.record_pk.in_(record_pks))
+    rows = db.session.execute(query.order_by(ProvenanceLog.log_id).limit(limit)).mappings()
+    return [provenance_event(row) for row in rows]
+
+
+@bp.route('/live', methods=['GET'])
+def live():
+    """
+    Server-Sent Events: "provenance" (new entries, id = log_id), "anchor" and
+    "verification" (status changes; "batched" is not pushed), "reset" (resume
+    point too far back: reload) and periodic keep-alive comments.
+    ?table=record,blob_record ?record_id=1,2 -> only these (default: everything)
+    ?after=<log_id> or the Last-Event-ID header -> first replay the entries after it
+    """
+    tables, record_pks = live_filters(request.args)
+    after = request.args.get('after') or request.headers.get('Last-Event-ID')
+    try:
+        after = int(after) if after else None
+    except ValueError:
+        return jsonify({'error': 'after must be a log_id'}), 400
+
+    bus = current_app.extensions['live_bus']
+    if live_feed_notifies():
+        listener = current_app.extensions['live_listener']
+        listener.start()
+        if not listener.ready.wait(5):
+            return jsonify({'error': 'live feed unavailable'}), 503
+    # subscribe before reading the backlog, so nothing committed in between is lost
+    sub = bus.subscribe(tables, record_pks)
+
+    def replay(last):
+        """(SSE messages, new last log_id, replayed log_ids) catching up from `last`."""
+        if last is None:
+            last = db.session.scalar(db.select(db.func.max(ProvenanceLog.log_id))) or 0
+            events = []
+        else:
+            events = live_backlog(tables, record_pks, last, LIVE_FEED_REPLAY_MAX + 1)
+        if len(events) > LIVE_FEED_REPLAY_MAX:
+            latest = db.session.scalar(db.select(db.func.max(ProvenanceLog.log_id))) or 0
+            messages = [live_feed.sse({"after": last, "latest": latest}, "reset", latest)]
+            last, events = latest, []
+        else:
+            messages = [live_feed.sse(ev, ev["type"], ev["log_id"]) for ev in events]
+            last = max([last] + [ev["log_id"] for ev in events])
+        # don't hold a pooled connection while waiting for events
+        db.session.close()
+        return messages, last, {ev["log_id"] for ev in events}
+
+    def generate():
+        nonlocal sub
+        try:
+            messages, last, replayed = replay(after)
+            yield from messages
+            while True:
+                try:
+                    events = sub.get(timeout=LIVE_FEED_HEARTBEAT_SECONDS)
+                except live_feed.Lagged:
+                    sub.close()
+                    sub = bus.subscribe(tables, record_pks)
+                    messages, last, replayed = replay(last)
+                    yield from messages
+                    continue
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for ev in events:
+                    if ev["type"] != "provenance":
+                        yield live_feed.sse(ev, ev["type"])
+                    elif ev["log_id"] not in replayed:
+                        # an entry committed after a later one is still delivered; the id never moves back
+                        last = max(last, ev["log_id"])
+                        yield live_feed.sse(ev, ev["type"], last)
+        finally:
+            sub.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+# -------------------------------
+# Bulk endpoints
+# Body: {"user": "...", "items": [...]} (or a bare list); an item may carry
+# its own "user". Record changes go through the ORM and are flushed once per
+# request, so the capture hooks write all provenance rows with one
+# INSERT ... RETURNING; the request is anchored as a single Merkle batch.
+# Invalid items are reported per index and do not abort the batch.
+# -------------------------------
+
+def bulk_items():
+    """Parse a bulk request body into (items, default_user, error_response)."""
+    body = request.json
+    if isinstance(body, list):
+        items, default_user = body, None
+    elif isinstance(body, dict):
+        items, default_user = body.get('items'), body.get('user')
+    else:
+        items, default_user = None, None
+    if not isinstance(items, list) or not items:
+        return None, None, (jsonify({'error': 'items (non-empty list) required'}), 400)
+    if len(items) > BULK_MAX_ITEMS:
+        return None, None, (jsonify({'error': f'at most {BULK_MAX_ITEMS} items per request'}), 413)
+    return items, default_user, None
+
+
+def bulk_item_error(data, user):
+    """
+    Why an item cannot be written, or None. Checked before the item joins the
+    batch: a value the columns reject would fail the shared flush for every
+    item, and a non-string user would be hashed differently than it is stored.
+    """
+    if not isinstance(data, str) or not data:
+        return 'data (non-empty string) required'
+    if len(data) > Record.data.type.length:
+        return f'data longer than {Record.data.type.length} characters'
+    return bulk_user_error(user)
+
+
+def bulk_user_error(user):
+    if not isinstance(user, str) or not user:
+        return 'user is required'
+    if len(user) > Record.modified_by.type.length:
+        return f'user longer than {Record.modified_by.type.length} characters'
+    return None
+
+
+def flush_bulk(pending, entries):
+    """
+    Flush the changes of a bulk request; `pending` ([(result, record)]) get
+    the id, hash and log id of the provenance rows the capture hooks wrote,
+    which are appended to `entries`.
+    """
+    if not pending:
+        return
+    with stage("db_flush"):
+        db.session.flush()
+    captured = db.session.info.pop('provenance_entries', [])
+    by_pk = {p.record_pk: p for p in captured}
+    for result, rec in pending:
+        prov = by_pk[str(rec.id)]
+        result.update({'id': rec.id, 'hash': prov.record_hash, 'prov_log_id': prov.log_id})
+    entries.extend(captured)
+    pending.clear()
+
+
+def bulk_response(message, results, entries, status_code):
+    """Anchor the request's provenance rows as one batch and build the response."""
+    ok = [r for r in results if 'error' not in r]
+    batch = anchor_bulk([(p.log_id, p.record_hash) for p in entries])
+    return jsonify({
+        'message': message,
+        'succeeded': len(ok),
+        'failed': len(results) - len(ok),
+        'results': results,
+        'batch_id': batch.batch_id if batch else None,
+        'blockchain_tx': batch.blockchain_tx if batch else None,
+        'anchor_status': batch.anchor_status if batch else None
+    }), status_code if ok else 400
+
+
+@bp.route('/add_bulk', methods=['POST'])
+def add_records_bulk():
+    items, default_user, error = bulk_items()
+    if error:
+        return error
+
+    timestamp_now = datetime.now(timezone.utc)
+    results, pending = [], []
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        data, user = item.get('data'), item.get('user', default_user)
+        problem = bulk_item_error(data, user)
+        if problem:
+            results.append({'index': index, 'error': problem})
+        else:
+            rec = Record(data=data, modified_by=user, timestamp=timestamp_now)
+            db.session.add(rec)
+            provenance_user(user, rec)
+            results.append({'index': index})
+            pending.append((results[-1], rec))
+
+    entries = []
+    flush_bulk(pending, entries)
+    return bulk_response('Records added', results, entries, 201)
+
+
+@bp.route('/update_bulk', methods=['PUT'])
+def update_records_bulk():
+    items, default_user, error = bulk_items()
+    if error:
+        return error
+
+    ids = {item.get('id') for item in items if isinstance(item, dict) and isinstance(item.get('id'), int)}
+    current = {r.id: r for r in Record.query.filter(Record.id.in_(ids))} if ids else {}
+
+    timestamp_now = datetime.now(timezone.utc)
+    results, pending, entries, unflushed = [], [], [], set()
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        record_id, user = item.get('id'), item.get('user', default_user)
+        if record_id not in current:
+            results.append({'index': index, 'id': record_id, 'error': 'Record not found'})
+            continue
+        data = item.get('data', current[record_id].data)
+        problem = bulk_item_error(data, user)
+        if problem:
+            results.append({'index': index, 'id': record_id, 'error': problem})
+            continue
+
+        if record_id in unflushed:
+            # a repeated id updates from the previous version: it gets its own entry
+            flush_bulk(pending, entries)
+            unflushed.clear()
+        unflushed.add(record_id)
+        rec = current[record_id]
+        rec.data = data
+        rec.modified_by = user
+        rec.timestamp = timestamp_now
+        provenance_user(user, rec)
+        results.append({'index': index})
+        pending.append((results[-1], rec))
+
+    flush_bulk(pending, entries)
+    return bulk_response('Records updated', results, entries, 200)
+
+
+@bp.route('/delete_bulk', methods=['DELETE'])
+def delete_records_bulk():
+    items, default_user, error = bulk_items()
+    if error:
+        return error
+
+    def item_id(item):
+        # accept [1, 2, 3] as well as [{"id": 1}, ...]
+        return item if isinstance(item, int) else item.get('id') if isinstance(item, dict) else None
+
+    ids = {i for i in map(item_id, items) if isinstance(i, int)}
+    current = {r.id: r for r in Record.query.filter(Record.id.in_(ids))} if ids else {}
+
+    results, pending = [], []
+    for index, item in enumerate(items):
+        record_id = item_id(item)
+        user = item.get('user', default_user) if isinstance(item, dict) else default_user
+        if record_id not in current:
+            results.append({'index': index, 'id': record_id, 'error': 'not found'})
+            continue
+        problem = bulk_user_error(user)
+        if problem:
+            results.append({'index': index, 'id': record_id, 'error': problem})
+            continue
+
+        # the flush logs the record's last snapshot before removing it
+        rec = current.pop(record_id)
+        db.session.delete(rec)
+        provenance_user(user, rec)
+        results.append({'index': index})
+        pending.append((results[-1], rec))
+
+    entries = []
+    flush_bulk(pending, entries)
+    return bulk_response('Records deleted', results, entries, 200)
+
+
+# -------------------------------
+# Verification (shared by /verify and /verify_bulk)
+# -------------------------------
+
+# verification reasons by the short code used as metrics label
+VERIFICATION_REASONS = {
+    "unlogged_record": "🚨 Record exists but has no provenance log. Possible unlogged insertion or tampering.",
+    "purged": "❌ Record and provenance log both missing. Data loss or external tampering.",
+    "awaiting_anchor": "⏳ Latest provenance entry is still waiting to be anchored on-chain.",
+    "no_onchain_hash": "❌ No on-chain hash found.",
+    "match": "✅ On-chain, provenance log, and DB record all match.",
+    "record_tampered": "⚠️ On-chain matches provenance log, but DB record has been tampered.",
+    "onchain_mismatch": "❌ On-chain hash does not match provenance log.",
+    "deleted": "✅ Record deleted legitimately — provenance and blockchain match.",
+    "deleted_onchain_mismatch": "❌ Record marked deleted, but blockchain mismatch.",
+    "missing_without_delete": "🚨 Integrity violation: Record missing from DB without a DELETE provenance entry. Possible tampering.",
+    "blob_tampered": "⚠️ Provenance matches, but the stored blob content no longer hashes to its recorded digest.",
+}
+VERIFICATION_REASON_CODES = {reason: code for code, reason in VERIFICATION_REASONS.items()}
+
+
+def count_verification(result, reason=None):
+    VERIFICATIONS.inc(
+        verified="true" if result.get("verified") else "false",
+        reason=reason or VERIFICATION_REASON_CODES.get(result.get("reason") or result.get("message"), "other"),
+    )
+
+
+def missing_provenance_error(record_id, record):
+    """Response for a record id that has no provenance entry at all."""
+    if record:
+        return {
+            "status": "error",
+            "record_id": record_id,
+            "message": VERIFICATION_REASONS["unlogged_record"]
+        }, 400
+
+    # 4️⃣ Case: no record AND no provenance — it was purged completely
+    return {
+        "status": "error",
+        "record_id": record_id,
+        "message": VERIFICATION_REASONS["purged"]
+    }, 404
+
+
+def recompute_hashes(prov, record):
+    """
+    Recompute (provenance_log_hash, record_table_hash) for the latest
+    provenance entry; the record hash is None if the record row is gone.
+    """
+    return hash_pool.hash_pair(hash_objects(prov, record))
+
+
+def hash_objects(prov, record, payload=None):
+    """
+    The objects recompute_hashes() hashes: (provenance object, object built
+    from the current record row or None). `payload`: prov's already decoded payload.
+    """
+    payload = entry_payload(prov) if payload is None else payload
+    # provenance object (the one whose hash was originally stored on-chain)
+    prov_obj = provenance_object(prov.table_name, prov.record_pk, prov.operation, payload,
+                                 prov.user_id, prov.created_at, prov.prev_hash)
+
+    # same object built from the current record table state (if record exists)
+    record_obj = None
+    if record:
+        # Build payload in the same shape as you used when creating provenance (new snapshot)
+        payload_current = hash_pool.current_payload(prov.operation, payload, capture.snapshot(record))
+        record_obj = provenance_object(prov.table_name, prov.record_pk, prov.operation, payload_current,
+                                       prov.user_id, prov.created_at, prov.prev_hash)
+
+    return prov_obj, record_obj
+
+
+def verification_outcome(prov, record, onchain_hash, prov_hash_recomputed, record_hash_recomputed):
+    """
+    Final verification logic, returns (verified, reason):
+    - If record exists: require onchain_hash == prov_hash_recomputed == record_hash_recomputed
+    - If record was deleted (no record row), require onchain_hash == prov_hash_recomputed
+    """
+    if prov.anchor_status in ANCHOR_WAITING_STATES and onchain_hash != prov_hash_recomputed:
+        return False, VERIFICATION_REASONS["awaiting_anchor"]
+    if not onchain_hash:
+        return False, VERIFICATION_REASONS["no_onchain_hash"]
+
+    if record:
+        if onchain_hash == prov_hash_recomputed == record_hash_recomputed:
+            return True, VERIFICATION_REASONS["match"]
+        if onchain_hash == prov_hash_recomputed:
+            # chain equals original provenance snapshot, but current record differs → tampered after logging
+            return False, VERIFICATION_REASONS["record_tampered"]
+        return False, VERIFICATION_REASONS["onchain_mismatch"]
+
+    # record missing: we must ensure this deletion was legitimate
+    # i.e., the last provenance operation for this record should be a "D" (DELETE)
+    if prov.operation == "D":
+        # ok, it was logged as deleted
+        if onchain_hash == prov_hash_recomputed:
+            return True, VERIFICATION_REASONS["deleted"]
+        return False, VERIFICATION_REASONS["deleted_onchain_mismatch"]
+
+    # record is missing but provenance doesn’t say it was deleted — suspicious
+    return False, VERIFICATION_REASONS["missing_without_delete"]
+
+
+def verification_result(record_id, prov, record, onchain_hash, prov_hash_recomputed, record_hash_recomputed):
+    verified, reason = verification_outcome(prov, record, onchain_hash, prov_hash_recomputed, record_hash_recomputed)
+    return {
+        "record_id": record_id,
+        "verified": verified,
+        "reason": reason,
+        "onchain_hash": onchain_hash,
+        "recomputed": {
+            "provenance_log_hash": prov_hash_recomputed,
+            "record_table_hash": record_hash_recomputed
+        },
+        "blockchain_tx": prov.blockchain_tx,
+        "batch_id": prov.batch_id
+    }
+
+
+def verify_history_chain(record_pk, restart=False, table_name="record"):
+    """
+    Walk a record's provenance history in log order: recompute every entry's
+    hash and check every prev_hash link against the previous entry. Resumes
+    after the position stored on provenance_head by the last walk (unless
+    restart=True) and stores the new position, so verified entries are not
+    re-hashed on the next call.
+    """
+    head = db.session.get(ProvenanceHead, (table_name, str(record_pk)))
+    resume = head is not None and head.verified_log_id is not None and not restart
+    after = head.verified_log_id if resume else 0
+    prev_hash = head.verified_hash if resume else None
+
+    entries = (
+        ProvenanceLog.query
+        .filter(ProvenanceLog.table_name == table_name,
+                ProvenanceLog.record_pk == str(record_pk),
+                ProvenanceLog.log_id > after)
+        .order_by(ProvenanceLog.log_id.asc())
+        .yield_per(RECORDS_STREAM_BATCH)
+    )
+    entries = with_archived(record_pk, entries, after, table_name)
+
+    checked, unlinked, problem, broken_at = 0, 0, None, None
+    last_ok = after if resume else None
+    memo = {}   # each entry's diff base is usually the entry before it
+    for e in entries:
+        recomputed = entry_hash(e, memo=memo)
+        if recomputed != e.record_hash:
+            problem, broken_at = "stored hash does not match the entry's contents", e.log_id
+            break
+        if e.prev_hash is None:
+            # chain start, or written while hash chaining was off
+            unlinked += 1
+        elif e.prev_hash != prev_hash:
+            problem, broken_at = "prev_hash does not link to the previous entry (entry changed or removed)", e.log_id
+            break
+        checked += 1
+        prev_hash, last_ok = recomputed, e.log_id
+
+    if head is not None and last_ok is not None:
+        head.verified_log_id = last_ok
+        head.verified_hash = prev_hash
+
+    return {
+        "resumed_after_log_id": after if resume else None,
+        "checked": checked,
+        "unlinked_entries": unlinked,
+        "verified_through_log_id": last_ok,
+        "intact": problem is None,
+        "broken_at_log_id": broken_at,
+        "problem": problem
+    }
+
+
+@bp.route('/verify/<int:record_id>', methods=['GET'])
+@read_replica
+def verify_record(record_id):
+    """
+    Verify the latest provenance entry of a record against the chain and the
+    record table. ?full=1 also walks the record's whole hash chain locally
+    (resuming where the previous full check stopped; &restart=1 starts over).
+    ?table=blob_record verifies a blob record; its stored content is then
+    re-hashed as well (see verify_blob_content()).
+    """
+    table_name = request.args.get('table', CONTRACT_KEYED_TABLE)
+    model = captured_model(table_name)
+    if model is None:
+        return jsonify({'error': f'unknown table {table_name}'}), 400
+
+    # 1) get latest provenance entry for the record (and the record itself)
+    with stage("db_lookup"):
+        prov = latest_provenance(record_id, table_name)
+        record = db.session.get(model, record_id)
+    if not prov:
+        body, status = missing_provenance_error(record_id, record)
+        count_verification(body)
+        return jsonify(body), status
+
+    # 2) + 3) recompute provenance-hash and hash of the current record table state
+    with stage("hash"):
+        prov_hash_recomputed, record_hash_recomputed = recompute_hashes(prov, record)
+
+    # 4) get on-chain hash
+    # (Merkle-batched entries: the hash proven under the batch's anchored root)
+    # onchain_hash = None
+    try:
+        with stage("chain_read"):
+            if prov.batch_id is not None:
+                onchain_hash = batch_onchain_hash(prov, prov_hash_recomputed)
+            elif table_name == CONTRACT_KEYED_TABLE:
+                onchain_hash = chain_view("getRecordHash", int(prov.record_pk))
+            else:
+                onchain_hash = None   # other tables are only anchored in Merkle batches
+    except Exception as e:
+        count_verification({}, reason="chain_error")
+        return jsonify({
+            'status': 'error',
+            'message': 'Could not call getBatchRoot()' if prov.batch_id is not None else 'Could not call getRecordHash()',
+            'exception': str(e)
+        }), 500
+
+    # 5) final verification logic
+    result = verification_result(record_id, prov, record, onchain_hash, prov_hash_recomputed, record_hash_recomputed)
+
+    # 5a) blob records: the provenance entry covers the digest, the content must still match it
+    reason_code = None
+    if result["verified"] and isinstance(record, BlobRecord):
+        with stage("blob_hash"):
+            result["content"] = verify_blob_content(record)
+        if not result["content"]["intact"]:
+            result["verified"] = False
+            result["reason"] = VERIFICATION_REASONS["blob_tampered"]
+
+    # 5b) full mode: the head is anchored, the rest of the history is checked through the hash chain
+    if request.args.get('full') == '1':
+        with stage("history_walk"):
+            chain = verify_history_chain(record_id, restart=request.args.get('restart') == '1', table_name=table_name)
+        result["chain"] = chain
+        if result["verified"] and not chain["intact"]:
+            result["verified"] = False
+            result["reason"] = f"❌ Provenance history chain broken at log {chain['broken_at_log_id']}: {chain['problem']}."
+            reason_code = "history_chain_broken"
+    count_verification(result, reason_code)
+
+    # 6) persist verification result, can remove this section from here and place it to upper if else block as it becomes not verified if the data is tampered even if it is verified previously, it s a choice.
+    if prov.verified != result["verified"]:
+        live_events.add(db.session, [verification_event(prov, result["verified"])])
+    prov.verified = result["verified"]
+    prov.verified_at = datetime.now(timezone.utc)
+    with stage("commit"):
+        db.session.commit()
+
+    # 7) return detailed result
+    return jsonify(result), 200
+
+
+def store_verification(entries, verified_log_ids):
+    """Set verified / verified_at of the checked `entries` with a single UPDATE."""
+    log_ids = [p.log_id for p in entries]
+    verified = set(verified_log_ids)
+    live_events.add(db.session, [verification_event(p, p.log_id in verified)
+                                 for p in entries if p.verified != (p.log_id in verified)])
+    if log_ids:
+        db.session.execute(
+            db.update(ProvenanceLog)
+            .where(ProvenanceLog.log_id.in_(log_ids))
+            .values(
+                verified=ProvenanceLog.log_id.in_(verified_log_ids) if verified_log_ids else False,
+                verified_at=datetime.now(timezone.utc)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def read_chain_in_chunks(*reads):
+    """
+    Read one value per id from the contract with as few RPCs as possible.
+    Each read is (ids, batched_view, single_view[, cacheable]). Cached values
+    are used first; the rest is fetched in chunks, through the array-returning
+    view when the deployed ABI has it, otherwise as a JSON-RPC batch of
+    single-id calls. All chunks of all reads run concurrently.
+    Returns one {id: value} dict per read.
+    """
+    chain = get_chain()
+    results, chunks = [], []
+    token = chain.reads.snapshot()
+    for ids, batched_view, single_view, *rest in reads:
+        values = {}
+        for i in ids:
+            hit, value = chain.reads.lookup((single_view, i))
+            if hit:
+                values[i] = value
+        ids = [i for i in ids if i not in values]
+        results.append(values)
+        for start in range(0, len(ids), VERIFY_BULK_RPC_CHUNK):
+            chunks.append((values, ids[start:start + VERIFY_BULK_RPC_CHUNK], batched_view, single_view, *rest))
+
+    async def read_from(functions, chunk, batched_view, single_view):
+        if hasattr(functions, batched_view):
+            out = await getattr(functions, batched_view)(chunk).call()
+        else:
+            async with chain.rpc.w3.batch_requests() as batch:
+                for i in chunk:
+                    batch.add(getattr(functions, single_view)(i))
+                out = await batch.async_execute()
+        return [decode_view(single_view, value) for value in out]
+
+    async def read_chunk(chunk, batched_view, single_view):
+        out = await read_from(chain.async_contract.functions, chunk, batched_view, single_view)
+        if chain.legacy_address:
+            # records and batches last anchored before the move to the current contract
+            unset = [i for i, value in zip(chunk, out) if view_is_unset(single_view, value)]
+            if unset:
+                legacy = await read_from(chain.legacy_async_contract.functions, unset, batched_view, single_view)
+                found = dict(zip(unset, legacy))
+                out = [found.get(i, value) for i, value in zip(chunk, out)]
+        return out
+
+    outs = chain.rpc.gather([functools.partial(read_chunk, *c[1:4]) for c in chunks])
+    for (values, chunk, _, single_view, *rest), out in zip(chunks, outs):
+        cacheable = rest[0] if rest else None
+        for i, value in zip(chunk, out):
+            values[i] = value
+            if cacheable is None or cacheable(value):
+                chain.reads.store((single_view, i), value, token)
+    return results
+
+
+@bp.route('/verify_bulk', methods=['GET', 'POST'])
+@read_replica
+def verify_records_bulk():
+    """
+    Verify many records at once.
+    Accepts {"ids": [...]} or {"from_id": a, "to_id": b} as JSON body, or the
+    same as query parameters (?ids=1,2,3 / ?from_id=1&to_id=500).
+    Results are returned in id order with the same reasons as /verify.
+    """
+    args = request.get_json(silent=True) or request.args
+    try:
+        if args.get('ids') is not None:
+            raw = args.get('ids')
+            ids = [int(i) for i in (raw.split(',') if isinstance(raw, str) else raw)]
+        elif args.get('from_id') is not None and args.get('to_id') is not None:
+            from_id, to_id = int(args.get('from_id')), int(args.get('to_id'))
+            if from_id > to_id:
+                return jsonify({'error': 'from_id must not be greater than to_id'}), 400
+            # checked before the range is built: a huge to_id must not allocate the list
+            if to_id - from_id + 1 > VERIFY_BULK_MAX:
+                return jsonify({'error': f'at most {VERIFY_BULK_MAX} records per request'}), 413
+            ids = list(range(from_id, to_id + 1))
+        else:
+            return jsonify({'error': 'ids or from_id/to_id required'}), 400
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ids must be integers'}), 400
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > VERIFY_BULK_MAX:
+        return jsonify({'error': f'at most {VERIFY_BULK_MAX} records per request'}), 413
+
+    # 1) latest provenance entry per record (through provenance_head) and the
+    #    records themselves: two set-based queries
+    provs = {int(pk): p for pk, p in latest_provenances(ids).items()}
+    records = {r.id: r for r in Record.query.filter(Record.id.in_(ids))}
+
+    # 2) recompute hashes in one pass
+    with stage("hash"):
+        recomputed = {rid: recompute_hashes(prov, records.get(rid)) for rid, prov in provs.items()}
+
+    # 3) on-chain reads, batched: per-record hashes and Merkle batch roots
+    try:
+        with stage("chain_read"):
+            onchain, roots = read_chain_in_chunks(
+                ([rid for rid, p in provs.items() if p.batch_id is None], 'getRecordHashes', 'getRecordHash'),
+                ({p.batch_id for p in provs.values() if p.batch_id is not None}, 'getBatchRoots', 'getBatchRoot', root_is_set),
+            )
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': 'Could not read hashes from the contract',
+            'exception': str(e)
+        }), 500
+
+    results, verified_log_ids = [], []
+    for rid in ids:
+        prov, record = provs.get(rid), records.get(rid)
+        if not prov:
+            results.append(missing_provenance_error(rid, record)[0])
+            count_verification(results[-1])
+            continue
+        prov_hash_recomputed, record_hash_recomputed = recomputed[rid]
+        if prov.batch_id is not None:
+            onchain_hash = resolve_batch_hash(prov, prov_hash_recomputed, roots[prov.batch_id])
+        else:
+            onchain_hash = onchain[rid]
+        result = verification_result(rid, prov, record, onchain_hash, prov_hash_recomputed, record_hash_recomputed)
+        count_verification(result)
+        if result["verified"]:
+            verified_log_ids.append(prov.log_id)
+        results.append(result)
+
+    # 4) persist all outcomes with a single UPDATE
+    store_verification(list(provs.values()), verified_log_ids)
+    db.session.commit()
+
+    return jsonify({
+        "count": len(results),
+        "verified": len(verified_log_ids),
+        "results": results
+    }), 200
+
+
+
+# -------------------------------
+# Tamper sweep: the checks of /verify_bulk over every captured table, as a
+# CLI and a background task. Rows are read in keyset-ordered chunks as raw
+# tuples; a process pool (hash_pool.py) decodes their payloads and computes
+# both hashes of each chunk, and the on-chain hashes are fetched in bulk.
+# Failures become tamper_finding rows, and the progress of a pass is
+# committed with every chunk, so an interrupted pass resumes where it stopped.
+# -------------------------------
+
+# sources a pass walks in each captured table, in order: full passes the
+# table and then the provenance heads of records whose row is gone;
+# incremental passes the entries written since the previous pass and the
+# records with open findings
+SWEEP_PHASES = {"full": ("records", "orphans"), "incremental": ("changed", "findings")}
+# provenance_log columns the sweep reads for the latest entry of each record
+SWEEP_ENTRY_COLUMNS = (
+    "log_id", "table_name", "record_pk", "operation", "record_hash", "prev_hash", "payload", "payload_encoding",
+    "payload_blob", "user_id", "created_at", "anchor_status", "batch_id", "merkle_proof", "blockchain_tx", "verified",
+)
+# JSON columns read as text: the hashing processes parse them
+SWEEP_RAW_JSON = ("payload", "merkle_proof")
+
+sweep_stop = threading.Event()
+sweep_threads = []
+
+
+def sweep_steps(mode):
+    """(table, phase) pairs a pass walks: CONTRACT_KEYED_TABLE first, then the other captured tables."""
+    tables = sorted({name for name, _ in capture.models.values()}, key=lambda t: (t != CONTRACT_KEYED_TABLE, t))
+    return [(table_name, phase) for table_name in tables for phase in SWEEP_PHASES[mode]]
+
+
+def sweep_model(table_name):
+    """(model, snapshot columns, primary key attribute) of a captured table."""
+    model = captured_model(table_name)
+    [pk] = db.inspect(model).primary_key   # swept tables have a single-column key
+    return model, capture.models[model][1], getattr(model, pk.key)
+
+
+def sweep_chunk_ids(run):
+    """The next chunk of the run's current phase: [(cursor key, record id), ...] in cursor order."""
+    cursor, limit = run.cursor or None, TAMPER_SWEEP_CHUNK
+    model, _, pk = sweep_model(run.table_name)
+    key_type = pk.type.python_type
+    if run.phase == "records":
+        stmt = db.select(pk, pk).order_by(pk.asc())
+        if cursor is not None:
+            stmt = stmt.where(pk > key_type(cursor))
+    elif run.phase == "orphans":
+        stmt = (
+            db.select(ProvenanceHead.record_pk, ProvenanceHead.record_pk)
+            .where(ProvenanceHead.table_name == run.table_name,
+                   ~db.select(pk).where(pk == db.cast(ProvenanceHead.record_pk, pk.type)).exists())
+            .order_by(ProvenanceHead.record_pk.asc())
+        )
+        if cursor is not None:
+            stmt = stmt.where(ProvenanceHead.record_pk > cursor)
+    elif run.phase == "changed":
+        stmt = (
+            db.select(ProvenanceLog.log_id, ProvenanceLog.record_pk)
+            .join(ProvenanceHead, db.and_(ProvenanceHead.table_name == ProvenanceLog.table_name,
+                                          ProvenanceHead.record_pk == ProvenanceLog.record_pk,
+                                          ProvenanceHead.log_id == ProvenanceLog.log_id))
+            .where(ProvenanceLog.table_name == run.table_name,
+                   ProvenanceLog.log_id > max(run.since_log_id, int(cursor or 0)),
+                   ProvenanceLog.log_id <= run.watermark_log_id)
+            .order_by(ProvenanceLog.log_id.asc())
+        )
+    else:   # findings
+        stmt = (
+            db.select(TamperFinding.record_pk, TamperFinding.record_pk).distinct()
+            .where(TamperFinding.table_name == run.table_name, TamperFinding.resolved_at.is_(None))
+            .order_by(TamperFinding.record_pk.asc())
+        )
+        if cursor is not None:
+            stmt = stmt.where(TamperFinding.record_pk > cursor)
+    return [(str(key), key_type(rid)) for key, rid in db.session.execute(stmt.limit(limit))]
+
+
+def sweep_column(name):
+    column = getattr(ProvenanceLog, name)
+    return db.cast(column, db.Text).label(name) if name in SWEEP_RAW_JSON else column
+
+
+def sweep_entries(record_pks, table_name):
+    """{record_pk: latest provenance row} with the SWEEP_ENTRY_COLUMNS, as plain rows where possible."""
+    entries = {row.record_pk: row for row in db.session.execute(
+        db.select(*map(sweep_column, SWEEP_ENTRY_COLUMNS))
+        .join(ProvenanceHead, ProvenanceHead.log_id == ProvenanceLog.log_id)
+        .where(ProvenanceHead.table_name == table_name, ProvenanceHead.record_pk.in_(record_pks))
+    )}
+    missing = [pk for pk in record_pks if pk not in entries]
+    if missing:
+        # heads not backfilled yet, archived entries
+        entries.update(latest_provenances(missing, table_name))
+    return entries
+
+
+def sweep_diff_bases(entries, table_name):
+    """
+    The entries diff-encoded payloads of `entries` are decoded against:
+    {record_pk: {log_id: (operation, payload, payload_encoding, payload_blob)}},
+    the PROVENANCE_SNAPSHOT_EVERY entries before each (diffs never go back
+    further unless the setting was lowered; hash_entries() reports those).
+    """
+    diffs = {p.record_pk: p.log_id for p in entries if payload_codec.is_diff(p.payload_encoding)}
+    if not diffs:
+        return {}
+    ranked = (
+        db.select(ProvenanceLog.record_pk, ProvenanceLog.log_id, ProvenanceLog.operation, sweep_column("payload"),
+                  ProvenanceLog.payload_encoding, ProvenanceLog.payload_blob,
+                  db.func.row_number().over(partition_by=ProvenanceLog.record_pk,
+                                            order_by=ProvenanceLog.log_id.desc()).label("back"))
+        .where(ProvenanceLog.table_name == table_name, ProvenanceLog.record_pk.in_(list(diffs)))
+        .subquery()
+    )
+    bases = {}
+    for row in db.session.execute(db.select(ranked).where(ranked.c.back <= PROVENANCE_SNAPSHOT_EVERY + 1)):
+        if row.log_id < diffs[row.record_pk]:
+            bases.setdefault(row.record_pk, {})[row.log_id] = (
+                row.operation, row.payload, row.payload_encoding, row.payload_blob)
+    return bases
+
+
+def sweep_chunk(run, ids, pool):
+    """Verify the records `ids` like /verify_bulk and update their findings. Returns the number of new findings."""
+    table_name = run.table_name
+    model, columns, pk = sweep_model(table_name)
+    key_type = pk.type.python_type
+    provs = {key_type(p.record_pk): p for p in sweep_entries([str(i) for i in ids], table_name).values()}
+    # current rows as raw values of the snapshot columns
+    records = {row[0]: tuple(row[1:]) for row in db.session.execute(
+        db.select(pk, *(getattr(model, c) for c in columns)).where(pk.in_(ids)))}
+    bases = sweep_diff_bases(provs.values(), table_name)
+    with stage("chain_read"):
+        keyed = table_name == CONTRACT_KEYED_TABLE   # other tables are only anchored in Merkle batches
+        onchain, roots = read_chain_in_chunks(
+            ([rid for rid, p in provs.items() if p.batch_id is None] if keyed else [], 'getRecordHashes', 'getRecordHash'),
+            ({p.batch_id for p in provs.values() if p.batch_id is not None}, 'getBatchRoots', 'getBatchRoot', root_is_set),
+        )
+        roots = {batch_id: root.hex() for batch_id, root in roots.items() if any(root)}
+    with stage("hash"):
+        entries = [((p.log_id, p.table_name, p.record_pk, p.operation, p.user_id, iso_utc(p.created_at), p.prev_hash,
+                     p.payload, p.payload_encoding, p.payload_blob, p.record_hash, p.merkle_proof, roots.get(p.batch_id)),
+                    records.get(rid)) for rid, p in provs.items()]
+        hashes = dict(zip(provs, pool.map_entries(columns, entries, bases)))
+        for rid in [rid for rid, h in hashes.items() if h is None]:
+            # a diff base further back (or archived): decode here, from the ORM entry (archived ones are parsed already)
+            p = provs[rid]
+            prov_hash, record_hash = recompute_hashes(db.session.get(ProvenanceLog, p.log_id) or p, db.session.get(model, rid))
+            root = roots.get(p.batch_id)
+            hashes[rid] = prov_hash, record_hash, root and hash_pool.proven_hash(
+                (prov_hash, p.record_hash), hash_pool.parsed(p.merkle_proof), root)
+
+    outcomes, verified_log_ids = {}, []
+    for rid in ids:
+        prov, record = provs.get(rid), records.get(rid)
+        if prov is None:
+            message = missing_provenance_error(rid, record)[0]["message"]
+            outcomes[rid] = (False, VERIFICATION_REASON_CODES[message], None, {"message": message})
+            continue
+        prov_hash, record_hash, batch_hash = hashes[rid]
+        onchain_hash = batch_hash if prov.batch_id is not None else onchain.get(rid)
+        result = verification_result(rid, prov, record, onchain_hash, prov_hash, record_hash)
+        if result["verified"]:
+            verified_log_ids.append(prov.log_id)
+        outcomes[rid] = (result["verified"], VERIFICATION_REASON_CODES[result["reason"]], prov.log_id, {
+            "message": result["reason"], "onchain_hash": onchain_hash, "recomputed": result["recomputed"],
+        })
+    store_verification(list(provs.values()), verified_log_ids)
+
+    now, found = datetime.now(timezone.utc), 0
+    open_findings = {f.record_pk: f for f in TamperFinding.query.filter(
+        TamperFinding.table_name == table_name, TamperFinding.resolved_at.is_(None),
+        TamperFinding.record_pk.in_([str(i) for i in ids]))}
+    for rid, (verified, reason, log_id, detail) in outcomes.items():
+        finding = open_findings.get(str(rid))
+        if reason == "awaiting_anchor" or (finding and (finding.reason, finding.log_id) == (reason, log_id) and not verified):
+            continue
+        if finding:
+            finding.resolved_at = now
+        if not verified:
+            db.session.add(TamperFinding(run_id=run.run_id, table_name=table_name, record_pk=str(rid), log_id=log_id,
+                                         reason=reason, detail=detail, found_at=now))
+            found += 1
+    return found
+
+
+def start_sweep_run(full=False, lease=True):
+    """
+    The unfinished pass to resume, or a new one (full if asked for or if
+    there was never a pass). None while another process works on a pass
+    (it touched it within TAMPER_SWEEP_LEASE_SECONDS) and `lease` is set.
+    """
+    now = datetime.now(timezone.utc)
+    run = TamperSweepRun.query.filter(TamperSweepRun.finished_at.is_(None)).order_by(TamperSweepRun.run_id.desc()).first()
+    if run is not None:
+        if lease and as_utc(run.updated_at) > now - timedelta(seconds=TAMPER_SWEEP_LEASE_SECONDS):
+            return None
+        return run
+    last = TamperSweepRun.query.filter(TamperSweepRun.finished_at.isnot(None)).order_by(TamperSweepRun.run_id.desc()).first()
+    mode = "full" if full or last is None else "incremental"
+    table_name, phase = sweep_steps(mode)[0]
+    run = TamperSweepRun(
+        mode=mode, table_name=table_name, phase=phase, cursor="",
+        since_log_id=last.watermark_log_id if last else 0,
+        watermark_log_id=db.session.query(db.func.max(ProvenanceLog.log_id)).scalar() or 0,
+        checked=0, findings=0, started_at=now, updated_at=now,
+    )
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def run_sweep(run, workers=TAMPER_SWEEP_WORKERS, stop=None):
+    """Work through a pass chunk by chunk, committing its cursor after each; stops early when `stop` is set."""
+    steps = sweep_steps(run.mode)
+    position = (run.table_name, run.phase)
+    with hash_pool.HashPool(workers) as pool:
+        for step in steps[steps.index(position) if position in steps else 0:]:
+            if step != (run.table_name, run.phase):
+                (run.table_name, run.phase), run.cursor = step, ""
+                db.session.commit()
+            while True:
+                chunk = sweep_chunk_ids(run)
+                if not chunk:
+                    break
+                run.findings += sweep_chunk(run, [rid for _, rid in chunk], pool)
+                run.checked += len(chunk)
+                run.cursor, run.updated_at = chunk[-1][0], datetime.now(timezone.utc)
+                db.session.commit()
+                if stop is not None and stop.is_set():
+                    return run
+    run.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+    return run
+
+
+def full_sweep_due():
+    last_full = db.session.query(db.func.max(TamperSweepRun.started_at)).filter(
+        TamperSweepRun.mode == "full", TamperSweepRun.finished_at.isnot(None)).scalar()
+    return last_full is None or as_utc(last_full) < datetime.now(timezone.utc) - timedelta(hours=TAMPER_SWEEP_FULL_HOURS)
+
+
+def sweep_summary(run, seconds, checked_before=0):
+    rate = (run.checked - checked_before) / seconds * 3600 if seconds else 0
+    return (f"{run.mode} pass {run.run_id}: {run.checked} records checked, {run.findings} new findings "
+            f"({seconds:.1f} s, {rate:,.0f} records/h)")
+
+
+def tamper_sweep_loop(app):
+    while not sweep_stop.is_set():
+        try:
+            with app.app_context():
+                ensure_schema()
+                run = start_sweep_run(full=full_sweep_due())
+                if run is not None:
+                    started = time.perf_counter()
+                    run_sweep(run, stop=sweep_stop)
+                    if run.finished_at is not None:
+                        log.info("🕵️ Tamper sweep %s", sweep_summary(run, time.perf_counter() - started))
+        except Exception as e:
+            log.exception("⚠️ Tamper sweep error: %s", e)
+        sweep_stop.wait(TAMPER_SWEEP_INTERVAL_SECONDS)
+
+
+def start_tamper_sweeper(app):
+    """Start the background thread that runs tamper sweep passes."""
+    t = threading.Thread(target=tamper_sweep_loop, args=(app,), name="tamper-sweep", daemon=True)
+    t.start()
+    sweep_threads.append(t)
+    return t
+
+# -------------------------------
+# Background threads started with the app (BACKGROUND_WORKERS=1)
+# -------------------------------
+
+background_leader = None
+background_lock = None   # open, flock'ed BACKGROUND_LOCK_FILE while this process runs the threads
+
+
+def serving_process():
+    """
+    False when create_app() runs for a CLI command (flask --app app ...) or in
+    the debug reloader's watcher process, which only restarts the server.
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return True   # WSGI server or script
+    if ctx.info_name != "run":
+        return False
+    reload = ctx.params.get("reload")
+    return not (get_debug_flag() if reload is None else reload) or is_running_from_reloader()
+
+
+def background_lock_path(app):
+    if app.config['BACKGROUND_LOCK_FILE']:
+        return app.config['BACKGROUND_LOCK_FILE']
+    digest = hashlib.sha256(str(app.config['SQLALCHEMY_DATABASE_URI']).encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"provenance-background-{digest}.lock")
+
+
+def take_background_lock(path):
+    """True once this process holds the host-wide lock (kept until the process exits)."""
+    global background_lock
+    if fcntl is None or background_lock is not None:
+        return True
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+    background_lock = fd
+    return True
+
+
+def start_background_threads(app):
+    """Outbox workers, event indexer and (with TAMPER_SWEEP_INTERVAL_SECONDS > 0) the tamper sweeper."""
+    start_anchor_workers(app)
+    start_event_indexer(app)
+    if TAMPER_SWEEP_INTERVAL_SECONDS > 0:
+        start_tamper_sweeper(app)
+
+
+def background_leader_loop(app, lock_path):
+    # processes that lose the race keep trying, so a recycled server worker is replaced
+    while not anchor_stop.is_set():
+        if take_background_lock(lock_path):
+            log.info("⛓️ Starting background workers in process %s", os.getpid())
+            start_background_threads(app)
+            return
+        anchor_stop.wait(WORKER_HEARTBEAT_STALE_SECONDS / 2)
+
+
+def start_background_workers(app):
+    """
+    Start the background threads once per process, and through an flock on
+    BACKGROUND_LOCK_FILE in only one server process per host. Returns the
+    thread that waits for the lock.
+    """
+    global background_leader
+    if background_leader is None:
+        background_leader = threading.Thread(
+            target=background_leader_loop, args=(app, background_lock_path(app)), name="background-leader", daemon=True)
+        background_leader.start()
+    return background_leader
+
+
+@bp.cli.command('workers')
+def workers_command():
+    """Run all background threads in the foreground (BACKGROUND_WORKERS=0 deployments)."""
+    print(f"⛓️ Starting {ANCHOR_WORKERS} anchor workers, the event indexer"
+          + (" and the tamper sweeper" if TAMPER_SWEEP_INTERVAL_SECONDS > 0 else ""))
+    start_background_threads(current_app._get_current_object())
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        anchor_stop.set()
+        indexer_stop.set()
+        sweep_stop.set()
+
+
+@bp.cli.command('tamper-sweep')
+@click.option('--full', is_flag=True, help='Check every row of the captured tables, not only those changed since the last pass.')
+@click.option('--restart', is_flag=True, help='Abandon an unfinished pass instead of resuming it.')
+@click.option('--workers', default=TAMPER_SWEEP_WORKERS, show_default=True, help='Hashing processes.')
+def tamper_sweep_command(full, restart, workers):
+    """Verify records against provenance and the chain; record findings in tamper_finding."""
+    ensure_schema()
+    if restart:
+        TamperSweepRun.query.filter(TamperSweepRun.finished_at.is_(None)).update(
+            {"finished_at": datetime.now(timezone.utc)}, synchronize_session=False)
+        db.session.commit()
+    run = start_sweep_run(full=full, lease=False)
+    if run.checked:
+        print(f"↪️ Resuming {run.mode} pass {run.run_id} in {run.table_name}/{run.phase} after {run.cursor!r} "
+              f"({run.checked} records already checked)")
+    started, checked_before = time.perf_counter(), run.checked
+    run_sweep(run, workers)
+    print(f"🕵️ Tamper sweep {sweep_summary(run, time.perf_counter() - started, checked_before)}")
+    open_findings = TamperFinding.query.filter(TamperFinding.resolved_at.is_(None)).order_by(TamperFinding.finding_id)
+    for f in open_findings.limit(20):
+        print(f"   ❌ {f.table_name} {f.record_pk} (log {f.log_id}): {VERIFICATION_REASONS.get(f.reason, f.reason)}")
+    total = open_findings.count()
+    print(f"{'❌' if total else '✅'} {total} open findings")
+
+
+@bp.route('/tamper_sweep', methods=['GET'])
+@read_replica
+def tamper_sweep_status():
+    """Latest sweep passes and open findings (?limit=N, default 100)."""
+    limit = max(1, min(request.args.get('limit', 100, type=int), RECORDS_MAX_LIMIT))
+    runs = TamperSweepRun.query.order_by(TamperSweepRun.run_id.desc()).limit(5).all()
+    open_findings = TamperFinding.query.filter(TamperFinding.resolved_at.is_(None))
+    return jsonify({
+        'runs': [{
+            'run_id': r.run_id, 'mode': r.mode, 'table': r.table_name, 'phase': r.phase, 'checked': r.checked,
+            'findings': r.findings, 'watermark_log_id': r.watermark_log_id, 'started_at': iso_utc(r.started_at),
+            'updated_at': iso_utc(r.updated_at), 'finished_at': iso_utc(r.finished_at),
+        } for r in runs],
+        'open_findings': open_findings.count(),
+        'findings': [{
+            'finding_id': f.finding_id, 'table': f.table_name, 'record_id': f.record_pk, 'log_id': f.log_id, 'reason': f.reason,
+            'message': VERIFICATION_REASONS.get(f.reason), 'detail': f.detail, 'found_at': iso_utc(f.found_at),
+            'run_id': f.run_id,
+        } for f in open_findings.order_by(TamperFinding.finding_id.asc()).limit(limit)],
+    })
+
+
+@bp.route('/history/<int:record_id>', methods=['GET'])
+@read_replica
+def get_history(record_id):
+    """
+    Fetch complete provenance history for a record ID.
+    If provenance logs exist locally, return them.
+    If logs are missing, fall back to blockchain events.
+    """
+
+    history = []
+    source = None
+
+    # 1️⃣ Try to fetch provenance logs from DB
+    prov_logs = ProvenanceLog.query.filter_by(table_name="record", record_pk=str(record_id)).order_by(ProvenanceLog.log_id.asc()).all()
+    # + entries moved to the archive (always older than the ones still in the table)
+    prov_logs = with_archived(record_id, prov_logs)
+
+    if prov_logs and len(prov_logs) > 0:
+        source = "database"
+        rows, memo = {p.log_id: p for p in prov_logs}, {}
+        for p in prov_logs:
+            history.append({
+                "log_id": p.log_id,
+                "operation": p.operation,
+                "record_hash": p.record_hash,
+                "prev_hash": p.prev_hash,
+                "payload": entry_payload(p, rows, memo),
+                "user_id": p.user_id,
+                "timestamp": iso_utc(p.created_at),   # ✅ consistent key
+                "blockchain_tx": p.blockchain_tx,
+                "batch_id": p.batch_id,
+                "verified": p.verified,
+                "archived": p.archived
+            })
+    else:
+        # 2️⃣ Fallback: blockchain events from the local event index, plus
+        # whatever the indexer has not reached yet straight from the node
+        source = "blockchain"
+        cp = db.session.get(IndexerCheckpoint, INDEXER_CHECKPOINT_NAME)
+        indexed_to = cp.block_number if cp else INDEXER_START_BLOCK - 1
+        events = [
+            {c: getattr(ev, c) for c in ("record_id", "operation", "record_hash", "block_number", "tx_hash", "block_timestamp")}
+            for ev in ChainEvent.query
+            .filter_by(record_id=record_id)
+            .order_by(ChainEvent.block_number.asc(), ChainEvent.log_index.asc())
+        ]
+        index_lag, catchup_error = None, None
+        try:
+            head = get_chain().w3.eth.block_number
+            index_lag = max(0, head - indexed_to)
+            if index_lag:
+                events += record_events_since(record_id, indexed_to + 1, head)
+        except Exception as e:
+            if not events:
+                return jsonify({
+                    "status": "error",
+                    "message": f"⚠️ Unable to fetch blockchain logs: {str(e)}"
+                }), 500
+            # the indexed part is still worth returning
+            catchup_error = str(e)
+
+        for ev in events:
+            history.append({
+                "recordId": int(ev["record_id"]),
+                "operation": ev["operation"],
+                "record_hash": ev["record_hash"],
+                "blockNumber": ev["block_number"],
+                "txHash": ev["tx_hash"],
+                "timestamp": iso_utc(ev["block_timestamp"])
+            })
+
+    if not history:
+        return jsonify({
+            "status": "error",
             "message": f"No provenance or blockchain history found for record {record_id}."
         }), 404
 
-    return jsonify({
+    response = {
         "record_id": record_id,
         "source": source,
         "count": len(history),
         "history": history
+    }
+    if source == "blockchain":
+        # blocks the index was behind the head, read live for this answer
+        response["indexed_to_block"] = cp.block_number if cp else None
+        response["index_lag"] = index_lag
+        if catchup_error is not None:
+            # only the indexed events are included
+            response["catchup_error"] = catchup_error
+    return jsonify(response), 200
+
+# -------------------------------
+# Point-in-time reads: the state of the record table as of a timestamp,
+# rebuilt from provenance payloads. Materialized checkpoints hold every
+# record alive at a moment; a read starts from the nearest one at or before
+# the requested time and replays only the entries written after it, so its
+# cost follows the changes since the checkpoint, not the age of the log.
+# -------------------------------
+
+class AsOfUnavailable(Exception):
+    """The state at the requested time cannot be rebuilt from the hot log."""
+
+
+def parse_as_of(value):
+    """?as_of= value (ISO 8601; naive means UTC) as an aware UTC datetime; ValueError if malformed."""
+    return as_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def nearest_checkpoint(as_of, table_name="record"):
+    return (
+        ProvenanceCheckpoint.query
+        .filter(ProvenanceCheckpoint.table_name == table_name, ProvenanceCheckpoint.as_of <= as_of)
+        .order_by(ProvenanceCheckpoint.as_of.desc())
+        .first()
+    )
+
+
+def archived_until(table_name="record"):
+    """Time before which entries of `table_name` may be gone from provenance_log (None: nothing archived)."""
+    end = db.session.query(db.func.max(ArchiveSegment.period_end)).filter(
+        db.or_(ArchiveSegment.table_name == table_name, ArchiveSegment.table_name.is_(None))
+    ).scalar()
+    return as_utc(end)
+
+
+def replay_window(as_of, since=None, table_name="record"):
+    """Conditions selecting the entries of (since, as_of] (all entries up to as_of without `since`)."""
+    window = [ProvenanceLog.table_name == table_name, ProvenanceLog.created_at <= as_of]
+    if since is not None:
+        window.append(ProvenanceLog.created_at > since)
+    return window
+
+
+def check_replayable(since, table_name="record"):
+    """Refuse a replay that would start inside archived months (those entries are no longer in the table)."""
+    until = archived_until(table_name)
+    if until is not None and (since is None or as_utc(since) < until):
+        raise AsOfUnavailable(
+            f"entries before {iso_utc(until)} are archived and no checkpoint covers that time; "
+            f"read single records instead (/records/<id>?as_of=)"
+        )
+
+
+def reconstructed_item(record_id, log_id, record_hash, user_id, changed_at, state):
+    return {"id": record_id, "log_id": log_id, "record_hash": record_hash, "user_id": user_id,
+            "changed_at": as_utc(changed_at), "state": state}
+
+
+def entry_item(prov, memo=None):
+    """The record state a (non-DELETE) entry leaves behind, as a reconstructed item."""
+    state = payload_codec.state_after(prov.operation, entry_payload(prov, memo=memo))
+    return reconstructed_item(int(prov.record_pk), prov.log_id, prov.record_hash, prov.user_id, prov.created_at, state)
+
+
+def latest_window_entries(window, after=None):
+    """The newest entry per record among `window`, ordered by record id."""
+    latest = (
+        db.select(db.func.max(ProvenanceLog.log_id).label("log_id"))
+        .where(*window)
+        .group_by(ProvenanceLog.record_pk)
+        .subquery()
+    )
+    record_id = db.cast(ProvenanceLog.record_pk, db.BigInteger)
+    stmt = db.select(ProvenanceLog).join(latest, latest.c.log_id == ProvenanceLog.log_id).order_by(record_id.asc())
+    if after is not None:
+        stmt = stmt.where(record_id > after)
+    return db.session.execute(stmt.execution_options(yield_per=RECORDS_STREAM_BATCH)).scalars()
+
+
+def checkpoint_rows(checkpoint, after=None):
+    """A checkpoint's rows ordered by record id."""
+    stmt = (
+        db.select(ProvenanceCheckpointRow)
+        .where(ProvenanceCheckpointRow.checkpoint_id == checkpoint.checkpoint_id)
+        .order_by(ProvenanceCheckpointRow.record_id.asc())
+    )
+    if after is not None:
+        stmt = stmt.where(ProvenanceCheckpointRow.record_id > after)
+    return db.session.execute(stmt.execution_options(yield_per=RECORDS_STREAM_BATCH)).scalars()
+
+
+def reconstructed_records(as_of, after=None, table_name="record"):
+    """
+    Every record alive at `as_of` (ordered by id, optionally after an id):
+    the rows of the nearest checkpoint merged with the newest entry per
+    record since it. Both sides stream in id order, so memory stays flat.
+    """
+    checkpoint = nearest_checkpoint(as_of, table_name)
+    since = checkpoint.as_of if checkpoint else None
+    check_replayable(since, table_name)
+    memo = provenance_export.BoundedMemo(EXPORT_PAYLOAD_MEMO)
+    changed = ((int(p.record_pk), p) for p in latest_window_entries(replay_window(as_of, since, table_name), after))
+    base = ((r.record_id, r) for r in checkpoint_rows(checkpoint, after)) if checkpoint else iter(())
+    c, b = next(changed, None), next(base, None)
+    while c is not None or b is not None:
+        if b is not None and (c is None or b[0] < c[0]):
+            r = b[1]
+            yield reconstructed_item(r.record_id, r.log_id, r.record_hash, r.user_id, r.changed_at, r.state)
+            b = next(base, None)
+            continue
+        if b is not None and b[0] == c[0]:
+            b = next(base, None)   # changed since the checkpoint
+        if c[1].operation != "D":
+            yield entry_item(c[1], memo)
+        c = next(changed, None)
+
+
+def reconstruct_record(record_id, as_of, table_name="record"):
+    """
+    One record as of `as_of`: (item or None if it did not exist then, the
+    entry that decided it or None). Reads the record's entries since the
+    nearest checkpoint, else its checkpoint row; archived entries are used
+    when neither exists.
+    """
+    pk = str(record_id)
+    checkpoint = nearest_checkpoint(as_of, table_name)
+    since = checkpoint.as_of if checkpoint else None
+    prov = (
+        ProvenanceLog.query
+        .filter(*replay_window(as_of, since, table_name), ProvenanceLog.record_pk == pk)
+        .order_by(ProvenanceLog.log_id.desc())
+        .first()
+    )
+    if prov is None and checkpoint is not None:
+        row = db.session.get(ProvenanceCheckpointRow, (checkpoint.checkpoint_id, pk))
+        if row is not None:
+            return reconstructed_item(row.record_id, row.log_id, row.record_hash, row.user_id, row.changed_at, row.state), None
+        return None, None
+    if prov is None:
+        prov = next((e for e in reversed(archived_entries(pk, table_name)) if as_utc(e.created_at) <= as_of), None)
+    if prov is None or prov.operation == "D":
+        return None, prov
+    return entry_item(prov), prov
+
+
+def logged_in_tx(tx_hash, record_id, record_hash):
+    """Whether transaction `tx_hash` emitted RecordLogged(record_id, record_hash) (for events not indexed yet)."""
+    if not tx_hash:
+        return False
+    chain = get_chain()
+    receipt = chain.w3.eth.get_transaction_receipt(tx_hash)
+    return any(
+        ev["args"]["recordId"] == record_id and hash_codec.decode(ev["args"]["recordHash"]) == record_hash
+        for contract in chain.event_contracts
+        for ev in contract.events.RecordLogged().process_receipt(receipt, errors=DISCARD)
+    )
+
+
+def verify_reconstructed(item, prov=None, table_name="record"):
+    """
+    Check a reconstructed state against the entry that produced it and the
+    chain: the entry's hash must still match its contents, its state must be
+    the reconstructed one (checkpoint rows are copies) and the hash must be
+    anchored (Merkle batch root, or the RecordLogged event of the entry's
+    transaction: indexed, the current getRecordHash() or its receipt).
+    """
+    if prov is None or prov.log_id != item["log_id"]:
+        prov = db.session.get(ProvenanceLog, item["log_id"]) or next(
+            (e for e in archived_entries(str(item["id"]), table_name) if e.log_id == item["log_id"]), None)
+    if prov is None:
+        return {"verified": False, "reason": "provenance entry missing"}
+    recomputed = entry_hash(prov)
+    if recomputed != prov.record_hash or recomputed != item["record_hash"]:
+        return {"verified": False, "reason": "provenance hash does not match the entry"}
+    if payload_codec.state_after(prov.operation, entry_payload(prov)) != item["state"]:
+        return {"verified": False, "reason": "reconstructed state differs from the entry"}
+    if prov.batch_id is not None:
+        anchored = batch_onchain_hash(prov, recomputed) == recomputed
+    else:
+        anchored = table_name == CONTRACT_KEYED_TABLE and (
+            db.session.query(ChainEvent.id).filter_by(record_id=item["id"], record_hash=recomputed).first() is not None
+            or chain_view("getRecordHash", item["id"]) == recomputed
+            or logged_in_tx(prov.blockchain_tx, item["id"], recomputed)
+        )
+    if anchored:
+        return {"verified": True, "reason": "hash anchored on-chain"}
+    if prov.anchor_status in ANCHOR_WAITING_STATES:
+        return {"verified": False, "reason": "not anchored yet"}
+    return {"verified": False, "reason": "hash not found on-chain"}
+
+
+def as_of_json(item, verification=None):
+    row = {**(item["state"] or {}), "id": item["id"], "modified_by": item["user_id"],
+           "timestamp": iso_utc(item["changed_at"]), "prov_log_id": item["log_id"]}
+    if verification is not None:
+        row["verification"] = verification
+    return row
+
+
+def records_as_of(as_of):
+    """/records?as_of=...: same paging and streaming options as the current table."""
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    verify = request.args.get('verify') == '1'
+    if verify and limit is None:
+        return jsonify({'error': 'verify=1 needs a page size (limit=N)'}), 400
+    items = reconstructed_records(as_of, after)
+    try:
+        first = next(items, None)   # surface AsOfUnavailable before the response starts
+    except AsOfUnavailable as e:
+        return jsonify({'error': str(e)}), 409
+    items = itertools.chain([first] if first is not None else [], items)
+
+    if limit is not None:
+        limit = max(1, min(limit, RECORDS_MAX_LIMIT))
+        rows = list(itertools.islice(items, limit + 1))
+        page = [as_of_json(i, verify_reconstructed(i) if verify else None) for i in rows[:limit]]
+        return jsonify({
+            'as_of': iso_utc(as_of),
+            'records': page,
+            'next_after': page[-1]['id'] if len(rows) > limit else None
+        })
+
+    ndjson = request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+    return Response(
+        stream_with_context(stream_json_lines(map(as_of_json, items), array=not ndjson)),
+        mimetype='application/x-ndjson' if ndjson else 'application/json'
+    )
+
+
+@bp.route('/records/<int:record_id>', methods=['GET'])
+@read_replica
+def get_record(record_id):
+    """
+    One record. ?as_of=<ISO 8601> -> its state at that time, rebuilt from
+    provenance; &verify=1 also checks that state against the anchored hash.
+    """
+    if not request.args.get('as_of'):
+        record = db.session.get(Record, record_id)
+        if record is None:
+            return jsonify({'error': 'Record not found'}), 404
+        return jsonify(record_json(record))
+    try:
+        as_of = parse_as_of(request.args['as_of'])
+    except ValueError:
+        return jsonify({'error': 'as_of must be an ISO 8601 timestamp'}), 400
+    item, prov = reconstruct_record(record_id, as_of)
+    if item is None:
+        response = {'error': f'Record {record_id} did not exist at {iso_utc(as_of)}'}
+        if prov is not None:
+            response['deleted_at'] = iso_utc(prov.created_at)
+        return jsonify(response), 404
+    verification = verify_reconstructed(item, prov) if request.args.get('verify') == '1' else None
+    return jsonify({'as_of': iso_utc(as_of), 'record': as_of_json(item, verification)})
+
+
+def checkpoint_build_lock(table_name):
+    """
+    Take the lock on building checkpoints of `table_name` for the rest of the
+    transaction; False if another process holds it. PostgreSQL: a
+    transaction-scoped advisory lock. SQLite allows one writer at a time, so
+    concurrent builds are serialized by the database itself.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return True
+    return db.session.execute(db.text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+                              {"key": f"provenance_checkpoint:{table_name}"}).scalar()
+
+
+def take_checkpoint(as_of=None, table_name="record"):
+    """
+    Materialize the state of `table_name` as of `as_of` (default: now minus
+    PROVENANCE_CHECKPOINT_SETTLE_SECONDS): the previous checkpoint's rows of
+    records unchanged since it are copied in one statement, the records
+    changed since are decoded from their newest entry. Returns the new
+    ProvenanceCheckpoint, None if the entries it needs are archived or
+    another process is building a checkpoint of the table right now.
+    """
+    now = datetime.now(timezone.utc)
+    as_of = as_of or now - timedelta(seconds=PROVENANCE_CHECKPOINT_SETTLE_SECONDS)
+    if not checkpoint_build_lock(table_name):
+        log.info("📸 Another process is building a checkpoint of %s, skipping", table_name)
+        db.session.rollback()
+        return None
+    prev = (
+        ProvenanceCheckpoint.query
+        .filter(ProvenanceCheckpoint.table_name == table_name, ProvenanceCheckpoint.as_of < as_of)
+        .order_by(ProvenanceCheckpoint.as_of.desc())
+        .first()
+    )
+    since = prev.as_of if prev else None
+    try:
+        check_replayable(since, table_name)
+    except AsOfUnavailable as e:
+        log.warning("⚠️ No checkpoint of %s at %s: %s", table_name, iso_utc(as_of), e)
+        db.session.rollback()
+        return None
+    checkpoint = ProvenanceCheckpoint(table_name=table_name, as_of=as_of, created_at=now)
+    db.session.add(checkpoint)
+    db.session.flush()
+
+    window = replay_window(as_of, since, table_name)
+    if prev is not None:
+        cols = ("record_pk", "record_id", "log_id", "record_hash", "user_id", "changed_at", "state")
+        changed = db.select(ProvenanceLog.record_pk).where(*window)
+        db.session.execute(db.insert(ProvenanceCheckpointRow).from_select(
+            ("checkpoint_id",) + cols,
+            db.select(db.literal(checkpoint.checkpoint_id), *(getattr(ProvenanceCheckpointRow, c) for c in cols))
+            .where(ProvenanceCheckpointRow.checkpoint_id == prev.checkpoint_id,
+                   ProvenanceCheckpointRow.record_pk.notin_(changed))
+        ))
+    memo, rows = provenance_export.BoundedMemo(EXPORT_PAYLOAD_MEMO), []
+    for prov in latest_window_entries(window):
+        if prov.operation == "D":
+            continue
+        item = entry_item(prov, memo)
+        rows.append({"checkpoint_id": checkpoint.checkpoint_id, "record_pk": prov.record_pk,
+                     "record_id": item["id"], "log_id": item["log_id"], "record_hash": item["record_hash"],
+                     "user_id": item["user_id"], "changed_at": item["changed_at"], "state": item["state"]})
+        if len(rows) >= RECORDS_STREAM_BATCH:
+            db.session.execute(db.insert(ProvenanceCheckpointRow), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(ProvenanceCheckpointRow), rows)
+    checkpoint.record_count = db.session.query(db.func.count(ProvenanceCheckpointRow.record_pk)).filter_by(
+        checkpoint_id=checkpoint.checkpoint_id).scalar()
+    db.session.commit()
+    return checkpoint
+
+
+checkpoint_lock = threading.Lock()
+checkpoint_checked = {"at": 0.0}
+
+
+def maybe_checkpoint(table_name="record"):
+    """
+    Anchor worker hook: take a checkpoint once PROVENANCE_CHECKPOINT_EVERY
+    entries were written after the last one (checked once a minute per
+    process). Returns 1 if a checkpoint was taken.
+    """
+    if PROVENANCE_CHECKPOINT_EVERY <= 0 or not checkpoint_lock.acquire(blocking=False):
+        return 0
+    try:
+        if time.monotonic() - checkpoint_checked["at"] < 60:
+            return 0
+        checkpoint_checked["at"] = time.monotonic()
+        last = db.session.query(db.func.max(ProvenanceCheckpoint.as_of)).filter_by(table_name=table_name).scalar()
+        window = [ProvenanceLog.table_name == table_name]
+        if last is not None:
+            window.append(ProvenanceLog.created_at > last)
+        # is there an EVERY-th entry? (bounded, unlike a count of the whole window)
+        due = db.session.execute(
+            db.select(ProvenanceLog.log_id).where(*window).offset(PROVENANCE_CHECKPOINT_EVERY - 1).limit(1)
+        ).first() is not None
+        if not due:
+            return 0
+        checkpoint = take_checkpoint(table_name=table_name)
+        if checkpoint is None:
+            return 0
+        log.info("📸 Checkpoint %s of %s as of %s: %s records",
+                 checkpoint.checkpoint_id, table_name, iso_utc(checkpoint.as_of), checkpoint.record_count)
+        return 1
+    finally:
+        checkpoint_lock.release()
+
+
+@bp.cli.command('checkpoint-records')
+@click.option('--as-of', default=None, help='ISO 8601 time to materialize (default: now minus the settle delay).')
+@click.option('--table-name', default="record")
+@click.option('--keep', default=0, type=int, help='Afterwards delete all but the newest N checkpoints (0: keep all).')
+def checkpoint_records_command(as_of, table_name, keep):
+    """Materialize the state of a table for point-in-time reads (/records?as_of=)."""
+    ensure_schema()
+    started = time.perf_counter()
+    checkpoint = take_checkpoint(parse_as_of(as_of) if as_of else None, table_name)
+    if checkpoint is None:
+        raise SystemExit(1)
+    print(f"📸 Checkpoint {checkpoint.checkpoint_id} of {table_name} as of {iso_utc(checkpoint.as_of)}: "
+          f"{checkpoint.record_count} records ({time.perf_counter() - started:.1f} s)")
+    if keep > 0:
+        old = [c for (c,) in db.session.query(ProvenanceCheckpoint.checkpoint_id)
+               .filter_by(table_name=table_name)
+               .order_by(ProvenanceCheckpoint.as_of.desc())
+               .offset(keep)]
+        if old:
+            ProvenanceCheckpointRow.query.filter(ProvenanceCheckpointRow.checkpoint_id.in_(old)).delete(synchronize_session=False)
+            ProvenanceCheckpoint.query.filter(ProvenanceCheckpoint.checkpoint_id.in_(old)).delete(synchronize_session=False)
+            db.session.commit()
+            print(f"🧹 {len(old)} older checkpoints deleted")
+
+# -------------------------------
+# Provenance export for auditors: every row of provenance_log in log order
+# with its decoded payload, anchoring tx and (if indexed) block, as NDJSON or
+# CSV, optionally gzip-compressed, in constant memory. Archived months are
+# not included; their segment files are the export (see verify-archive).
+# -------------------------------
+
+EXPORT_COLUMNS = (
+    "log_id", "table_name", "record_pk", "operation", "record_hash", "prev_hash", "payload", "user_id",
+    "created_at", "anchor_status", "blockchain_tx", "batch_id", "merkle_proof", "block_number", "block_timestamp",
+)
+
+
+def export_filters(args):
+    """
+    Validated export / search filters (from, to, table, user, operation,
+    verified) out of request args, CLI options or a cursor.
+    """
+    filters = {}
+    for name in ("from", "to"):
+        if args.get(name):
+            filters[name] = iso_utc(datetime.fromisoformat(args[name]))
+    for name in ("table", "user"):
+        if args.get(name):
+            filters[name] = str(args[name])
+    operation = args.get("operation")
+    if operation:
+        ops = [o.strip().upper() for o in (operation.split(",") if isinstance(operation, str) else operation)]
+        if not all(o in OPERATION_NAMES for o in ops):
+            raise ValueError(f"operation must be a list of {', '.join(OPERATION_NAMES)}")
+        filters["operation"] = ops
+    verified = args.get("verified")
+    if verified not in (None, ""):
+        if str(verified).lower() not in ("1", "0", "true", "false"):
+            raise ValueError("verified must be 1 or 0")
+        filters["verified"] = str(verified).lower() in ("1", "true")
+    return filters
+
+
+def export_conditions(filters, after):
+    return [ProvenanceLog.log_id > after] + filter_conditions(filters)
+
+
+def filter_conditions(filters):
+    conditions = []
+    if "from" in filters:
+        conditions.append(ProvenanceLog.created_at >= datetime.fromisoformat(filters["from"]))
+    if "to" in filters:
+        conditions.append(ProvenanceLog.created_at < datetime.fromisoformat(filters["to"]))
+    if "table" in filters:
+        conditions.append(ProvenanceLog.table_name == filters["table"])
+    if "user" in filters:
+        conditions.append(ProvenanceLog.user_id == filters["user"])
+    if "operation" in filters:
+        conditions.append(ProvenanceLog.operation.in_(filters["operation"]))
+    if "verified" in filters:
+        # unverified = never checked (NULL / default False) or failed /verify (partial index);
+        # verified is an equality, which a B-tree index can serve (IS TRUE cannot be)
+        conditions.append(ProvenanceLog.verified == db.true() if filters["verified"] else ProvenanceLog.verified.isnot(True))
+    return conditions
+
+
+def export_cursor(filters, after):
+    return provenance_export.encode_cursor({**filters, "after": after})
+
+
+def export_page_end(filters, after, limit):
+    """log_id of the last row of the next `limit` rows, and whether more rows follow it."""
+    ids = db.session.execute(
+        db.select(ProvenanceLog.log_id).where(*export_conditions(filters, after))
+        .order_by(ProvenanceLog.log_id.asc()).offset(limit - 1).limit(2)
+    ).scalars().all()
+    return (ids[0] if ids else None), len(ids) > 1
+
+
+def export_batches(filters, after=0, limit=None):
+    """
+    Export rows as lists of dicts of EXPORT_BATCH_SIZE rows, read through a
+    server-side cursor (keyset on log_id, so any log_id is a resume point).
+    """
+    stmt = (
+        db.select(ProvenanceLog, ChainEvent.block_number, ChainEvent.block_timestamp)
+        .outerjoin(ChainEvent, db.and_(
+            ChainEvent.tx_hash == ProvenanceLog.blockchain_tx,
+            db.cast(ChainEvent.record_id, db.String) == ProvenanceLog.record_pk,
+        ))
+        .where(*export_conditions(filters, after))
+        .order_by(ProvenanceLog.log_id.asc())
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    memo = provenance_export.BoundedMemo(EXPORT_PAYLOAD_MEMO)
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for batch in result.partitions():
+        rows = []
+        for prov, block_number, block_timestamp in batch:
+            row = {c: getattr(prov, c, None) for c in EXPORT_COLUMNS}
+            row.update(
+                payload=entry_payload(prov, memo=memo),
+                created_at=iso_utc(prov.created_at),
+                block_number=block_number,
+                block_timestamp=iso_utc(block_timestamp),
+            )
+            rows.append(row)
+        yield rows
+
+
+@bp.route('/export', methods=['GET'])
+@read_replica
+def export_provenance():
+    """
+    Stream provenance rows in log order.
+    ?format=ndjson (default) | csv, &gzip=1 -> gzip-compressed on the fly
+    ?from=&to= (ISO 8601 created_at range, to exclusive) ?table= ?user= ?operation=I,U
+    ?limit=N -> at most N rows; the X-Export-Next-Cursor header holds the token for the rest
+    ?cursor=<token> -> continue an export (its filters come from the token);
+    ?after=<log_id> does the same with explicit filters (e.g. after a broken download)
+    """
+    args = request.args
+    try:
+        if args.get('cursor'):
+            state = provenance_export.decode_cursor(args['cursor'])
+            filters, after = export_filters(state), int(state.get('after', 0))
+        else:
+            filters, after = export_filters(args), int(args.get('after', 0))
+        enc = provenance_export.encoder(args.get('format', 'ndjson'), EXPORT_COLUMNS)
+        limit = int(args['limit']) if args.get('limit') else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    compress = args.get('gzip') == '1'
+
+    headers = {}
+    if limit is not None:
+        last, more = export_page_end(filters, after, limit)
+        if more:
+            headers['X-Export-Next-Cursor'] = export_cursor(filters, last)
+
+    def generate():
+        gz = provenance_export.GzipStream() if compress else None
+        chunk = enc.header()
+        for rows in export_batches(filters, after, limit):
+            chunk += enc.encode(rows)
+            yield gz.compress(chunk) + gz.flush() if gz else chunk
+            chunk = ""
+        yield gz.compress(chunk) + gz.close() if gz else chunk
+
+    extension = args.get('format', 'ndjson') + ('.gz' if compress else '')
+    headers['Content-Disposition'] = f'attachment; filename="provenance-export.{extension}"'
+    return Response(
+        stream_with_context(generate()),
+        headers=headers,
+        content_type='application/gzip' if compress else enc.content_type
+    )
+
+
+@bp.cli.command('export-provenance')
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False),
+              help='File to write; a .gz suffix compresses it.')
+@click.option('--format', 'fmt', type=click.Choice(provenance_export.FORMATS), default=None,
+              help='Default: csv for *.csv[.gz], ndjson otherwise.')
+@click.option('--from', 'from_', default=None, help='created_at >= (ISO 8601)')
+@click.option('--to', default=None, help='created_at < (ISO 8601)')
+@click.option('--table-name', default=None)
+@click.option('--user', default=None)
+@click.option('--operation', default=None, help='Comma-separated operation codes, e.g. I,D')
+@click.option('--resume', is_flag=True, help='Continue an interrupted export into the same file.')
+def export_provenance_command(output, fmt, from_, to, table_name, user, operation, resume):
+    """
+    Export provenance rows to a file. Progress is checkpointed after every
+    batch in <output>.cursor, so --resume picks up after the last complete
+    batch (gzip output is written as one gzip member per batch).
+    """
+    ensure_schema()
+    checkpoint_path = output + ".cursor"
+    if fmt is None:
+        fmt = "csv" if output.removesuffix(".gz").endswith(".csv") else "ndjson"
+    compress = output.endswith(".gz")
+    enc = provenance_export.encoder(fmt, EXPORT_COLUMNS)
+
+    if resume:
+        if not os.path.exists(checkpoint_path):
+            raise click.UsageError(f"no checkpoint {checkpoint_path} to resume from")
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        state = provenance_export.decode_cursor(checkpoint["cursor"])
+        filters, after, rows_done = export_filters(state), state["after"], checkpoint["rows"]
+        with open(output, "r+b") as f:
+            f.truncate(checkpoint["offset"])   # drop a batch written only partially
+        mode = "ab"
+        print(f"↪️ Resuming after log {after} ({rows_done} rows already exported)")
+    else:
+        filters = export_filters({"from": from_, "to": to, "table": table_name, "user": user, "operation": operation})
+        after, rows_done, mode = 0, 0, "wb"
+
+    def encoded(text):
+        return provenance_export.gzip_member(text) if compress else text.encode()
+
+    started = time.perf_counter()
+    with open(output, mode) as f:
+        if not resume and enc.header():
+            f.write(encoded(enc.header()))
+        for rows in export_batches(filters, after):
+            f.write(encoded(enc.encode(rows)))
+            f.flush()
+            rows_done, after = rows_done + len(rows), rows[-1]["log_id"]
+            with open(checkpoint_path + ".tmp", "w") as cp:
+                json.dump({"cursor": export_cursor(filters, after), "offset": f.tell(), "rows": rows_done}, cp)
+            os.replace(checkpoint_path + ".tmp", checkpoint_path)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"📦 Exported {rows_done} provenance rows to {output} "
+          f"(through log {after}, {time.perf_counter() - started:.1f} s)")
+
+
+# -------------------------------
+# Provenance search: filtered, keyset-paginated listing of provenance_log
+# (newest first by default) plus bounded counts and grouped counts. Every
+# filter has an index in the (created_at, log_id) order of the keyset, so a
+# page costs an index range scan of `limit` rows whatever the size of the log.
+# -------------------------------
+
+SEARCH_COLUMNS = (
+    "log_id", "table_name", "record_pk", "operation", "record_hash", "user_id", "created_at",
+    "verified", "verified_at", "anchor_status", "blockchain_tx", "batch_id",
+)
+SEARCH_MAX_LIMIT = RECORDS_MAX_LIMIT
+# ?group_by= values -> grouped expression
+SEARCH_GROUPS = {
+    "operation": ProvenanceLog.operation,
+    "user": ProvenanceLog.user_id,
+    "table": ProvenanceLog.table_name,
+    "verified": ProvenanceLog.verified,
+    "anchor_status": ProvenanceLog.anchor_status,
+    "day": ProvenanceLog.created_at,
+}
+
+
+def search_json(p, with_payload=False):
+    row = {c: getattr(p, c) for c in SEARCH_COLUMNS}
+    row.update(created_at=iso_utc(p.created_at), verified_at=iso_utc(p.verified_at))
+    if with_payload:
+        row["payload"] = entry_payload(p)
+    return row
+
+
+@bp.route('/provenance/search', methods=['GET'])
+@read_replica
+def search_provenance():
+    """
+    Search provenance entries.
+    ?user= ?operation=I,U,D ?table= ?verified=1|0 ?from=&to= (ISO 8601 created_at range, to exclusive)
+    ?limit=N (default 100) &order=desc|asc -> {"entries": [...], "next_cursor": <token or null>}
+    ?cursor=<token> -> the next page (filters and order come from the token)
+    ?count=1 -> {"count": N};  ?group_by=operation|user|table|verified|anchor_status|day -> grouped counts
+    ?payload=1 adds the decoded payload of each entry.
+    """
+    args = request.args.to_dict()
+    # user_id / table_name are accepted as spelled in provenance_log
+    args.setdefault("user", args.get("user_id"))
+    args.setdefault("table", args.get("table_name"))
+    try:
+        if args.get('cursor'):
+            state = provenance_export.decode_cursor(args['cursor'])
+            filters, order = export_filters(state), state.get("order", "desc")
+            position = (datetime.fromisoformat(state["created_at"]), int(state["log_id"]))
+        else:
+            filters, order, position = export_filters(args), args.get("order", "desc"), None
+        limit = max(1, min(int(args.get('limit') or 100), SEARCH_MAX_LIMIT))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e) or 'invalid cursor token'}), 400
+    if order not in ("asc", "desc"):
+        return jsonify({'error': 'order must be asc or desc'}), 400
+    conditions = filter_conditions(filters)
+
+    if args.get('count') == '1':
+        count, exact = bounded_count(conditions)
+        return jsonify({'filters': filters, 'count': count, 'exact': exact})
+    if args.get('group_by'):
+        column = SEARCH_GROUPS.get(args['group_by'])
+        if column is None:
+            return jsonify({'error': f"group_by must be one of {', '.join(SEARCH_GROUPS)}"}), 400
+        # group the newest SEARCH_COUNT_LIMIT (+1, to tell whether there are more) matches
+        newest = (
+            db.select(column).where(*conditions)
+            .order_by(ProvenanceLog.created_at.desc(), ProvenanceLog.log_id.desc())
+            .limit(SEARCH_COUNT_LIMIT + 1)
+            .subquery()
+        )
+        key = newest.c[column.key]
+        if args['group_by'] == 'day':
+            key = db.func.date(key)
+        rows = db.session.execute(
+            db.select(key.label("key"), db.func.count().label("count")).group_by(key).order_by(key)
+        ).all()
+        return jsonify({'filters': filters, 'group_by': args['group_by'],
+                        'exact': sum(n for _, n in rows) <= SEARCH_COUNT_LIMIT,
+                        'groups': [{'key': str(k) if args['group_by'] == 'day' else k, 'count': n} for k, n in rows]})
+
+    keyset = db.tuple_(ProvenanceLog.created_at, ProvenanceLog.log_id)
+    stmt = db.select(ProvenanceLog).where(*conditions)
+    if order == "desc":
+        stmt = stmt.order_by(ProvenanceLog.created_at.desc(), ProvenanceLog.log_id.desc())
+        if position is not None:
+            stmt = stmt.where(keyset < position)
+    else:
+        stmt = stmt.order_by(ProvenanceLog.created_at.asc(), ProvenanceLog.log_id.asc())
+        if position is not None:
+            stmt = stmt.where(keyset > position)
+    entries = db.session.execute(stmt.limit(limit + 1)).scalars().all()
+    page = entries[:limit]
+    next_cursor = None
+    if len(entries) > limit:
+        last = page[-1]
+        next_cursor = provenance_export.encode_cursor(
+            {**filters, "order": order, "created_at": iso_utc(last.created_at), "log_id": last.log_id})
+    with_payload = args.get('payload') == '1'
+    return jsonify({
+        'filters': filters,
+        'entries': [search_json(p, with_payload) for p in page],
+        'next_cursor': next_cursor
+    })
+
+
+def bounded_count(conditions):
+    """
+    (rows of provenance_log matching `conditions`, exact?) reading at most
+    SEARCH_COUNT_LIMIT + 1 rows. Beyond that the count is the planner's
+    estimate on PostgreSQL and SEARCH_COUNT_LIMIT + 1 (a lower bound) elsewhere.
+    """
+    matching = db.select(ProvenanceLog.log_id).where(*conditions)
+    count = db.session.execute(
+        db.select(db.func.count()).select_from(matching.limit(SEARCH_COUNT_LIMIT + 1).subquery())
+    ).scalar()
+    if count <= SEARCH_COUNT_LIMIT:
+        return count, True
+    if db.engine.dialect.name == 'postgresql':
+        sql = matching.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True})
+        plan = db.session.execute(db.text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        count = max(count, int(plan[0]["Plan"]["Plan Rows"]))
+    return count, False
+
+
+def open_status_counts(model, key):
+    """
+    {status: rows} for every OPEN_STATES status of `model` (zero included).
+    Settled rows are never read: the status filter is a range scan of the
+    (partial) outbox index, so the cost follows the backlog, not the table.
+    """
+    counts = dict.fromkeys(OPEN_STATES, 0)
+    counts.update(
+        db.session.query(model.anchor_status, db.func.count(key))
+        .filter(db.text(OPEN_STATES_SQL))   # the index predicate verbatim, so SQLite uses it too
+        .group_by(model.anchor_status)
+        .all()
+    )
+    return counts
+
+
+@bp.route('/outbox', methods=['GET'])
+@read_replica
+def outbox_status():
+    """Anchoring outbox overview: row counts per open anchor_status plus the oldest due row."""
+    counts = open_status_counts(ProvenanceLog, ProvenanceLog.log_id)
+    batch_counts = open_status_counts(AnchorBatch, AnchorBatch.batch_id)
+    oldest = (
+        ProvenanceLog.query
+        .filter(ProvenanceLog.anchor_status.in_(OUTBOX_STATES))
+        .order_by(ProvenanceLog.log_id.asc())
+        .first()
+    )
+    return jsonify({
+        "mode": ANCHOR_MODE,
+        "workers": len([t for t in anchor_threads if t.is_alive()]),
+        "counts": counts,
+        "batch_counts": batch_counts,
+        "next_nonces": get_chain().nonces.snapshot(),
+        "oldest_pending": None if not oldest else {
+            "log_id": oldest.log_id,
+            "record_pk": oldest.record_pk,
+            "created_at": iso_utc(oldest.created_at),
+            "attempts": oldest.anchor_attempts,
+            "last_error": oldest.anchor_error
+        }
     }), 200
-    
+
+
+@bp.route('/chain_cache', methods=['GET'])
+def chain_cache_stats():
+    """Hit/miss counters of the on-chain read cache."""
+    return jsonify(get_chain().reads.stats()), 200
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint: request/stage latency, anchoring, verification and RPC counters."""
+    try:
+        for status, count in open_status_counts(ProvenanceLog, ProvenanceLog.log_id).items():
+            OUTBOX_ROWS.set(count, status=status)
+    except Exception:
+        db.session.rollback()   # still expose the in-process metrics
+    for stat, value in get_chain().reads.stats().items():
+        if isinstance(value, (int, float)):
+            CHAIN_CACHE.set(value, stat=stat)
+    bus = current_app.extensions['live_bus']
+    LIVE_FEED.set(bus.subscribers, stat="subscribers")
+    LIVE_FEED.set(bus.published, stat="published")
+    return Response(registry.render(), content_type=metrics.CONTENT_TYPE)
+
 
 """development only ⚠️ (never use in production): the next functions"""
 
-@app.route('/reset_db', methods=['DELETE'])
+@bp.route('/reset_db', methods=['DELETE'])
 def reset_database():
     try:
+        db.session.query(ProvenanceHead).delete()
         db.session.query(ProvenanceLog).delete()
+        db.session.query(TamperFinding).delete()
+        db.session.query(TamperSweepRun).delete()
+        db.session.query(ArchiveSegment).delete()
+        db.session.query(ProvenanceCheckpointRow).delete()
+        db.session.query(ProvenanceCheckpoint).delete()
+        db.session.query(AnchorBatch).delete()
         db.session.query(Record).delete()
+        db.session.query(BlobRecord).delete()   # stored chunks stay in BLOB_DIR
         db.session.commit()
         return jsonify({'message': '✅ All records and provenance logs deleted from DB.'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
     
-@app.route('/tamper/<int:record_id>', methods=['PUT'])
+@bp.route('/tamper/<int:record_id>', methods=['PUT'])
 def tamper_record(record_id):
     """Simulate data tampering for verification test."""
     try:
@@ -535,6 +4560,7 @@ def tamper_record(record_id):
             return jsonify({'error': 'Record not found'}), 404
 
         # Modify the data directly (bypassing provenance + blockchain)
+        db.session.info['provenance_capture'] = False
         old_data = record.data
         record.data = record.data + " (TAMPERED)"
         db.session.commit()
@@ -549,7 +4575,228 @@ def tamper_record(record_id):
         return jsonify({'error': str(e)}), 500
 
 # -------------------------------
+# Application factory + readiness
+# -------------------------------
+
+def readiness_checks():
+    """Schema, ABI and node checks; each one reports ok/error on its own."""
+    chain = get_chain()
+    checks = {}
+    try:
+        ensure_schema()
+        db.session.execute(db.text("SELECT 1"))
+        checks["database"] = {"ok": True}
+    except Exception as e:
+        db.session.rollback()
+        checks["database"] = {"ok": False, "error": str(e)}
+    checks["outbox_worker"] = outbox_worker_check()
+    for key in current_app.extensions['read_replicas']:
+        try:
+            with db.engines[key].connect() as conn:
+                conn.execute(db.text("SELECT 1"))
+            checks[key] = {"ok": True}
+        except Exception as e:
+            checks[key] = {"ok": False, "error": str(e)}
+    try:
+        chain.abi
+        if chain.legacy_address:
+            chain.legacy_abi
+        block_number = chain.ping()
+        chain.default_account
+        checks["chain"] = {"ok": True, "block_number": block_number, "hash_format": chain.codec.format}
+    except Exception as e:
+        checks["chain"] = {"ok": False, "error": str(e)}
+    return checks
+
+
+def outbox_worker_check():
+    """Ok while an outbox worker runs in this process or has checked in recently from another one."""
+    local = sum(t.is_alive() for t in anchor_threads)
+    try:
+        last = as_utc(db.session.query(db.func.max(WorkerHeartbeat.beat_at)).filter(WorkerHeartbeat.kind == "anchor").scalar())
+    except Exception as e:
+        db.session.rollback()
+        return {"ok": local > 0, "local_threads": local, "error": str(e)}
+    fresh = last is not None and last >= datetime.now(timezone.utc) - timedelta(seconds=WORKER_HEARTBEAT_STALE_SECONDS)
+    return {"ok": local > 0 or fresh, "local_threads": local, "last_heartbeat": iso_utc(last)}
+
+
+def startup_report():
+    state = current_app.extensions['startup']
+    report = {k: v for k, v in state.items() if k != 'lock'}
+    report.update(get_chain().timings)
+    return report
+
+
+@bp.before_app_request
+def prepare_request():
+    g.request_started = time.perf_counter()
+    # /ready reports a missing database instead of failing on it
+    if request.endpoint != 'provenance.readiness':
+        ensure_schema()
+
+
+@bp.after_app_request
+def record_first_request(response):
+    state = current_app.extensions['startup']
+    if state.get('first_request_seconds') is None:
+        # cold start: process import -> first response
+        state['first_request_seconds'] = round(time.perf_counter() - IMPORT_STARTED, 6)
+        log.info("🚀 First request served %.0f ms after start", state['first_request_seconds'] * 1000)
+    return response
+
+
+@bp.after_app_request
+def observe_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint_label(),
+                                method=request.method, status=str(response.status_code))
+    return response
+
+
+@bp.route('/ready', methods=['GET'])
+def readiness():
+    """
+    Readiness phase: create the schema if needed, load the ABI and reach the
+    node, and see a live outbox worker. 200 once everything is up, 503
+    otherwise (database-only endpoints such as /records keep working while
+    the chain is down).
+    """
+    checks = readiness_checks()
+    ready = all(c["ok"] for c in checks.values())
+    return jsonify({"ready": ready, "checks": checks, "startup": startup_report()}), 200 if ready else 503
+
+
+def warm_up(app):
+    """Background readiness phase (WARMUP=1), so the first requests don't pay for it."""
+    with app.app_context():
+        started = time.perf_counter()
+        checks = readiness_checks()
+        state = app.extensions['startup']
+        state['warmup_seconds'] = round(time.perf_counter() - started, 6)
+        failed = [name for name, c in checks.items() if not c["ok"]]
+        log.info("🚀 Readiness phase done in %.0f ms%s", state['warmup_seconds'] * 1000,
+                 f" (not ready: {', '.join(failed)})" if failed else "")
+
+
+def create_app(config=None):
+    """
+    Build the Flask app. `config` overrides the defaults below (any Flask or
+    Flask-SQLAlchemy key, plus RPC_URL, CONTRACT_ADDRESS, CONTRACT_ARTIFACT,
+    CONTRACT_ABI_CACHE, CONTRACT_LEGACY_ADDRESS, CONTRACT_LEGACY_ARTIFACT, WARMUP, ARCHIVE_DIR, BLOB_DIR,
+    READ_REPLICA_URIS, BACKGROUND_WORKERS and BACKGROUND_LOCK_FILE; CHAIN_W3, CHAIN_ASYNC_W3, CONTRACT_ABI and CONTRACT_LEGACY_ABI
+    plug in an in-process chain instead of the node, see bench/). Nothing connects to the node or the
+    database here: the schema is checked on the first request (or worker/CLI
+    command), the ABI and node connection on first chain use.
+    BACKGROUND_WORKERS starts the background threads (see
+    start_background_workers()).
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    CORS(app)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=DATABASE_URI,
+        SQLALCHEMY_ENGINE_OPTIONS={
+            'connect_args': {'options': '-c timezone=utc'},
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_recycle': DB_POOL_RECYCLE_SECONDS,
+            'pool_pre_ping': True,
+        },
+        SQLALCHEMY_BINDS={},
+        READ_REPLICA_URIS=DATABASE_REPLICA_URIS,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        RPC_URL=RPC_URL,
+        CONTRACT_ADDRESS=CONTRACT_ADDRESS,
+        CONTRACT_ARTIFACT=CONTRACT_ARTIFACT,
+        CONTRACT_ABI_CACHE=CONTRACT_ABI_CACHE,
+        CONTRACT_LEGACY_ADDRESS=CONTRACT_LEGACY_ADDRESS,
+        CONTRACT_LEGACY_ARTIFACT=CONTRACT_LEGACY_ARTIFACT,
+        WARMUP=WARMUP,
+        CHAIN_W3=None,
+        CHAIN_ASYNC_W3=None,
+        CONTRACT_ABI=None,
+        CONTRACT_LEGACY_ABI=None,
+        ARCHIVE_DIR=ARCHIVE_DIR,
+        BLOB_DIR=BLOB_DIR,
+        BACKGROUND_WORKERS=BACKGROUND_WORKERS,
+        BACKGROUND_LOCK_FILE=BACKGROUND_LOCK_FILE,
+    )
+    app.config.update(config or {})
+    # READ_REPLICA_URIS become binds replica_0, replica_1, ... (each with its own pool)
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config['SQLALCHEMY_BINDS'] or {})
+    for i, uri in enumerate(app.config['READ_REPLICA_URIS']):
+        app.config['SQLALCHEMY_BINDS'].setdefault(f"{REPLICA_BIND_PREFIX}_{i}", {
+            'url': uri,
+            **({'pool_size': DB_REPLICA_POOL_SIZE} if 'pool_size' in app.config['SQLALCHEMY_ENGINE_OPTIONS'] else {}),
+        })
+    app.extensions['read_replicas'] = replica_binds(app)
+
+    db.init_app(app)
+    app.register_blueprint(bp)
+
+    chain = chain_client.ChainClient(
+        app.config['RPC_URL'],
+        app.config['CONTRACT_ADDRESS'],
+        app.config['CONTRACT_ARTIFACT'],
+        app.config['CONTRACT_ABI_CACHE'],
+        rpc_options={"max_in_flight": RPC_MAX_IN_FLIGHT, "pool_size": RPC_POOL_SIZE, "timeout": RPC_TIMEOUT_SECONDS},
+        read_cache_size=CHAIN_CACHE_SIZE,
+        head_check_seconds=CHAIN_CACHE_HEAD_CHECK_SECONDS,
+        block_timestamp_cache_size=BLOCK_TIMESTAMP_CACHE_SIZE,
+        w3=app.config['CHAIN_W3'],
+        async_w3=app.config['CHAIN_ASYNC_W3'],
+        abi=app.config['CONTRACT_ABI'],
+        legacy_address=app.config['CONTRACT_LEGACY_ADDRESS'],
+        legacy_artifact_path=app.config['CONTRACT_LEGACY_ARTIFACT'],
+        legacy_abi=app.config['CONTRACT_LEGACY_ABI'],
+    )
+    chain.nonces = nonce_manager.NonceManager(lambda: db.engine, SenderNonce.__table__, chain.pending_count)
+    chain.rpc.observer = observe_rpc
+    app.extensions['chain'] = chain
+    app.extensions['archive'] = provenance_archive.Archive(app.config['ARCHIVE_DIR'])
+    app.extensions['blobs'] = blob_store.BlobStore(app.config['BLOB_DIR'], BLOB_CHUNK_BYTES)
+    app.extensions['live_bus'] = live_feed.LiveBus(LIVE_FEED_QUEUE)
+    # only started by the first /live client (PostgreSQL only)
+    app.extensions['live_listener'] = live_feed.NotifyListener(
+        functools.partial(live_connection, app), LIVE_FEED_CHANNEL, app.extensions['live_bus'])
+
+    if not provenance_log.handlers:
+        # JSON lines as they are, on stderr
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        provenance_log.addHandler(handler)
+        provenance_log.setLevel(PROVENANCE_LOG_LEVEL)
+        provenance_log.propagate = False
+    if not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(threadName)s] %(message)s'))
+        log.addHandler(handler)
+        log.setLevel(APP_LOG_LEVEL)
+        log.propagate = False
+
+    app.extensions['startup'] = {
+        'lock': threading.Lock(),
+        'import_seconds': IMPORT_SECONDS,
+        'create_app_seconds': round(time.perf_counter() - started, 6),
+        'schema_seconds': None,
+        'first_request_seconds': None,
+    }
+    log.info("🚀 App created in %.1f ms (module import %.0f ms)", (time.perf_counter() - started) * 1000, IMPORT_SECONDS * 1000)
+
+    if app.config['WARMUP']:
+        threading.Thread(target=warm_up, args=(app,), name="warm-up", daemon=True).start()
+    if app.config['BACKGROUND_WORKERS'] and serving_process():
+        start_background_workers(app)
+    return app
+
+
+IMPORT_SECONDS = round(time.perf_counter() - IMPORT_STARTED, 6)
+
 if __name__ == '__main__':
+    # the debug reloader runs this twice; only the serving child starts the background threads
+    app = create_app({'BACKGROUND_WORKERS': BACKGROUND_WORKERS and os.environ.get('WERKZEUG_RUN_MAIN') == 'true'})
     app.run(debug=True)
 
 """ 
@@ -0,0 +1,384 @@
+"""
+Benchmark harness: mixed workloads against the Flask app on local stand-ins.
+
+The app is built with create_app() on a throwaway database (a temporary
+SQLite file, or --database-uri for e.g. a scratch Postgres) and the
+in-process Provenance contract from mock_chain.py, then served on a local
+port. For each table size (the records table is topped up through
+/add_bulk) and each concurrency level, worker threads send a weighted mix of
+/add, /update, /delete, /verify and /history requests for a fixed time.
+Latency percentiles and throughput per endpoint are printed and saved as
+JSON, so runs can be compared (--compare).
+
+    python bench/bench.py --records 1000,10000 --concurrency 1,8,32 --duration 20
+    python bench/bench.py --anchor-mode merkle --block-time 1 --compare bench/results/<earlier>.json
+
+ANCHOR_MODE and the other app settings are read from the environment when
+app.py is imported; --anchor-mode is a shortcut for the most important one.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+ENDPOINTS = ("add", "update", "delete", "verify", "history")
+DEFAULT_MIX = "add=15,update=15,delete=5,verify=45,history=20"
+
+
+def say(msg):
+    # the app's own prints may be silenced (see --show-app-output)
+    print(msg, file=sys.__stdout__, flush=True)
+
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r} (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "ops_per_sec": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+    }
+
+
+# -------------------------------
+# App under test
+# -------------------------------
+
+def start_app(args):
+    """Build the app on the stand-ins and serve it on a free local port; returns (base_url, app module, chain, database URI)."""
+    os.environ.setdefault("ANCHOR_MODE", args.anchor_mode)
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    import app as provenance_app
+    from mock_chain import MockProvenanceChain, PROVENANCE_ABI, PROVENANCE_V2_ABI
+    from werkzeug.serving import make_server
+
+    database_uri = args.database_uri
+    engine_options = {}
+    if database_uri is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="provenance-bench-"), "bench.db")
+        database_uri = f"sqlite:///{path}"
+    if database_uri.startswith("sqlite"):
+        # concurrent writers wait for SQLite's single write lock instead of failing
+        engine_options = {"connect_args": {"timeout": 60}}
+    else:
+        engine_options = {"connect_args": {"options": "-c timezone=utc"}, "pool_size": args.db_pool_size}
+
+    chain = MockProvenanceChain(block_time=args.block_time, rpc_latency=args.rpc_latency, hash_format=args.hash_format)
+    app = provenance_app.create_app({
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "SQLALCHEMY_ENGINE_OPTIONS": engine_options,
+        "CHAIN_W3": chain.w3(),
+        "CHAIN_ASYNC_W3": chain.async_w3(),
+        "CONTRACT_ABI": PROVENANCE_V2_ABI if args.hash_format == "bytes32" else PROVENANCE_ABI,
+        "BACKGROUND_WORKERS": False,   # no indexer or tamper sweep during the run
+    })
+    if database_uri != args.database_uri:
+        say(f"🗄️ Database: {database_uri}")
+    elif not args.keep_database:
+        with app.app_context():
+            provenance_app.db.drop_all()
+
+    # sync mode only leaves retries to them, but /ready wants a live worker
+    provenance_app.start_anchor_workers(app)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-server", daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    ready = requests.get(f"{base}/ready", timeout=60)
+    if ready.status_code != 200:
+        raise SystemExit(f"❌ App not ready: {ready.text}")
+    return base, provenance_app, chain, database_uri
+
+
+# -------------------------------
+# Workload
+# -------------------------------
+
+class RecordPool:
+    """Ids of live records; deletes take their id out before the request is sent."""
+
+    def __init__(self):
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, ids):
+        with self._lock:
+            self._ids.extend(ids)
+
+    def pick(self, rng):
+        with self._lock:
+            return rng.choice(self._ids) if self._ids else None
+
+    def take(self, rng):
+        with self._lock:
+            if not self._ids:
+                return None
+            i = rng.randrange(len(self._ids))
+            self._ids[i], self._ids[-1] = self._ids[-1], self._ids[i]
+            return self._ids.pop()
+
+
+def payload(rng, size):
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789 ") for _ in range(size))
+
+
+def fill(base, pool, target, rng, data_size, chunk=1000):
+    """Top the records table up to `target` rows through /add_bulk."""
+    session = requests.Session()
+    while len(pool) < target:
+        n = min(chunk, target - len(pool))
+        items = [{"data": payload(rng, data_size)} for _ in range(n)]
+        r = session.post(f"{base}/add_bulk", json={"user": "bench", "items": items}, timeout=600)
+        r.raise_for_status()
+        pool.add([item["id"] for item in r.json()["results"] if "id" in item])
+
+
+def run_operation(op, session, base, pool, rng, data_size):
+    """Send one request; returns the HTTP status (None when there was nothing to do)."""
+    if op == "add":
+        r = session.post(f"{base}/add", json={"user": "bench", "data": payload(rng, data_size)})
+        if r.status_code == 201:
+            pool.add([r.json()["id"]])
+        return r.status_code
+    if op == "delete":
+        record_id = pool.take(rng)
+        if record_id is None:
+            return None
+        return session.delete(f"{base}/delete/{record_id}", json={"user": "bench"}).status_code
+    record_id = pool.pick(rng)
+    if record_id is None:
+        return None
+    if op == "update":
+        return session.put(f"{base}/update/{record_id}", json={"user": "bench", "data": payload(rng, data_size)}).status_code
+    if op == "verify":
+        return session.get(f"{base}/verify/{record_id}").status_code
+    return session.get(f"{base}/history/{record_id}").status_code
+
+
+def run_phase(base, pool, mix, concurrency, duration, seed, data_size):
+    """Run the mix with `concurrency` threads for `duration` seconds; returns per-endpoint samples."""
+    ops, weights = zip(*mix.items())
+    samples = {op: [] for op in ops}
+    errors = {op: {} for op in ops}
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency + 1)
+    deadline = [None]
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        session = requests.Session()
+        mine = {op: [] for op in ops}
+        failed = {op: {} for op in ops}
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            op = rng.choices(ops, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                status = run_operation(op, session, base, pool, rng, data_size)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            if status is None:
+                continue
+            mine[op].append(time.perf_counter() - t0)
+            if not isinstance(status, int) or status >= 400:
+                failed[op][str(status)] = failed[op].get(str(status), 0) + 1
+        with lock:
+            for op in ops:
+                samples[op].extend(mine[op])
+                for status, count in failed[op].items():
+                    errors[op][status] = errors[op].get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    start.wait()
+    for t in threads:
+        t.join()
+    return samples, errors, time.perf_counter() - started
+
+
+# -------------------------------
+# Reporting
+# -------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_phase(phase):
+    say(f"\n📊 records={phase['records']} concurrency={phase['concurrency']} "
+        f"({phase['total']['ops_per_sec']} ops/s overall)")
+    say(f"   {'endpoint':<10}{'count':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  errors")
+    for name, s in list(phase["endpoints"].items()) + [("total", phase["total"])]:
+        say(f"   {name:<10}{s['count']:>8}{s['ops_per_sec']:>10}{s['p50_ms']!s:>10}{s['p95_ms']!s:>10}"
+            f"{s['p99_ms']!s:>10}  {s['errors'] or ''}")
+
+
+def compare(result, baseline_path):
+    """Print throughput / p95 changes against an earlier result file, phase by phase."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    earlier = {(p["records"], p["concurrency"]): p for p in baseline["phases"]}
+    say(f"\n🔁 Compared with {baseline_path} (commit {baseline.get('commit')})")
+    for phase in result["phases"]:
+        old = earlier.get((phase["records"], phase["concurrency"]))
+        if old is None:
+            continue
+        for name in list(phase["endpoints"]) + ["total"]:
+            new_s = phase["total"] if name == "total" else phase["endpoints"][name]
+            old_s = old["total"] if name == "total" else old["endpoints"].get(name)
+            if not old_s or not old_s["ops_per_sec"] or not old_s["p95_ms"] or not new_s["p95_ms"]:
+                continue
+            ops = (new_s["ops_per_sec"] / old_s["ops_per_sec"] - 1) * 100
+            p95 = (new_s["p95_ms"] / old_s["p95_ms"] - 1) * 100
+            say(f"   records={phase['records']:<7} c={phase['concurrency']:<4} {name:<9}"
+                f" ops/s {ops:+7.1f}%   p95 {p95:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=parse_ints, default=[1000], help="table sizes to test, e.g. 1000,100000")
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 8, 32], help="client threads, e.g. 1,8,32")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per (table size, concurrency) phase")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each table size")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--data-size", type=int, default=64, help="characters per record")
+    parser.add_argument("--anchor-mode", default="sync", choices=("sync", "async", "merkle"))
+    parser.add_argument("--block-time", type=float, default=0.0, help="seconds per block of the mock chain (0: automine)")
+    parser.add_argument("--hash-format", default="string", choices=("string", "bytes32"),
+                        help="record hashes on the mock chain: Provenance.sol (string) or ProvenanceV2.sol (bytes32)")
+    parser.add_argument("--rpc-latency", type=float, default=0.001, help="seconds added to every mock RPC call")
+    parser.add_argument("--database-uri", help="database to use instead of a temporary SQLite file (its tables are dropped first)")
+    parser.add_argument("--keep-database", action="store_true", help="don't drop the tables of --database-uri")
+    parser.add_argument("--db-pool-size", type=int, default=40, help="SQLAlchemy pool size for --database-uri")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", metavar="RESULT_JSON", help="earlier result file to compare against")
+    parser.add_argument("--show-app-output", action="store_true", help="keep the app's own prints")
+    args = parser.parse_args(argv)
+    # start_app() switches to the repository root
+    args.output = args.output and os.path.abspath(args.output)
+    args.compare = args.compare and os.path.abspath(args.compare)
+
+    if not args.show_app_output:
+        sys.stdout = open(os.devnull, "w")
+
+    base, provenance_app, chain, database_uri = start_app(args)
+    say(f"🚀 Serving {base} (anchor mode {provenance_app.ANCHOR_MODE}, {args.hash_format} hashes, block time {args.block_time}s, "
+        f"rpc latency {args.rpc_latency * 1000:g} ms)")
+
+    pool = RecordPool()
+    rng = random.Random(args.seed)
+    phases = []
+    for records in sorted(args.records):
+        say(f"📥 Filling records table to {records} rows")
+        fill(base, pool, records, rng, args.data_size)
+        if args.warmup > 0:
+            run_phase(base, pool, args.mix, max(args.concurrency), args.warmup, args.seed, args.data_size)
+            fill(base, pool, records, rng, args.data_size)
+        for concurrency in args.concurrency:
+            samples, errors, elapsed = run_phase(base, pool, args.mix, concurrency, args.duration,
+                                                 args.seed + concurrency, args.data_size)
+            every = [v for values in samples.values() for v in values]
+            total_errors = {}
+            for per_op in errors.values():
+                for status, count in per_op.items():
+                    total_errors[status] = total_errors.get(status, 0) + count
+            phase = {
+                "records": records,
+                "concurrency": concurrency,
+                "duration_seconds": round(elapsed, 3),
+                "live_records": len(pool),
+                "endpoints": {op: summarize(samples[op], errors[op], elapsed) for op in samples},
+                "total": summarize(every, total_errors, elapsed),
+                "outbox": requests.get(f"{base}/outbox", timeout=60).json(),
+            }
+            phases.append(phase)
+            print_phase(phase)
+
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "anchor_mode": provenance_app.ANCHOR_MODE,
+            "database": database_uri.split("://")[0],
+            "block_time": args.block_time,
+            "hash_format": args.hash_format,
+            "rpc_latency": args.rpc_latency,
+            "mix": args.mix,
+            "data_size": args.data_size,
+            "duration": args.duration,
+            "seed": args.seed,
+        },
+        "chain": {"transactions": chain.transactions, "calls": chain.calls, "head": chain.head},
+        "phases": phases,
+    }
+    output = args.output or os.path.join(
+        HERE, "results", datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    say(f"\n💾 Saved {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+    return result
+
+
+if __name__ == "__main__":
+    main()
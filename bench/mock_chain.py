@@ -0,0 +1,384 @@
+"""
+In-process stand-in for the Hardhat node running the Provenance contract.
+
+MockProvenanceChain keeps the contract state (recordHashes, records,
+batchRoots, RecordLogged events) in memory and hands out two facades with
+the parts of the Web3 / AsyncWeb3 API the app uses, to be plugged into
+create_app() via CHAIN_W3 / CHAIN_ASYNC_W3 / CONTRACT_ABI:
+
+    chain = MockProvenanceChain(block_time=0.5, rpc_latency=0.002)
+    app = create_app({"CHAIN_W3": chain.w3(), "CHAIN_ASYNC_W3": chain.async_w3(),
+                      "CONTRACT_ABI": PROVENANCE_ABI})
+
+hash_format="bytes32" runs ProvenanceV2.sol instead (PROVENANCE_V2_ABI);
+deploy() adds another contract at its own address on the same chain, e.g.
+the legacy generation the app reads through CONTRACT_LEGACY_ADDRESS.
+
+block_time=0 mines every transaction into its own block at once (Hardhat
+automine); block_time>0 mines all transactions of an interval into the next
+block, and receipts only appear once that block exists. rpc_latency is added
+to every call. Contract state changes as soon as a transaction is accepted;
+nonces follow the node's rules ("Nonce too high" / "Nonce too low").
+As in the contract, only the deployer (the first account) and accounts
+allowed with setAnchorer() may call logAction / anchorBatch.
+"""
+import asyncio
+import hashlib
+import itertools
+import threading
+import time
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
+
+ACCOUNTS = [f"0x{i:040x}" for i in range(0xf39f0, 0xf39f0 + 10)]
+CONTRACT_ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+ZERO_ROOT = b"\0" * 32
+
+
+def _abi_fn(name, inputs, outputs=(), mutability="view"):
+    return {
+        "type": "function", "name": name, "stateMutability": mutability,
+        "inputs": [{"name": n, "type": t} for n, t in inputs],
+        "outputs": [{"name": n, "type": t} for n, t in outputs],
+    }
+
+
+def _provenance_abi(hash_type):
+    return [
+        _abi_fn("logAction", [("recordId", "uint256"), ("operation", "string"), ("recordHash", hash_type)], mutability="nonpayable"),
+        _abi_fn("anchorBatch", [("batchId", "uint256"), ("merkleRoot", "bytes32"), ("leafCount", "uint256")], mutability="nonpayable"),
+        _abi_fn("setAnchorer", [("account", "address"), ("allowed", "bool")], mutability="nonpayable"),
+        _abi_fn("getRecordHash", [("recordId", "uint256")], [("", hash_type)]),
+        _abi_fn("getRecordHashes", [("recordIds", "uint256[]")], [("hashes", f"{hash_type}[]")]),
+        _abi_fn("getBatchRoot", [("batchId", "uint256")], [("", "bytes32")]),
+        _abi_fn("getBatchRoots", [("batchIds", "uint256[]")], [("roots", "bytes32[]")]),
+        _abi_fn("getRecordDetails", [("recordId", "uint256")],
+                [("operation", "string"), ("recordHash", hash_type), ("timestamp", "uint256"), ("user", "address")]),
+        {
+            "type": "event", "name": "RecordLogged", "anonymous": False,
+            "inputs": [
+                {"name": "recordId", "type": "uint256", "indexed": True},
+                {"name": "operation", "type": "string", "indexed": False},
+                {"name": "recordHash", "type": hash_type, "indexed": False},
+            ],
+        },
+    ]
+
+
+# Provenance.sol / ProvenanceV2.sol, as far as the app calls them
+PROVENANCE_ABI = _provenance_abi("string")
+PROVENANCE_V2_ABI = _provenance_abi("bytes32")
+
+
+class _ContractState:
+    """Storage and RecordLogged logs of one deployed contract."""
+
+    def __init__(self, hash_format, owner):
+        self.hash_format = hash_format
+        self.owner = owner
+        self.anchorers = {owner}   # who may call logAction / anchorBatch
+        self.unset_hash = ZERO_ROOT if hash_format == "bytes32" else ""
+        self.record_hashes = {}
+        self.records = {}
+        self.batch_roots = {}
+        self.events = []        # RecordLogged logs, in block order
+
+    def hash_arg(self, value):
+        if self.hash_format != "bytes32":
+            if not isinstance(value, str):
+                raise TypeError(f"recordHash must be a string, got {type(value).__name__}")
+            return value
+        value = bytes(HexBytes(value))
+        if len(value) != 32:
+            raise TypeError(f"recordHash must be 32 bytes, got {len(value)}")
+        return value
+
+
+class MockProvenanceChain:
+    def __init__(self, block_time=0.0, rpc_latency=0.0, accounts=ACCOUNTS, hash_format="string"):
+        self.block_time = block_time
+        self.rpc_latency = rpc_latency
+        self.accounts = list(accounts)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._genesis_timestamp = int(time.time())
+        self._automined = 0
+        self._tx_counter = itertools.count()
+        self.contracts = {CONTRACT_ADDRESS: _ContractState(hash_format, self.accounts[0])}
+        self.receipts = {}      # tx hash -> receipt
+        self.nonces = {}        # account -> next nonce
+        self.mined_nonces = {}  # account -> [(block, nonce)]
+        self.calls = 0
+        self.transactions = 0
+
+    def deploy(self, address, hash_format="string", owner=None):
+        """Another contract at `address` (same blocks, accounts and nonces), deployed by `owner` (default: the first account)."""
+        self.contracts[address] = _ContractState(hash_format, owner or self.accounts[0])
+        return address
+
+    # -- blocks ------------------------------------------------------------
+
+    @property
+    def head(self):
+        if self.block_time > 0:
+            return int((time.monotonic() - self._started) / self.block_time)
+        return self._automined
+
+    def _next_block(self):
+        if self.block_time > 0:
+            return self.head + 1
+        self._automined += 1
+        return self._automined
+
+    def _mined_at(self, block):
+        """Seconds until `block` exists (0 once it does)."""
+        if self.block_time <= 0:
+            return 0.0
+        return max(0.0, self._started + block * self.block_time - time.monotonic())
+
+    def block(self, number):
+        self.calls += 1
+        return AttributeDict({
+            "number": number,
+            "timestamp": self._genesis_timestamp + number * max(1, round(self.block_time)),
+        })
+
+    # -- transactions ------------------------------------------------------
+
+    def transact(self, name, args, tx, address=CONTRACT_ADDRESS):
+        """Accept a transaction; returns its hash or raises like the node would."""
+        state = self.contracts[address]
+        tx = tx or {}
+        sender = tx.get("from", self.accounts[0])
+        with self._lock:
+            self.calls += 1
+            expected = self.nonces.get(sender, 0)
+            nonce = tx.get("nonce", expected)
+            if nonce > expected:
+                raise ValueError(f"Nonce too high. Expected nonce to be {expected} but got {nonce}.")
+            if nonce < expected:
+                raise ValueError(f"Nonce too low. Expected nonce to be {expected} but got {nonce}.")
+            if name in ("logAction", "anchorBatch") and sender not in state.anchorers:
+                raise ValueError("execution reverted: not an anchorer")
+            if name == "setAnchorer" and sender != state.owner:
+                raise ValueError("execution reverted: not the owner")
+            block = self._next_block()
+            tx_hash = HexBytes(hashlib.sha256(f"{next(self._tx_counter)}:{sender}:{nonce}".encode()).digest())
+
+            if name == "logAction":
+                record_id, operation, record_hash = args
+                record_hash = state.hash_arg(record_hash)
+                state.records[record_id] = (operation, record_hash, self.block(block)["timestamp"], sender)
+                state.record_hashes[record_id] = record_hash
+                state.events.append(AttributeDict({
+                    "args": AttributeDict({"recordId": record_id, "operation": operation, "recordHash": record_hash}),
+                    "address": address,
+                    "blockNumber": block,
+                    "logIndex": 0,
+                    "transactionHash": tx_hash,
+                }))
+            elif name == "anchorBatch":
+                batch_id, root, _ = args
+                root = bytes(HexBytes(root))
+                if root == ZERO_ROOT:
+                    raise ValueError("execution reverted: empty root")
+                current = state.batch_roots.get(batch_id, ZERO_ROOT)
+                if current not in (ZERO_ROOT, root):
+                    raise ValueError("execution reverted: batch already anchored")
+                state.batch_roots[batch_id] = root   # the same root again is a no-op
+            elif name == "setAnchorer":
+                account, allowed = args
+                (state.anchorers.add if allowed else state.anchorers.discard)(account)
+            else:
+                raise ValueError(f"execution reverted: unknown function {name}")
+
+            self.nonces[sender] = nonce + 1
+            self.mined_nonces.setdefault(sender, []).append((block, nonce))
+            self.receipts[tx_hash] = AttributeDict({
+                "transactionHash": tx_hash, "blockNumber": block, "status": 1, "from": sender,
+            })
+            self.transactions += 1
+            return tx_hash
+
+    def receipt(self, tx_hash):
+        self.calls += 1
+        receipt = self.receipts.get(HexBytes(tx_hash))
+        if receipt is None or self._mined_at(receipt.blockNumber) > 0:
+            raise TransactionNotFound(f"Transaction with hash {HexBytes(tx_hash).hex()} not found.")
+        return receipt
+
+    def transaction_count(self, account, block_identifier="latest"):
+        self.calls += 1
+        with self._lock:
+            if block_identifier == "pending":
+                return self.nonces.get(account, 0)
+            head = self.head
+            return sum(1 for block, _ in self.mined_nonces.get(account, ()) if block <= head)
+
+    # -- views -------------------------------------------------------------
+
+    def view(self, name, args, address=CONTRACT_ADDRESS):
+        self.calls += 1
+        state = self.contracts[address]
+        if name == "getRecordHash":
+            return state.record_hashes.get(args[0], state.unset_hash)
+        if name == "getRecordHashes":
+            return [state.record_hashes.get(i, state.unset_hash) for i in args[0]]
+        if name == "getBatchRoot":
+            return state.batch_roots.get(args[0], ZERO_ROOT)
+        if name == "getBatchRoots":
+            return [state.batch_roots.get(i, ZERO_ROOT) for i in args[0]]
+        if name == "getRecordDetails":
+            return list(state.records.get(args[0], ("", state.unset_hash, 0, "0x" + "00" * 20)))
+        raise ValueError(f"execution reverted: unknown function {name}")
+
+    def logs(self, from_block=0, to_block=None, address=CONTRACT_ADDRESS):
+        self.calls += 1
+        to_block = self.head if to_block is None else to_block
+        return [e for e in self.contracts[address].events if from_block <= e.blockNumber <= to_block]
+
+    # -- facades -----------------------------------------------------------
+
+    def w3(self):
+        """Web3-like facade (sync calls)."""
+        return _SyncWeb3(self)
+
+    def async_w3(self):
+        """AsyncWeb3-like facade (coroutines)."""
+        return _AsyncWeb3(self)
+
+
+class _ContractFunction:
+    def __init__(self, chain, address, name, args, run):
+        self.chain, self.address, self.name, self.args, self._run = chain, address, name, args, run
+
+    def call(self, *_, **__):
+        return self._run(self.chain.view, self.name, self.args, self.address)
+
+    def transact(self, tx=None):
+        return self._run(self.chain.transact, self.name, self.args, tx, self.address)
+
+
+class _Functions:
+    def __init__(self, chain, address, run):
+        self._chain, self._address, self._run = chain, address, run
+
+    def __getattr__(self, name):
+        if not any(e["type"] == "function" and e["name"] == name for e in PROVENANCE_ABI):
+            raise AttributeError(name)
+        return lambda *args: _ContractFunction(self._chain, self._address, name, args, self._run)
+
+
+class _RecordLogged:
+    def __init__(self, chain, address):
+        self._chain, self._address = chain, address
+
+    def __call__(self):
+        return self
+
+    def get_logs(self, from_block=0, to_block=None, argument_filters=None):
+        time.sleep(self._chain.rpc_latency)
+        logs = self._chain.logs(from_block, to_block, self._address)
+        if argument_filters and "recordId" in argument_filters:
+            logs = [e for e in logs if e.args.recordId == argument_filters["recordId"]]
+        return logs
+
+    def process_receipt(self, receipt, errors=None):
+        events = self._chain.contracts[self._address].events
+        return [e for e in events if e.transactionHash == receipt.transactionHash]
+
+
+class _Events:
+    def __init__(self, chain, address):
+        self.RecordLogged = _RecordLogged(chain, address)
+
+
+class _Contract:
+    def __init__(self, chain, address, run):
+        self.address = address or CONTRACT_ADDRESS
+        self.functions = _Functions(chain, self.address, run)
+        self.events = _Events(chain, self.address)
+
+
+def _sync_run(chain, fn, *args):
+    time.sleep(chain.rpc_latency)
+    return fn(*args)
+
+
+async def _async_run(chain, fn, *args):
+    await asyncio.sleep(chain.rpc_latency)
+    return fn(*args)
+
+
+class _SyncEth:
+    def __init__(self, chain):
+        self._chain = chain
+
+    @property
+    def accounts(self):
+        return self._chain.accounts
+
+    @property
+    def block_number(self):
+        return _sync_run(self._chain, lambda: self._chain.head)
+
+    def contract(self, address=None, abi=None):
+        return _Contract(self._chain, address, lambda fn, *a: _sync_run(self._chain, fn, *a))
+
+    def get_block(self, number):
+        return _sync_run(self._chain, self._chain.block, number)
+
+    def get_transaction_receipt(self, tx_hash):
+        return _sync_run(self._chain, self._chain.receipt, tx_hash)
+
+    def get_transaction_count(self, account, block_identifier="latest"):
+        return _sync_run(self._chain, self._chain.transaction_count, account, block_identifier)
+
+
+class _AsyncEth:
+    def __init__(self, chain):
+        self._chain = chain
+
+    @property
+    async def accounts(self):
+        return self._chain.accounts
+
+    @property
+    async def block_number(self):
+        return await _async_run(self._chain, lambda: self._chain.head)
+
+    def contract(self, address=None, abi=None):
+        return _Contract(self._chain, address, lambda fn, *a: _async_run(self._chain, fn, *a))
+
+    async def get_block(self, number):
+        return await _async_run(self._chain, self._chain.block, number)
+
+    async def get_transaction_receipt(self, tx_hash):
+        return await _async_run(self._chain, self._chain.receipt, tx_hash)
+
+    async def get_transaction_count(self, account, block_identifier="latest"):
+        return await _async_run(self._chain, self._chain.transaction_count, account, block_identifier)
+
+    async def wait_for_transaction_receipt(self, tx_hash, timeout=120, poll_latency=0.1):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return await self.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                if time.monotonic() >= deadline:
+                    raise
+            receipt = self._chain.receipts.get(HexBytes(tx_hash))
+            wait = self._chain._mined_at(receipt.blockNumber) if receipt is not None else poll_latency
+            await asyncio.sleep(min(max(wait, 0.001), poll_latency))
+
+
+class _SyncWeb3:
+    def __init__(self, chain):
+        self.eth = _SyncEth(chain)
+
+
+class _AsyncWeb3:
+    def __init__(self, chain):
+        self.eth = _AsyncEth(chain)
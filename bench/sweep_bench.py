@@ -0,0 +1,120 @@
+"""
+Tamper sweep benchmark: one full pass over a filled database, per worker count.
+
+The app is built with create_app() on a temporary SQLite file and the
+in-process contract from mock_chain.py, records (and optionally blob records
+and updates) are written through /add_bulk, /update_bulk and /blobs, then
+run_sweep() does a full pass with each --workers value. Wall time, rows per
+hour and the CPU time of the parent process are printed and saved as JSON:
+the parent only reads rows and the chain, the hashing processes decode and
+hash, so the parent's CPU time is what bounds the speedup on more cores.
+
+    python bench/sweep_bench.py --records 20000 --workers 1,2,4
+    python bench/sweep_bench.py --records 20000 --updates 2 --encoding diff --workers 1,4
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, HERE]
+
+from bench import git_commit, parse_ints, say  # noqa: E402
+
+
+def build_app(args):
+    os.environ.setdefault("ANCHOR_MODE", "sync")
+    os.environ.setdefault("PROVENANCE_LOG_SAMPLE_RATE", "0")
+    os.environ["PROVENANCE_PAYLOAD_ENCODING"] = args.encoding
+    import app as provenance_app
+    from mock_chain import MockProvenanceChain, PROVENANCE_ABI
+
+    tmp = tempfile.mkdtemp(prefix="provenance-sweep-bench-")
+    chain = MockProvenanceChain()
+    app = provenance_app.create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        "SQLALCHEMY_ENGINE_OPTIONS": {},
+        "BLOB_DIR": os.path.join(tmp, "blobs"),
+        "CHAIN_W3": chain.w3(),
+        "CHAIN_ASYNC_W3": chain.async_w3(),
+        "CONTRACT_ABI": PROVENANCE_ABI,
+        "BACKGROUND_WORKERS": False,
+    })
+    return provenance_app, app
+
+
+def fill(client, args, chunk=1000):
+    ids = []
+    for start in range(0, args.records, chunk):
+        items = [{"data": f"{n:08d}".ljust(args.data_size, "x")} for n in range(start, min(start + chunk, args.records))]
+        body = client.post("/add_bulk", json={"user": "bench", "items": items}).get_json()
+        ids += [r["id"] for r in body["results"]]
+    for round_ in range(args.updates):
+        for start in range(0, len(ids), chunk):
+            items = [{"id": i, "data": f"{i:08d}-{round_}".ljust(args.data_size, "y")} for i in ids[start:start + chunk]]
+            client.put("/update_bulk", json={"user": "bench", "items": items})
+    for n in range(args.blobs):
+        client.post(f"/blobs?name=b{n}&user=bench", data=os.urandom(256))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000, help="rows in the record table")
+    parser.add_argument("--updates", type=int, default=0, help="updates per record before the sweep")
+    parser.add_argument("--blobs", type=int, default=100, help="rows in the blob_record table")
+    parser.add_argument("--data-size", type=int, default=256, help="characters per record")
+    parser.add_argument("--encoding", default="json", choices=("json", "diff"), help="PROVENANCE_PAYLOAD_ENCODING")
+    parser.add_argument("--workers", type=parse_ints, default=[1, 2, 4], help="hashing processes, e.g. 1,4")
+    parser.add_argument("--chunk", type=int, default=5000, help="TAMPER_SWEEP_CHUNK")
+    parser.add_argument("--output", help="result file (default bench/results/sweep-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    sys.stdout = open(os.devnull, "w")   # the app's own prints
+    provenance_app, app = build_app(args)
+    provenance_app.TAMPER_SWEEP_CHUNK = args.chunk
+    client = app.test_client()
+    say(f"📥 Writing {args.records} records ({args.updates} updates each, {args.encoding} payloads) and {args.blobs} blobs")
+    fill(client, args)
+
+    passes = []
+    for workers in args.workers:
+        with app.app_context():
+            run = provenance_app.start_sweep_run(full=True, lease=False)
+            started, cpu = time.perf_counter(), time.process_time()
+            provenance_app.run_sweep(run, workers)
+            seconds, parent_cpu = time.perf_counter() - started, time.process_time() - cpu
+            passes.append({
+                "workers": workers, "checked": run.checked, "findings": run.findings,
+                "seconds": round(seconds, 3), "rows_per_hour": round(run.checked / seconds * 3600),
+                "parent_cpu_seconds": round(parent_cpu, 3),
+            })
+        p = passes[-1]
+        say(f"🕵️ workers={workers}: {p['checked']} rows in {p['seconds']:.2f} s ({p['rows_per_hour']:,} rows/h), "
+            f"parent CPU {p['parent_cpu_seconds']:.2f} s, {p['findings']} findings")
+
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "passes": passes,
+    }
+    output = args.output or os.path.join(
+        HERE, "results", "sweep-" + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    say(f"\n💾 Saved {output}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
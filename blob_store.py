@@ -0,0 +1,139 @@
+"""
+Content-addressed blob storage on local disk.
+
+A blob is cut into fixed-size chunks and every chunk is stored once, under
+its own SHA-256, so versions of an artifact that share chunks (appended
+files, snapshots with few changed blocks) share their disk space. A manifest,
+addressed by the SHA-256 of the whole content, lists the chunks in order:
+
+    <directory>/chunks/ab/abcdef...       raw chunk bytes
+    <directory>/manifests/12/1234...      one "<chunk sha256> <length>" line per chunk
+
+    store = BlobStore("blobs", chunk_size=4 * 1024 * 1024)
+    info = store.put(stream)              # reads stream.read() until b"": BlobInfo
+    for data in store.iter_content(info.digest):
+        ...
+    store.recompute(info.digest)          # (sha256, size) of the stored chunks, memory-mapped
+
+put() hashes the content while it reads it and never holds more than one
+chunk in memory. Files are written under temporary names and renamed into
+place, so two uploads writing the same chunk do not conflict. Chunks are
+never deleted: older versions of a blob stay readable for verification.
+"""
+import collections
+import hashlib
+import mmap
+import os
+import threading
+
+CHUNK_SIZE = 4 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+EMPTY_DIGEST = hashlib.sha256().hexdigest()
+
+BlobInfo = collections.namedtuple("BlobInfo", "digest size chunks new_chunks new_bytes")
+
+
+class BlobError(Exception):
+    pass
+
+
+class BlobNotFound(BlobError):
+    pass
+
+
+class BlobTooLarge(BlobError):
+    pass
+
+
+class BlobStore:
+    def __init__(self, directory, chunk_size=CHUNK_SIZE):
+        self.directory = directory
+        self.chunk_size = chunk_size
+
+    def _path(self, kind, digest):
+        return os.path.join(self.directory, kind, digest[:2], digest)
+
+    def _write_once(self, path, data):
+        """Write `data` to `path` unless it exists; True if it was written."""
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return True
+
+    def put(self, stream, max_size=None):
+        """
+        Store everything `stream.read(n)` returns until b"" and return its
+        BlobInfo. BlobTooLarge once more than `max_size` bytes arrived (the
+        chunks written so far stay; they are harmless and may be reused).
+        """
+        content = hashlib.sha256()
+        entries, new_chunks, new_bytes, size = [], 0, 0, 0
+        buf = bytearray()
+        while True:
+            data = stream.read(min(READ_SIZE, self.chunk_size - len(buf)))
+            if data:
+                size += len(data)
+                if max_size is not None and size > max_size:
+                    raise BlobTooLarge(f"blob exceeds {max_size} bytes")
+                content.update(data)
+                buf += data
+            if buf and (not data or len(buf) >= self.chunk_size):
+                digest = hashlib.sha256(buf).hexdigest()
+                if self._write_once(self._path("chunks", digest), buf):
+                    new_chunks += 1
+                    new_bytes += len(buf)
+                entries.append(f"{digest} {len(buf)}\n")
+                buf = bytearray()
+            if not data:
+                break
+        digest = content.hexdigest()
+        self._write_once(self._path("manifests", digest), "".join(entries).encode())
+        return BlobInfo(digest, size, len(entries), new_chunks, new_bytes)
+
+    def exists(self, digest):
+        return digest == EMPTY_DIGEST or os.path.exists(self._path("manifests", digest))
+
+    def manifest(self, digest):
+        """[(chunk digest, length), ...] of a stored blob."""
+        if digest == EMPTY_DIGEST:
+            return []
+        try:
+            with open(self._path("manifests", digest)) as f:
+                return [(d, int(n)) for d, n in (line.split() for line in f)]
+        except FileNotFoundError:
+            raise BlobNotFound(f"blob {digest} not found") from None
+
+    def iter_content(self, digest, read_size=READ_SIZE):
+        """The blob's bytes, at most `read_size` at a time."""
+        for chunk, _ in self.manifest(digest):
+            try:
+                f = open(self._path("chunks", chunk), "rb")
+            except FileNotFoundError:
+                raise BlobNotFound(f"chunk {chunk} of blob {digest} not found") from None
+            with f:
+                yield from iter(lambda: f.read(read_size), b"")
+
+    def recompute(self, digest):
+        """
+        (SHA-256, size) of the blob as it is stored now, hashed chunk by
+        chunk straight from memory-mapped files (nothing is copied into
+        Python objects, and hashlib releases the GIL on large buffers).
+        """
+        content, size = hashlib.sha256(), 0
+        for chunk, _ in self.manifest(digest):
+            try:
+                f = open(self._path("chunks", chunk), "rb")
+            except FileNotFoundError:
+                raise BlobNotFound(f"chunk {chunk} of blob {digest} not found") from None
+            with f:
+                length = os.fstat(f.fileno()).st_size
+                if length:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                        content.update(m)
+                size += length
+        return content.hexdigest(), size
@@ -3,6 +3,35 @@ pragma solidity ^0.8.0;
 
 contract Provenance {
     event RecordLogged(uint256 indexed recordId, string operation, string recordHash);
+    event BatchAnchored(uint256 indexed batchId, bytes32 merkleRoot, uint256 leafCount);
+    event AnchorerSet(address indexed account, bool allowed);
+
+    // only the owner's anchor senders may write hashes and batch roots
+    // (batch ids are predictable, anyone else could claim them first)
+    address public owner;
+    mapping(address => bool) public anchorers;
+
+    modifier onlyOwner() {
+        require(msg.sender == owner, "not the owner");
+        _;
+    }
+
+    modifier onlyAnchorer() {
+        require(anchorers[msg.sender], "not an anchorer");
+        _;
+    }
+
+    constructor() {
+        owner = msg.sender;
+        anchorers[msg.sender] = true;
+        emit AnchorerSet(msg.sender, true);
+    }
+
+    // e.g. the accounts in the app's ANCHOR_SENDERS
+    function setAnchorer(address account, bool allowed) public onlyOwner {
+        anchorers[account] = allowed;
+        emit AnchorerSet(account, allowed);
+    }
 
     // Use mapping instead of array
     mapping(uint256 => string) public recordHashes;
@@ -16,16 +45,49 @@ contract Provenance {
 
     mapping(uint256 => Record) public records; // optional detailed structure
 
-    function logAction(uint256 recordId, string memory operation, string memory recordHash) public {
+    // Merkle-batched anchoring: one root covers many provenance hashes
+    mapping(uint256 => bytes32) public batchRoots;
+
+    function logAction(uint256 recordId, string memory operation, string memory recordHash) public onlyAnchorer {
         records[recordId] = Record(operation, recordHash, block.timestamp, msg.sender);
         recordHashes[recordId] = recordHash;
         emit RecordLogged(recordId, operation, recordHash);
     }
 
+    function anchorBatch(uint256 batchId, bytes32 merkleRoot, uint256 leafCount) public onlyAnchorer {
+        require(merkleRoot != bytes32(0), "empty root");
+        bytes32 current = batchRoots[batchId];
+        if (current == merkleRoot) {
+            return;   // a retry of a batch that already went through
+        }
+        require(current == bytes32(0), "batch already anchored");
+        batchRoots[batchId] = merkleRoot;
+        emit BatchAnchored(batchId, merkleRoot, leafCount);
+    }
+
+    function getBatchRoot(uint256 batchId) public view returns (bytes32) {
+        return batchRoots[batchId];
+    }
+
     function getRecordHash(uint256 recordId) public view returns (string memory) {
         return recordHashes[recordId];
     }
 
+    // batched reads for bulk verification: one eth_call for many ids
+    function getRecordHashes(uint256[] calldata recordIds) public view returns (string[] memory hashes) {
+        hashes = new string[](recordIds.length);
+        for (uint256 i = 0; i < recordIds.length; i++) {
+            hashes[i] = recordHashes[recordIds[i]];
+        }
+    }
+
+    function getBatchRoots(uint256[] calldata batchIds) public view returns (bytes32[] memory roots) {
+        roots = new bytes32[](batchIds.length);
+        for (uint256 i = 0; i < batchIds.length; i++) {
+            roots[i] = batchRoots[batchIds[i]];
+        }
+    }
+
     function getRecordDetails(uint256 recordId)
         public
         view
@@ -2,13 +2,22 @@
 const { ethers } = require("hardhat");
 
 async function main() {
-  const Provenance = await ethers.getContractFactory("Provenance");
-  console.log("Deploying Provenance contract...");
+  // PROVENANCE_CONTRACT=ProvenanceV2 deploys the bytes32 variant
+  const name = process.env.PROVENANCE_CONTRACT || "Provenance";
+  const Provenance = await ethers.getContractFactory(name);
+  console.log(`Deploying ${name} contract...`);
 
   const provenance = await Provenance.deploy(); // Deploy contract
   await provenance.waitForDeployment(); // Wait for deployment confirmation
 
-  console.log("Provenance deployed to:", await provenance.getAddress());
+  console.log(`${name} deployed to:`, await provenance.getAddress());
+
+  // only the deployer may anchor until the app's other senders are allowed
+  const senders = (process.env.ANCHOR_SENDERS || "").split(",").map((s) => s.trim()).filter(Boolean);
+  for (const sender of senders) {
+    await (await provenance.setAnchorer(sender, true)).wait();
+    console.log("Allowed anchor sender:", sender);
+  }
 }
 
 main()
@@ -0,0 +1,186 @@
+"""
+In-process cache for contract view calls (getRecordHash, getBatchRoot, ...).
+
+Entries are keyed by (function name, *args) and remember the block height
+they were read at. An entry is served while no newer block is known, or
+while every block after it has been accounted for by indexed RecordLogged
+events (the event indexer reports them through apply_events() and drops the
+keys they touch). The chain head is polled at most once per
+head_check_seconds, so a burst of requests costs one eth_blockNumber instead
+of one eth_call each. Our own transactions write through with put().
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ChainReadCache:
+    def __init__(self, maxsize=10000, head_fn=None, head_check_seconds=1.0):
+        self.maxsize = maxsize
+        self._head_fn = head_fn
+        self._head_check_seconds = head_check_seconds
+        self._head_checked_at = 0.0
+        self._entries = OrderedDict()   # key -> (value, block)
+        self._lock = threading.Lock()
+        self.head = -1
+        # blocks whose events have been applied without gaps
+        self._events_from = None
+        self._events_to = None
+        # bumped on every invalidation; loads that raced one are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def _valid(self, block):
+        if block >= self.head:
+            return True
+        # every change between `block` and the head is known from indexed events
+        return (self._events_from is not None
+                and self._events_from <= block + 1
+                and self._events_to >= self.head)
+
+    def _refresh_head(self):
+        if self._head_fn is None:
+            return
+        now = time.monotonic()
+        if now - self._head_checked_at < self._head_check_seconds:
+            return
+        self._head_checked_at = now
+        self.observe_block(self._head_fn())
+
+    def observe_block(self, block_number):
+        """Record the latest known block; older entries stop being served."""
+        with self._lock:
+            if block_number > self.head:
+                self.head = block_number
+
+    def lookup(self, key):
+        """Returns (hit, value)."""
+        if not self.enabled:
+            return False, None
+        self._refresh_head()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._valid(entry[1]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, None
+
+    def snapshot(self):
+        """Token to take before loading values that will be passed to store()."""
+        with self._lock:
+            return self.head, self._generation
+
+    def store(self, key, value, snapshot):
+        """Cache a value read from the chain, unless an invalidation raced the read."""
+        block, generation = snapshot
+        with self._lock:
+            if generation == self._generation:
+                self._set(key, value, block)
+
+    def put(self, key, value, block):
+        """Write-through of a value we just changed on-chain in `block`."""
+        with self._lock:
+            if block > self.head:
+                self.head = block
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] >= block:
+                # a later (or same-block, order unknown) write is already cached
+                if entry[1] == block and entry[0] != value:
+                    del self._entries[key]
+                return
+            self._set(key, value, block)
+
+    def _set(self, key, value, block):
+        if not self.enabled:
+            return
+        self._entries[key] = (value, block)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, loader, cacheable=None):
+        """
+        Cached value for `key`, calling `loader()` on a miss.
+        Values for which `cacheable(value)` is false are returned but not kept.
+        """
+        hit, value = self.lookup(key)
+        if hit:
+            return value
+        token = self.snapshot()
+        value = loader()
+        if cacheable is None or cacheable(value):
+            self.store(key, value, token)
+        return value
+
+    def invalidate(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def apply_events(self, from_block, to_block, keys):
+        """Indexed events for blocks [from_block, to_block] touched `keys`."""
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+            if self._events_to is not None and from_block == self._events_to + 1:
+                self._events_to = to_block
+            else:
+                self._events_from, self._events_to = from_block, to_block
+            if to_block > self.head:
+                self.head = to_block
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "head_block": self.head,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class LRUCache:
+    """Small thread-safe LRU map for values that never change (e.g. block timestamps)."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,190 @@
+"""
+Lazily connected blockchain access for one app instance.
+
+Nothing here talks to the node or reads the contract artifact until it is
+first used, so the app boots (and serves database-only endpoints such as
+/records) while the node is down. The contract ABI is cached as a pickle
+next to the Hardhat artifact, which also carries the bytecode and is much
+slower to parse; the cache is rebuilt whenever the artifact changes and is
+used on its own when the artifact is not deployed at all. web3 itself is
+imported on first use as well; it accounts for most of the import time.
+
+`w3`, `async_w3` and `abi` replace the node connection and the artifact with
+ready-made objects (in-process chains such as bench/mock_chain.py).
+
+`legacy_address` names a previously deployed contract generation (e.g. a
+Provenance.sol replaced by ProvenanceV2.sol) whose anchors are still read;
+its ABI comes from `legacy_artifact_path` or `legacy_abi`.
+"""
+import json
+import os
+import pickle
+import threading
+import time
+
+import chain_cache
+import hash_codec
+import rpc_client
+
+
+def load_abi(artifact_path, cache_path=None):
+    """Contract ABI from the pickled cache if it is current, else from the artifact (refreshing the cache)."""
+    try:
+        st = os.stat(artifact_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        stamp = None
+
+    if cache_path:
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if stamp is None or cached["stamp"] == stamp:
+                return cached["abi"]
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            pass
+
+    if stamp is None:
+        raise FileNotFoundError(f"contract artifact {artifact_path} not found (and no ABI cache)")
+    with open(artifact_path) as f:
+        abi = json.load(f)["abi"]
+
+    if cache_path:
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump({"stamp": stamp, "abi": abi}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass   # read-only deployment: parse the artifact next time again
+    return abi
+
+
+class ChainClient:
+    def __init__(self, rpc_url, contract_address, artifact_path, abi_cache_path=None,
+                 rpc_options=None, read_cache_size=10000, head_check_seconds=1.0,
+                 block_timestamp_cache_size=100000, w3=None, async_w3=None, abi=None,
+                 legacy_address=None, legacy_artifact_path=None, legacy_abi=None):
+        self.rpc_url = rpc_url
+        self.contract_address = contract_address
+        self.artifact_path = artifact_path
+        self.abi_cache_path = abi_cache_path
+        self.legacy_address = legacy_address or None
+        self.legacy_artifact_path = legacy_artifact_path
+        self._lock = threading.Lock()
+        self._w3 = w3
+        self._abi = abi
+        self._legacy_abi = legacy_abi
+        self._codec = None
+        self._contract = None
+        self._legacy_contract = None
+        self._default_account = None
+        # seconds spent on the first ABI load / first node round trip
+        self.timings = {}
+        # shared async client; it only connects on its first call
+        self.rpc = rpc_client.AsyncRpcClient(rpc_url, w3=async_w3, **(rpc_options or {}))
+        self.reads = chain_cache.ChainReadCache(
+            read_cache_size,
+            head_fn=lambda: self.rpc.call(lambda: self.rpc.w3.eth.block_number),
+            head_check_seconds=head_check_seconds,
+        )
+        # mined blocks never change, so their timestamps are cached for good
+        self.block_timestamps = chain_cache.LRUCache(block_timestamp_cache_size)
+        # set by the app once the database is bound (see nonce_manager.py)
+        self.nonces = None
+
+    @property
+    def w3(self):
+        if self._w3 is None:
+            from web3 import Web3
+            with self._lock:
+                if self._w3 is None:
+                    self._w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        return self._w3
+
+    @staticmethod
+    def checksum(address):
+        from web3 import Web3
+        return Web3.to_checksum_address(address)
+
+    @property
+    def TransactionNotFound(self):
+        from web3.exceptions import TransactionNotFound
+        return TransactionNotFound
+
+    @property
+    def abi(self):
+        if self._abi is None:
+            with self._lock:
+                if self._abi is None:
+                    started = time.perf_counter()
+                    self._abi = load_abi(self.artifact_path, self.abi_cache_path)
+                    self.timings["abi_load_seconds"] = round(time.perf_counter() - started, 6)
+        return self._abi
+
+    @property
+    def contract(self):
+        if self._contract is None:
+            contract = self.w3.eth.contract(address=self.contract_address, abi=self.abi)
+            with self._lock:
+                if self._contract is None:
+                    self._contract = contract
+        return self._contract
+
+    @property
+    def async_contract(self):
+        return self.rpc.contract(self.contract_address, self.abi)
+
+    @property
+    def codec(self):
+        """Record hash conversion for the deployed contract's format (see hash_codec.py)."""
+        if self._codec is None:
+            self._codec = hash_codec.HashCodec(self.abi)
+        return self._codec
+
+    @property
+    def legacy_abi(self):
+        if self._legacy_abi is None:
+            with self._lock:
+                if self._legacy_abi is None:
+                    path = self.legacy_artifact_path
+                    self._legacy_abi = load_abi(path, path.removesuffix(".json") + ".abi.pickle")
+        return self._legacy_abi
+
+    @property
+    def legacy_contract(self):
+        if self._legacy_contract is None:
+            contract = self.w3.eth.contract(address=self.legacy_address, abi=self.legacy_abi)
+            with self._lock:
+                if self._legacy_contract is None:
+                    self._legacy_contract = contract
+        return self._legacy_contract
+
+    @property
+    def legacy_async_contract(self):
+        return self.rpc.contract(self.legacy_address, self.legacy_abi)
+
+    @property
+    def event_contracts(self):
+        """Contracts whose RecordLogged events count: the current one, then the legacy one."""
+        return [self.contract] + ([self.legacy_contract] if self.legacy_address else [])
+
+    @property
+    def default_account(self):
+        """The node's first account (one RPC on first use)."""
+        if self._default_account is None:
+            started = time.perf_counter()
+            account = self.w3.eth.accounts[0]
+            with self._lock:
+                if self._default_account is None:
+                    self._default_account = account
+                    self.timings["node_connect_seconds"] = round(time.perf_counter() - started, 6)
+        return self._default_account
+
+    def pending_count(self, account):
+        """Number of transactions sent by `account`, including pending ones."""
+        return self.rpc.call(lambda: self.rpc.w3.eth.get_transaction_count(account, "pending"))
+
+    def ping(self):
+        """Latest block number; raises if the node is unreachable."""
+        return self.w3.eth.block_number
@@ -0,0 +1,63 @@
+"""
+On-chain representation of provenance hashes.
+
+Provenance.sol keeps every canonical_hash() as its 64-character hex string;
+ProvenanceV2.sol keeps the 32 raw bytes (bytes32), which halves calldata,
+fits one storage slot and compares as a single word. HashCodec is built from
+the deployed contract's ABI and converts in both directions, so the rest of
+the app only ever sees hex strings:
+
+    codec = HashCodec(abi)
+    contract.functions.logAction(record_id, "INSERT", codec.encode(hex_hash))
+    decode(contract.functions.getRecordHash(record_id).call())   # hex; "" if unset
+
+decode() accepts both formats (str from Provenance.sol, bytes from
+ProvenanceV2.sol), so values read from either contract generation compare
+the same way.
+"""
+STRING = "string"
+BYTES32 = "bytes32"
+
+ZERO_HASH = bytes(32)
+
+
+def to_bytes32(hex_hash):
+    """The 32 raw bytes of a hex SHA-256 (with or without 0x)."""
+    raw = bytes.fromhex(hex_hash.removeprefix("0x"))
+    if len(raw) != 32:
+        raise ValueError(f"expected a 32-byte hash, got {len(raw)} bytes")
+    return raw
+
+
+def from_bytes32(raw):
+    """Hex form of a bytes32 value; "" for the zero word of an unset slot."""
+    raw = bytes(raw)
+    return "" if raw == ZERO_HASH else raw.hex()
+
+
+def decode(value):
+    """A record hash as read from either contract (hex string, "" if unset)."""
+    if isinstance(value, (bytes, bytearray)):
+        return from_bytes32(value)
+    return value or ""
+
+
+def hash_format(abi):
+    """STRING or BYTES32: the type logAction() takes the record hash as (STRING if the ABI lacks it)."""
+    for entry in abi:
+        if entry.get("type") == "function" and entry.get("name") == "logAction":
+            for arg in entry.get("inputs", ()):
+                if arg.get("name") == "recordHash":
+                    return BYTES32 if arg.get("type") == BYTES32 else STRING
+    return STRING
+
+
+class HashCodec:
+    def __init__(self, abi):
+        self.format = hash_format(abi)
+
+    def encode(self, hex_hash):
+        """logAction() argument for `hex_hash`."""
+        return to_bytes32(hex_hash) if self.format == BYTES32 else hex_hash
+
+    decode = staticmethod(decode)
@@ -0,0 +1,164 @@
+"""
+Canonical hashing, optionally spread over a pool of worker processes.
+
+canonical_hash() is the one definition of the hash that is stored and
+anchored for provenance entries, provenance_object() the object it is
+computed over. HashPool decodes and hashes raw provenance rows for the
+tamper sweep: the parent only reads rows and batch roots, the workers parse
+and decode their payloads (JSON text, zlib, diffs), build both objects of
+each entry, hash them and check Merkle proofs:
+
+    with HashPool(workers=4) as pool:
+        hashes = pool.map_entries(columns, [(entry, row), ...], bases)
+        # [(entry hash, row hash or None, hash proven under the batch root or None) or None, ...]
+
+Workers are started with the "spawn" method: they only import this module
+(and payload_codec / provenance_capture / merkle), and forking a process
+that already runs server and worker threads is never done.
+"""
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import merkle
+import payload_codec
+from provenance_capture import jsonable
+
+# raw provenance row as map_entries() takes it (timestamp: created_at in ISO 8601, trailing Z; payload
+# and merkle_proof: as stored, JSON text or already parsed; batch_root: hex root of the entry's batch,
+# None if it has none or the root is not set)
+ENTRY_FIELDS = ("log_id", "table_name", "record_pk", "operation", "user_id", "timestamp", "prev_hash",
+                "payload", "payload_encoding", "payload_blob", "record_hash", "merkle_proof", "batch_root")
+
+
+def canonical_hash(obj):
+    # Sort keys & remove whitespace to make it deterministic
+    encoded = json.dumps(obj, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def provenance_object(table_name, record_pk, operation, payload, user_id, timestamp, prev_hash=None):
+    """
+    The object whose canonical hash is stored and anchored for a provenance
+    entry. With hash chaining the previous entry's hash is part of it, so
+    each entry commits to the record's whole history.
+    """
+    prov_obj = {
+        "table_name": table_name,
+        "record_pk": str(record_pk),
+        "operation": operation,
+        "payload": payload,
+        "user_id": user_id,
+        "timestamp": timestamp
+    }
+    if prev_hash is not None:
+        prov_obj["prev_hash"] = prev_hash
+    return prov_obj
+
+
+def current_payload(operation, payload, snapshot):
+    """The payload an entry would have if it had been written from the record's current `snapshot`."""
+    if operation == "U":
+        return {"old": (payload or {}).get("old", {}), "new": snapshot}
+    if operation == "D":
+        return {"deleted": snapshot}
+    return {"new": snapshot}
+
+
+def hash_pair(pair):
+    return tuple(None if obj is None else canonical_hash(obj) for obj in pair)
+
+
+def proven_hash(candidates, proof, root_hex):
+    """The first of `candidates` that `proof` proves under `root_hex`, else "merkle-root:<root>"."""
+    for candidate in candidates:
+        if merkle.verify_proof(candidate, proof or [], root_hex):
+            return candidate
+    return f"merkle-root:{root_hex}"
+
+
+def parsed(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def hash_entries(job):
+    """
+    Worker side of HashPool.map_entries(): job is (columns, entries, bases).
+    Returns (entry hash, current row hash or None, batch hash or None) per
+    entry, None for an entry whose diff base is not in `bases`.
+    """
+    columns, entries, bases = job
+    memo = {}
+
+    def decoded(log_id, operation, payload, encoding, blob):
+        if log_id not in memo:
+            doc = payload_codec.stored_document(encoding, parsed(payload), blob)
+            if payload_codec.is_diff(encoding):
+                base = bases.get(doc["base"])
+                if base is None:
+                    raise payload_codec.PayloadUnavailable(f"base entry {doc['base']} was not sent")
+                doc = payload_codec.decode_diff(operation, doc, payload_codec.state_after(base[0], decoded(doc["base"], *base)))
+            memo[log_id] = doc
+        return memo[log_id]
+
+    hashes = []
+    for entry, row in entries:
+        (log_id, table_name, record_pk, operation, user_id, timestamp, prev_hash, payload, encoding, blob,
+         stored_hash, proof, root) = entry
+        try:
+            payload = decoded(log_id, operation, payload, encoding, blob)
+        except payload_codec.PayloadUnavailable:
+            hashes.append(None)
+            continue
+        record_obj = None
+        if row is not None:
+            snapshot = {key: jsonable(value) for key, value in zip(columns, row)}
+            record_obj = provenance_object(table_name, record_pk, operation, current_payload(operation, payload, snapshot),
+                                           user_id, timestamp, prev_hash)
+        prov_hash, record_hash = hash_pair((
+            provenance_object(table_name, record_pk, operation, payload, user_id, timestamp, prev_hash), record_obj))
+        batch_hash = None if root is None else proven_hash((prov_hash, stored_hash), parsed(proof), root)
+        hashes.append((prov_hash, record_hash, batch_hash))
+    return hashes
+
+
+class HashPool:
+    """Decode and hash provenance rows in `workers` processes (in the calling process if workers <= 1)."""
+
+    def __init__(self, workers=1):
+        self.workers = max(1, workers)
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def map_entries(self, columns, entries, bases=None):
+        """
+        hash_entries() over `entries`: [(entry, row)], entry a tuple of
+        ENTRY_FIELDS, row the record's current values of `columns` (None if
+        the row is gone). `bases` ({record_pk: {log_id: (operation, payload,
+        payload_encoding, payload_blob)}}) holds the earlier entries diff
+        payloads are decoded against; each worker gets those of its records.
+        """
+        bases = bases or {}
+
+        def job(part):
+            return columns, part, {log_id: base for entry, _ in part for log_id, base in bases.get(entry[2], {}).items()}
+
+        if self._executor is None or len(entries) < 2 * self.workers:
+            return hash_entries(job(entries))
+        # one slice per worker and round: few, large pickles
+        size = -(-len(entries) // (self.workers * 2))
+        slices = [entries[i:i + size] for i in range(0, len(entries), size)]
+        return [h for part in self._executor.map(hash_entries, map(job, slices)) for h in part]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,243 @@
+"""
+Live provenance events: an in-process fan-out bus, fed across processes by
+PostgreSQL LISTEN/NOTIFY.
+
+Writers queue events on their SQLAlchemy session; they are delivered only
+if the transaction commits. With NOTIFY, the events are sent inside the
+transaction, and PostgreSQL delivers them when it commits. Without NOTIFY,
+they are handed to the local bus right after the commit:
+
+    bus = LiveBus()
+    queue = SessionQueue(before_commit=notify, after_commit=bus.publish)
+    queue.listen(db.session)
+    queue.add(db.session, [{"type": "provenance", "log_id": 7, "table_name": "record", "record_pk": "12", ...}])
+
+    sub = bus.subscribe(tables={"record"}, record_pks={"12"})
+    sub.get(timeout=15)     # [event, ...]; [] on timeout; Lagged if the subscriber fell behind
+    sub.close()
+
+A subscriber whose queue overflows stops getting events and is marked
+lagged. So is every subscriber after the NOTIFY connection is lost. Readers
+then catch up from the database, starting after the last log_id they saw.
+"""
+import collections
+import json
+import logging
+import select
+import threading
+import time
+
+from sqlalchemy import event
+
+log = logging.getLogger('provenance.app.live_feed')
+
+PENDING = "_live_events"
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+class Lagged(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, bus, tables=None, record_pks=None, max_queue=1000):
+        self._bus = bus
+        self.tables = set(tables) if tables else None
+        self.record_pks = set(record_pks) if record_pks else None
+        self.max_queue = max_queue
+        self.lagged = False
+        self._events = collections.deque()
+        self._cond = threading.Condition()
+
+    def wants(self, ev):
+        return ((self.tables is None or ev.get("table_name") in self.tables)
+                and (self.record_pks is None or ev.get("record_pk") in self.record_pks))
+
+    def _offer(self, events):
+        with self._cond:
+            if self.lagged:
+                return
+            self._events.extend(events)
+            if len(self._events) > self.max_queue:
+                self.lag()
+            self._cond.notify()
+
+    def lag(self):
+        with self._cond:
+            self.lagged = True
+            self._events.clear()
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Queued events (waiting up to `timeout` seconds for the first); Lagged once events were lost."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self.lagged, timeout)
+            if self.lagged:
+                raise Lagged()
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LiveBus:
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, tables=None, record_pks=None):
+        sub = Subscription(self, tables, record_pks, self.max_queue)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += len(events)
+        for sub in subscribers:
+            matching = [ev for ev in events if sub.wants(ev)]
+            if matching:
+                sub._offer(matching)
+
+    def lag_all(self):
+        """Events may have been missed (e.g. the NOTIFY connection dropped): every subscriber catches up."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.lag()
+
+
+class SessionQueue:
+    """Events queued during a session's transaction, delivered with its commit and dropped on rollback."""
+
+    def __init__(self, before_commit=None, after_commit=None):
+        self.before_commit = before_commit    # before_commit(session, events) -> True if it delivered them
+        self.after_commit = after_commit      # after_commit(events)
+
+    def add(self, session, events):
+        if events:
+            session.info.setdefault(PENDING, []).extend(events)
+
+    def listen(self, target):
+        event.listen(target, "before_commit", self._before_commit)
+        event.listen(target, "after_commit", self._after_commit)
+        event.listen(target, "after_rollback", self._discard)
+
+    def _before_commit(self, session):
+        if self.before_commit is None:
+            return
+        # the commit's own flush may still queue events (captured provenance)
+        session.flush()
+        events = session.info.get(PENDING)
+        if events and self.before_commit(session, events):
+            session.info.pop(PENDING, None)
+
+    def _after_commit(self, session):
+        events = session.info.pop(PENDING, None)
+        if events and self.after_commit is not None:
+            self.after_commit(events)
+
+    def _discard(self, session):
+        session.info.pop(PENDING, None)
+
+
+def notify_payloads(events, limit=NOTIFY_PAYLOAD_LIMIT):
+    """JSON arrays of `events`, each small enough for one NOTIFY."""
+    payloads, part, size = [], [], 2
+    for ev in events:
+        encoded = json.dumps(ev, separators=(",", ":"), default=str)
+        if part and size + len(encoded) + 1 > limit:
+            payloads.append("[" + ",".join(part) + "]")
+            part, size = [], 2
+        part.append(encoded)
+        size += len(encoded) + 1
+    if part:
+        payloads.append("[" + ",".join(part) + "]")
+    return payloads
+
+
+class NotifyListener:
+    """
+    LISTENs on `channel` in a daemon thread and publishes what arrives on
+    `bus`. `connect()` returns a DB-API (psycopg2) connection; after a lost
+    connection it reconnects and marks every subscriber lagged. `ready` is
+    set while the LISTEN is in place.
+    """
+
+    def __init__(self, connect, channel, bus, poll_seconds=1.0, reconnect_seconds=1.0):
+        self.connect = connect
+        self.channel = channel
+        self.bus = bus
+        self.poll_seconds = poll_seconds
+        self.reconnect_seconds = reconnect_seconds
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"listen-{self.channel}", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self.connect()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                self.ready.set()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.bus.publish(json.loads(conn.notifies.pop(0).payload))
+            except Exception as e:
+                self.ready.clear()
+                log.warning("⚠️ Live feed listener on %s lost its connection: %s", self.channel, e)
+                self.bus.lag_all()
+                time.sleep(self.reconnect_seconds)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+def sse(data, event_name=None, event_id=None):
+    """One Server-Sent Events message."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event_name:
+        lines.append(f"event: {event_name}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":"), default=str))
+    return "\n".join(lines) + "\n\n"
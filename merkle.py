@@ -0,0 +1,72 @@
+"""
+Merkle tree helpers for batched anchoring.
+
+Leaves are the hex SHA-256 provenance hashes produced by canonical_hash().
+Leaves and inner nodes are hashed with different prefixes (0x00 / 0x01) so a
+leaf can never be passed off as an inner node. An odd node at the end of a
+level is carried up unchanged instead of being duplicated.
+
+A proof is a list of [side, sibling_hex] pairs from the leaf up to the root,
+where side tells whether the sibling sits on the left ("L") or right ("R").
+"""
+import hashlib
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def _leaf(hex_hash):
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(hex_hash)).digest()
+
+
+def _node(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_tree(leaf_hashes):
+    """
+    Build a tree over `leaf_hashes` (hex strings, in order).
+    Returns (root_hex, proofs) where proofs[i] proves leaf_hashes[i].
+    """
+    if not leaf_hashes:
+        raise ValueError("cannot build a Merkle tree without leaves")
+
+    level = [_leaf(h) for h in leaf_hashes]
+    # position of every original leaf in the current level
+    positions = list(range(len(level)))
+    proofs = [[] for _ in leaf_hashes]
+
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level) - 1, 2):
+            next_level.append(_node(level[i], level[i + 1]))
+        if len(level) % 2:
+            next_level.append(level[-1])
+
+        for leaf, pos in enumerate(positions):
+            if pos % 2 == 0:
+                if pos + 1 < len(level):
+                    proofs[leaf].append(["R", level[pos + 1].hex()])
+            else:
+                proofs[leaf].append(["L", level[pos - 1].hex()])
+            positions[leaf] = pos // 2
+
+        level = next_level
+
+    return level[0].hex(), proofs
+
+
+def merkle_root(leaf_hashes):
+    return build_tree(leaf_hashes)[0]
+
+
+def verify_proof(leaf_hash, proof, root_hex):
+    """True if `leaf_hash` is included under `root_hex` according to `proof`."""
+    try:
+        node = _leaf(leaf_hash)
+        for side, sibling_hex in proof:
+            sibling = bytes.fromhex(sibling_hex)
+            node = _node(sibling, node) if side == "L" else _node(node, sibling)
+    except (ValueError, TypeError):
+        return False
+    return node.hex() == root_hex.lower().removeprefix("0x")
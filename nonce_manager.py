@@ -0,0 +1,120 @@
+"""
+Local transaction nonce allocation for the anchoring senders.
+
+Instead of letting the node pick the nonce (and waiting for every receipt
+before the next send), nonces are handed out from a per-account counter row
+in the database. The counter is advanced with a single
+UPDATE ... RETURNING, so concurrent threads and processes always get
+distinct nonces and can keep many transactions in flight at once.
+
+When a send fails, the nonces allocated after it were never used:
+release() hands them back, unless other senders have allocated since. When
+the node rejects a nonce ("nonce too low", "replacement transaction
+underpriced") the counter and the chain disagree, and resync() moves it to
+the account's pending transaction count. Both are compare-and-set updates
+on the counter row, so they serialize with allocate() and never move the
+counter below nonces another thread already holds. Only a dropped
+transaction forces a rewind, because the transactions above the hole cannot
+be mined until it is filled anyway.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+# node errors meaning an earlier nonce has not arrived yet (retry the same nonce)
+NONCE_GAP_ERRORS = ("nonce too high",)
+# node errors meaning the counter is out of step with the chain (resync it)
+NONCE_ERRORS = NONCE_GAP_ERRORS + ("nonce too low", "replacement transaction underpriced", "replacement underpriced")
+
+
+def is_nonce_gap(error):
+    msg = str(error).lower()
+    return any(e in msg for e in NONCE_GAP_ERRORS)
+
+
+def is_nonce_error(error):
+    msg = str(error).lower()
+    return any(e in msg for e in NONCE_ERRORS)
+
+
+class NonceManager:
+    def __init__(self, get_engine, table, chain_count_fn):
+        """
+        `get_engine()` returns the SQLAlchemy engine holding `table`, which
+        needs account / next_nonce / updated_at columns;
+        `chain_count_fn(account)` returns the account's pending tx count.
+        """
+        self.get_engine = get_engine
+        self.table = table
+        self.chain_count_fn = chain_count_fn
+
+    def allocate(self, account, count=1):
+        """Reserve `count` consecutive nonces for `account`; returns them as a list."""
+        t = self.table
+        stmt = (
+            update(t)
+            .where(t.c.account == account)
+            .values(next_nonce=t.c.next_nonce + count, updated_at=datetime.now(timezone.utc))
+            .returning(t.c.next_nonce)
+        )
+        with self.get_engine().begin() as conn:
+            next_nonce = conn.execute(stmt).scalar()
+        if next_nonce is None:
+            self._initialize(account)
+            with self.get_engine().begin() as conn:
+                next_nonce = conn.execute(stmt).scalar()
+        return list(range(next_nonce - count, next_nonce))
+
+    def _initialize(self, account):
+        row = {"account": account, "next_nonce": self.chain_count_fn(account), "updated_at": datetime.now(timezone.utc)}
+        try:
+            with self.get_engine().begin() as conn:
+                conn.execute(insert(self.table).values(row))
+        except IntegrityError:
+            pass   # another worker created it first
+
+    def release(self, account, first_unused, allocated_to):
+        """
+        Give back the nonces [first_unused, allocated_to) that were allocated
+        but never sent, if nothing was allocated after them. Returns whether
+        the counter moved back.
+        """
+        t = self.table
+        with self.get_engine().begin() as conn:
+            return bool(conn.execute(
+                update(t)
+                .where(t.c.account == account, t.c.next_nonce == allocated_to)
+                .values(next_nonce=first_unused, updated_at=datetime.now(timezone.utc))
+            ).rowcount)
+
+    def resync(self, account, allocated_to=None, force=False):
+        """
+        Move the counter of `account` to its pending tx count on the chain.
+        Forward always; backward only if the counter still stands at
+        `allocated_to` (the end of the caller's own allocation, so no other
+        thread holds a nonce above it) or with `force`. Returns the counter.
+        """
+        t = self.table
+        count = self.chain_count_fn(account)
+        allowed = t.c.next_nonce < count
+        if force:
+            allowed = t.c.next_nonce != count
+        elif allocated_to is not None:
+            allowed = allowed | (t.c.next_nonce == allocated_to)
+        with self.get_engine().begin() as conn:
+            conn.execute(
+                update(t)
+                .where(t.c.account == account, allowed)
+                .values(next_nonce=count, updated_at=datetime.now(timezone.utc))
+            )
+            current = conn.execute(select(t.c.next_nonce).where(t.c.account == account)).scalar()
+        if current is None:
+            self._initialize(account)
+            return count
+        return current
+
+    def snapshot(self):
+        """{account: next nonce} for every known sender."""
+        with self.get_engine().connect() as conn:
+            return {row.account: row.next_nonce for row in conn.execute(self.table.select())}
@@ -0,0 +1,108 @@
+"""
+Storage encodings for ProvenanceLog.payload.
+
+The canonical hash is always computed over the full payload
+({"new": ...}, {"old": ..., "new": ...} or {"deleted": ...}); these encodings
+only change how it is stored:
+
+  None / "json"  full payload in the JSON column (the original format)
+  "diff"         UPDATE/DELETE payload as field-level diffs against the
+                 record state after an earlier entry (`base`):
+                 {"base": log_id, "root": log_id, "depth": n,
+                  "old": {"set": {...}, "unset": [...]}, "new": {...}}
+                 `root` is the nearest entry stored in full, `depth` the
+                 number of diffs between it and this entry
+  "<enc>+zlib"   the document of <enc> compressed into payload_blob
+
+Diffs only cover the top-level fields of a snapshot; encode_diff() returns
+None whenever a payload cannot be diffed losslessly, and the caller stores
+it in full.
+"""
+import json
+import zlib
+
+DIFF = "diff"
+ZLIB_SUFFIX = "+zlib"
+
+# payload key holding the snapshot a new entry starts from / ends at
+_SNAPSHOT_KEYS = {"U": ("old", "new"), "D": ("deleted",)}
+
+
+class PayloadUnavailable(Exception):
+    """A diff-encoded payload whose base entry cannot be read."""
+
+
+def is_diff(encoding):
+    return bool(encoding) and encoding.split("+")[0] == DIFF
+
+
+def is_compressed(encoding):
+    return bool(encoding) and encoding.endswith(ZLIB_SUFFIX)
+
+
+def state_after(operation, payload):
+    """Record snapshot an entry leaves behind (for DELETE: the deleted row)."""
+    if not isinstance(payload, dict):
+        return None
+    return payload.get("deleted") if operation == "D" else payload.get("new")
+
+
+def field_diff(old, new):
+    diff = {}
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    if changed:
+        diff["set"] = changed
+    if removed:
+        diff["unset"] = removed
+    return diff
+
+
+def apply_field_diff(base, diff):
+    out = {k: v for k, v in base.items() if k not in diff.get("unset", ())}
+    out.update(diff.get("set", {}))
+    return out
+
+
+def _canonical(obj):
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+def encode_diff(operation, payload, base_state, base_log_id, root_log_id, depth):
+    """Diff document for `payload` against `base_state`, or None if it has to be stored in full."""
+    keys = _SNAPSHOT_KEYS.get(operation)
+    if (keys is None or not isinstance(payload, dict) or set(payload) != set(keys)
+            or not isinstance(base_state, dict) or not all(isinstance(payload[k], dict) for k in keys)):
+        return None
+    doc = {"base": base_log_id, "root": root_log_id, "depth": depth}
+    previous = base_state
+    for key in keys:
+        doc[key] = field_diff(previous, payload[key])
+        previous = payload[key]
+    # the hash depends on getting the exact payload back (1 == True, but not in JSON)
+    if _canonical(decode_diff(operation, doc, base_state)) != _canonical(payload):
+        return None
+    return doc
+
+
+def decode_diff(operation, doc, base_state):
+    """Full payload of a diff document, given the state after its base entry."""
+    if not isinstance(base_state, dict):
+        raise PayloadUnavailable(f"base entry {doc.get('base')} has no record snapshot")
+    payload, previous = {}, base_state
+    for key in _SNAPSHOT_KEYS[operation]:
+        previous = payload[key] = apply_field_diff(previous, doc[key])
+    return payload
+
+
+def compress(doc, level=6):
+    return zlib.compress(json.dumps(doc, separators=(",", ":")).encode(), level)
+
+
+def decompress(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+def stored_document(encoding, payload, blob):
+    """The stored document (full payload or diff) of a row, decompressed."""
+    return decompress(blob) if is_compressed(encoding) else payload
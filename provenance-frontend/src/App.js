@@ -277,6 +277,21 @@ function App() {
     fetchRecords();
   }, []);
 
+  // Live updates: the server pushes new provenance entries (GET /live),
+  // so the list is re-fetched only when something changed
+  useEffect(() => {
+    const source = new EventSource("http://127.0.0.1:5000/live?table=record");
+    let timer = null;
+    source.addEventListener("provenance", () => {
+      clearTimeout(timer);
+      timer = setTimeout(fetchRecords, 200);
+    });
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  }, []);
+
   // Add record
   const addRecord = async () => {
     let ed_user = user.trim();
@@ -358,6 +373,19 @@ function App() {
     }
   };
 
+  // Keep the open history current, including anchoring / verification status
+  useEffect(() => {
+    if (!selectedRecord) return;
+    const source = new EventSource(
+      `http://127.0.0.1:5000/live?record_id=${selectedRecord.id}`
+    );
+    const refresh = () => fetchHistory(selectedRecord.id);
+    ["provenance", "anchor", "verification"].forEach((name) =>
+      source.addEventListener(name, refresh)
+    );
+    return () => source.close();
+  }, [selectedRecord]);
+
   // Manual search for deleted record
   const handleManualSearch = async () => {
     if (!searchId.trim()) {
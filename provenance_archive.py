@@ -0,0 +1,190 @@
+"""
+Immutable, compressed, append-only segment files for archived provenance rows.
+
+A segment holds rows (JSON objects) grouped under a string key (the app uses
+"<table_name>/<record_pk>"); every row carries its key in a "_key" field.
+It is written once, then only read:
+
+    magic | block ... block | index entries | offsets | meta | footer
+
+Rows are stored in zlib-compressed blocks of JSON lines; all rows of one key
+sit in the same block. The index lists every key in sorted (bytewise) order
+with the offset and length of its block, and the fixed-width offsets table
+after it allows a binary search over the memory-mapped file without loading
+the index. The footer points at the offsets table and the JSON metadata.
+
+The SHA-256 of the whole file is its checksum: it is returned by
+write_segment() (and kept next to it as <file>.sha256) so it can be recorded
+and anchored on-chain; file_checksum() recomputes it.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+MAGIC = b"PVSEG01\n"
+FOOTER = struct.Struct("<QQQQ8s")          # offsets table offset, key count, meta offset, meta length, magic
+INDEX_ENTRY = struct.Struct("<HQI")        # key length, block offset, block length (key bytes follow)
+OFFSET = struct.Struct("<Q")
+BLOCK_SIZE = 64 * 1024                     # uncompressed bytes per block (soft limit)
+
+
+class SegmentError(Exception):
+    pass
+
+
+def write_segment(path, rows_by_key, meta=None, block_size=BLOCK_SIZE, level=9):
+    """
+    Write a new segment file from {key: [row, ...]} and return its SHA-256
+    (hex). The file is written under a temporary name and made read-only
+    before it is moved into place; an existing file is never overwritten.
+    """
+    if os.path.exists(path):
+        raise SegmentError(f"segment {path} already exists")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    digest = hashlib.sha256()
+    try:
+        with open(tmp, "wb") as f:
+            def emit(data):
+                f.write(data)
+                digest.update(data)
+                return len(data)
+
+            pos = emit(MAGIC)
+            index, pending, pending_keys, pending_size = [], [], [], 0
+
+            def flush_block():
+                nonlocal pos, pending, pending_keys, pending_size
+                if not pending:
+                    return
+                block = zlib.compress(b"".join(pending), level)
+                index.extend((key, pos, len(block)) for key in pending_keys)
+                pos += emit(block)
+                pending, pending_keys, pending_size = [], [], 0
+
+            for key in sorted(rows_by_key, key=lambda k: k.encode()):
+                lines = [json.dumps(row, separators=(",", ":"), sort_keys=True).encode() + b"\n"
+                         for row in rows_by_key[key]]
+                pending.extend(lines)
+                pending_keys.append(key)
+                pending_size += sum(len(line) for line in lines)
+                if pending_size >= block_size:
+                    flush_block()
+            flush_block()
+
+            offsets = []
+            for key, block_offset, block_length in index:
+                raw = key.encode()
+                offsets.append(pos)
+                pos += emit(INDEX_ENTRY.pack(len(raw), block_offset, block_length) + raw)
+            offsets_at = pos
+            for offset in offsets:
+                pos += emit(OFFSET.pack(offset))
+            meta_raw = json.dumps(meta or {}, separators=(",", ":"), sort_keys=True).encode()
+            meta_at = pos
+            pos += emit(meta_raw)
+            emit(FOOTER.pack(offsets_at, len(offsets), meta_at, len(meta_raw), MAGIC))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.chmod(tmp, 0o644)
+            os.remove(tmp)
+        raise
+    checksum = digest.hexdigest()
+    with open(f"{path}.sha256", "w") as f:
+        f.write(f"{checksum}  {os.path.basename(path)}\n")
+    return checksum
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Segment:
+    """Read-only view of one segment file (memory-mapped)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        m = self._map
+        if len(m) < len(MAGIC) + FOOTER.size or m[:len(MAGIC)] != MAGIC:
+            raise SegmentError(f"{path} is not a provenance segment")
+        self._offsets_at, self.key_count, meta_at, meta_len, magic = FOOTER.unpack_from(m, len(m) - FOOTER.size)
+        if magic != MAGIC:
+            raise SegmentError(f"{path} has no valid footer (truncated?)")
+        self.meta = json.loads(m[meta_at:meta_at + meta_len])
+
+    def _entry(self, i):
+        (at,) = OFFSET.unpack_from(self._map, self._offsets_at + i * OFFSET.size)
+        key_len, block_offset, block_length = INDEX_ENTRY.unpack_from(self._map, at)
+        start = at + INDEX_ENTRY.size
+        return self._map[start:start + key_len], block_offset, block_length
+
+    def get(self, key):
+        """Rows stored under `key` (empty list if there are none)."""
+        raw = key.encode()
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.key_count:
+            return []
+        found, block_offset, block_length = self._entry(lo)
+        if found != raw:
+            return []
+        block = zlib.decompress(self._map[block_offset:block_offset + block_length])
+        # rows are written with sorted keys, so a "_key" field comes first
+        prefix = b'{"_key":' + json.dumps(key).encode() + b","
+        return [json.loads(line) for line in block.splitlines() if line.startswith(prefix)]
+
+    def keys(self):
+        for i in range(self.key_count):
+            yield self._entry(i)[0].decode()
+
+    def close(self):
+        self._map.close()
+
+
+class Archive:
+    """The segment files of one archive directory, opened on first use."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def segment(self, name):
+        seg = self._segments.get(name)
+        if seg is None:
+            with self._lock:
+                seg = self._segments.get(name)
+                if seg is None:
+                    seg = self._segments[name] = Segment(os.path.join(self.directory, name))
+        return seg
+
+    def get(self, names, key):
+        """Rows stored under `key` in the given segments."""
+        rows = []
+        for name in names:
+            rows.extend(self.segment(name).get(key))
+        return rows
+
+    def close(self):
+        with self._lock:
+            for seg in self._segments.values():
+                seg.close()
+            self._segments = {}
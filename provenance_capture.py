@@ -0,0 +1,145 @@
+"""
+Automatic provenance capture on SQLAlchemy session events.
+
+Models are registered with the table name and the columns their provenance
+snapshots contain. A before_flush listener notes what the flush is about to
+change (with the old values of updated rows and the last state of deleted
+ones); after_flush, once inserted rows have their primary keys, the whole
+flush's changes go to one callback, which writes all provenance rows at once:
+
+    capture = ProvenanceCapture(write_changes)
+    capture.register(Record, "record", ("id", "data"))
+    capture.listen(db.session)           # a (scoped) session or Session class
+
+    def write_changes(session, changes): # [Change(table_name, record_pk, operation, payload, user), ...]
+        ...
+
+Payloads have the shape the hand-written endpoints always used:
+{"new": snapshot} for inserts, {"old": ..., "new": ...} for updates and
+{"deleted": snapshot} for deletes. Bulk statements (session.execute(update(...)))
+bypass the unit of work and are not captured.
+session.info["provenance_capture"] = False turns capture off for a session.
+attribute(obj, user) sets the user of `obj`'s next captured change
+(Change.user; None means the caller's session-wide default), for flushes
+that change rows on behalf of several users.
+"""
+import base64
+import collections
+import datetime
+import decimal
+import uuid
+
+from sqlalchemy import event, inspect
+
+Change = collections.namedtuple("Change", "table_name record_pk operation payload user", defaults=(None,))
+
+_PENDING = "_provenance_pending"
+_USER = "provenance_user"
+
+
+def jsonable(value):
+    """Column value as it appears in a snapshot (and in the canonical hash)."""
+    if isinstance(value, datetime.datetime):
+        # naive values are UTC (SQLite hands timezone-aware columns back naive)
+        value = value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value.astimezone(datetime.timezone.utc)
+        return value.isoformat().replace("+00:00", "Z")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    return value
+
+
+def attribute(obj, user):
+    """Attribute the next captured change of `obj` to `user`."""
+    inspect(obj).info[_USER] = user
+
+
+class ProvenanceCapture:
+    def __init__(self, on_changes):
+        self.on_changes = on_changes
+        self.models = {}    # model class -> (table name, snapshot columns)
+
+    def register(self, model, table_name=None, columns=None):
+        """Capture changes of `model` (snapshot: `columns`, default all mapped columns)."""
+        mapper = inspect(model)
+        columns = tuple(columns or (attr.key for attr in mapper.column_attrs))
+        for key in columns:
+            # load the old value before a change even if it was expired, so updates always see it
+            event.listen(getattr(model, key), "set", _keep_old_value, active_history=True)
+        self.models[model] = (table_name or mapper.local_table.name, columns)
+        return model
+
+    def snapshot(self, obj):
+        """`obj`'s registered columns as a provenance snapshot holds them."""
+        return _snapshot(obj, self.models[type(obj)][1])
+
+    def listen(self, target):
+        event.listen(target, "before_flush", self._before_flush)
+        event.listen(target, "after_flush", self._after_flush)
+        event.listen(target, "after_rollback", self._discard)
+
+    def _before_flush(self, session, flush_context, instances):
+        if session.info.get("provenance_capture") is False:
+            return
+        pending = session.info.setdefault(_PENDING, [])
+        for obj in session.new:
+            spec = self.models.get(type(obj))
+            if spec:
+                pending.append(("I", spec, obj, None, None))
+        for obj in session.dirty:
+            spec = self.models.get(type(obj))
+            if spec and session.is_modified(obj, include_collections=False):
+                pending.append(("U", spec, obj, _record_pk(obj), _old_snapshot(obj, spec[1])))
+        for obj in session.deleted:
+            spec = self.models.get(type(obj))
+            if spec:
+                pending.append(("D", spec, obj, _record_pk(obj), _snapshot(obj, spec[1])))
+
+    def _after_flush(self, session, flush_context):
+        pending = session.info.pop(_PENDING, None)
+        if not pending:
+            return
+        changes = []
+        for operation, (table_name, columns), obj, record_pk, old in pending:
+            if operation == "I":
+                payload, record_pk = {"new": _snapshot(obj, columns)}, _record_pk(obj)
+            elif operation == "U":
+                payload = {"old": old, "new": _snapshot(obj, columns)}
+            else:
+                payload = {"deleted": old}
+            changes.append(Change(table_name, record_pk, operation, payload, inspect(obj).info.pop(_USER, None)))
+        self.on_changes(session, changes)
+
+    def _discard(self, session):
+        session.info.pop(_PENDING, None)
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+def _record_pk(obj):
+    # (composite keys joined with "/"); identity keys of new rows are only set after the flush
+    return "/".join(str(v) for v in inspect(obj).mapper.primary_key_from_instance(obj))
+
+
+def _snapshot(obj, columns):
+    return {key: jsonable(getattr(obj, key)) for key in columns}
+
+
+def _old_snapshot(obj, columns):
+    attrs = inspect(obj).attrs
+    snapshot = {}
+    for key in columns:
+        history = attrs[key].history
+        if history.deleted:
+            value = history.deleted[0]
+        elif history.unchanged:
+            value = history.unchanged[0]
+        else:
+            value = getattr(obj, key)
+        snapshot[key] = jsonable(value)
+    return snapshot
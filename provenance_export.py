@@ -0,0 +1,130 @@
+"""
+Streaming output for provenance exports.
+
+Rows (dicts) are turned into NDJSON or CSV text chunk by chunk, and
+optionally gzip-compressed on the fly, so an export never holds more than
+one batch in memory:
+
+    enc = encoder("csv", columns)
+    gz = GzipStream()
+    yield gz.compress(enc.header())
+    for batch in batches:
+        yield gz.compress(enc.encode(batch)) + gz.flush()
+    yield gz.close()
+
+Each GzipStream is one gzip member; members can be concatenated (that is
+how a resumed export is appended to a partial file) and any gzip reader
+decodes them as one stream.
+
+Resume positions are opaque cursor tokens: URL-safe base64 of a small JSON
+object holding the filters and the last exported key.
+"""
+import base64
+import csv
+import io
+import json
+import zlib
+from collections import OrderedDict
+
+FORMATS = ("ndjson", "csv")
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, sort_keys=True, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """The state of a cursor token; ValueError if it is not one."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor token") from None
+    if not isinstance(state, dict):
+        raise ValueError("invalid cursor token")
+    return state
+
+
+class NdjsonEncoder:
+    content_type = "application/x-ndjson"
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self):
+        return ""
+
+    def encode(self, rows):
+        return "".join(json.dumps(row, separators=(",", ":"), default=str) + "\n" for row in rows)
+
+
+class CsvEncoder:
+    """One column per key; nested values (payload, proofs) are written as JSON."""
+    content_type = "text/csv"
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def _text(self, rows):
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(rows)
+        return out.getvalue()
+
+    def header(self):
+        return self._text([self.columns])
+
+    def encode(self, rows):
+        return self._text(
+            [self._cell(row.get(c)) for c in self.columns]
+            for row in rows
+        )
+
+    @staticmethod
+    def _cell(value):
+        if value is None:
+            return ""
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, separators=(",", ":"), sort_keys=True)
+        return value
+
+
+def encoder(fmt, columns):
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return (CsvEncoder if fmt == "csv" else NdjsonEncoder)(columns)
+
+
+class GzipStream:
+    """Incremental gzip compression of text chunks (one gzip member)."""
+
+    def __init__(self, level=6):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)   # 31: gzip header and trailer
+
+    def compress(self, text):
+        return self._z.compress(text.encode())
+
+    def flush(self):
+        """Everything compressed so far, decodable by the receiver now."""
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def close(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+def gzip_member(text, level=6):
+    """`text` as one complete gzip member."""
+    gz = GzipStream(level)
+    return gz.compress(text) + gz.close()
+
+
+class BoundedMemo(OrderedDict):
+    """dict that forgets its oldest entries beyond `maxsize` (decoded payloads during an export)."""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
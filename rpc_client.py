@@ -0,0 +1,122 @@
+"""
+Shared asynchronous JSON-RPC client built on AsyncWeb3.
+
+Flask handlers are synchronous, so the client owns one asyncio event loop
+running in a daemon thread. A handler passes a list of independent calls
+(zero-argument functions returning awaitables) to gather() and blocks until
+all of them are done: they run concurrently over one persistent aiohttp
+connection pool, with at most max_in_flight calls outstanding at a time.
+The loop and the connection pool are created on first use. An already
+built AsyncWeb3-compatible object can be passed as `w3` instead (in-process
+chains such as the benchmark stand-in, see bench/mock_chain.py).
+
+`observer(seconds, error)`, if set, is called after every call (error is
+None on success); the app feeds its RPC latency / error metrics from it.
+"""
+import asyncio
+import threading
+import time
+
+
+class AsyncRpcClient:
+    def __init__(self, endpoint_uri, max_in_flight=16, pool_size=32, timeout=30.0, keepalive_seconds=60.0, w3=None):
+        self.endpoint_uri = endpoint_uri
+        self.max_in_flight = max_in_flight
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.keepalive_seconds = keepalive_seconds
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._session = None
+        self._given_w3 = w3
+        self._w3 = w3
+        self._contracts = {}
+        self.observer = None
+
+    def _start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="rpc-client", daemon=True)
+            thread.start()
+            asyncio.run_coroutine_threadsafe(self._connect(), loop).result(self.timeout)
+            self._loop, self._thread = loop, thread
+
+    async def _connect(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._w3 is not None:
+            return
+        # heavy imports, only paid once a call is made
+        import aiohttp
+        from web3 import AsyncWeb3, AsyncHTTPProvider
+        provider = AsyncHTTPProvider(self.endpoint_uri)
+        self._session = aiohttp.ClientSession(
+            raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_seconds),
+        )
+        # web3 reuses a session cached per event loop and endpoint; seed it
+        # with ours so every call shares the keep-alive pool above
+        await provider.cache_async_session(self._session)
+        self._w3 = AsyncWeb3(provider)
+
+    @property
+    def w3(self):
+        """The AsyncWeb3 instance (only await it inside calls passed to gather())."""
+        self._start()
+        return self._w3
+
+    def contract(self, address, abi):
+        """Async contract object for `address`, created once per address."""
+        contract = self._contracts.get(address)
+        if contract is None:
+            contract = self._contracts[address] = self.w3.eth.contract(address=address, abi=abi)
+        return contract
+
+    def gather(self, calls, return_exceptions=False):
+        """
+        Run independent calls concurrently and return their results in order.
+        With return_exceptions=True a failed call yields its exception instead
+        of failing the whole group.
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        self._start()
+
+        async def bounded(call):
+            async with self._semaphore:
+                if self.observer is None:
+                    return await call()
+                started = time.perf_counter()
+                try:
+                    result = await call()
+                except Exception as e:
+                    self.observer(time.perf_counter() - started, e)
+                    raise
+                self.observer(time.perf_counter() - started, None)
+                return result
+
+        async def run():
+            return await asyncio.gather(*(bounded(c) for c in calls), return_exceptions=return_exceptions)
+
+        return asyncio.run_coroutine_threadsafe(run(), self._loop).result()
+
+    def call(self, call):
+        """Run a single call on the client's loop."""
+        return self.gather([call])[0]
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(self.timeout)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(self.timeout)
+            self._loop = self._thread = self._session = None
+            self._w3 = self._given_w3
+            self._contracts = {}
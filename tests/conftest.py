@@ -0,0 +1,69 @@
+"""
+Shared fixtures: every test gets its own SQLite database and an in-process
+chain (bench/mock_chain.py) instead of the Hardhat node.
+
+The app reads its settings from the environment at import time, so the
+defaults for the suite are set here before app.py is imported; tests switch
+modes with monkeypatch.setattr(app_module, "ANCHOR_MODE", ...).
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bench")]
+os.environ.setdefault("ANCHOR_MODE", "sync")
+os.environ.setdefault("PROVENANCE_LOG_SAMPLE_RATE", "0")
+os.environ.setdefault("TAMPER_SWEEP_WORKERS", "1")
+
+import app as app_module  # noqa: E402
+from mock_chain import CONTRACT_ADDRESS, PROVENANCE_ABI, PROVENANCE_V2_ABI, MockProvenanceChain  # noqa: E402
+
+LEGACY_ADDRESS = "0x" + "ab" * 20
+
+
+@pytest.fixture
+def chain():
+    return MockProvenanceChain()
+
+
+@pytest.fixture
+def make_app(tmp_path, chain):
+    """create_app() on a fresh SQLite file and the mock chain; `config` overrides the defaults."""
+    def make(**config):
+        base = {
+            "TESTING": True,
+            "BACKGROUND_WORKERS": False,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'provenance.db'}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {},
+            "READ_REPLICA_URIS": [],
+            "ARCHIVE_DIR": str(tmp_path / "archive"),
+            "BLOB_DIR": str(tmp_path / "blobs"),
+            "CHAIN_W3": chain.w3(),
+            "CHAIN_ASYNC_W3": chain.async_w3(),
+            "CONTRACT_ABI": PROVENANCE_ABI,
+        }
+        return app_module.create_app({**base, **config})
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_records(client, *values, user="alice"):
+    """POST /add for every value; returns the new record ids."""
+    ids = []
+    for value in values:
+        resp = client.post("/add", json={"data": value, "user": user})
+        assert resp.status_code == 201, resp.get_json()
+        ids.append(resp.get_json()["id"])
+    return ids
+
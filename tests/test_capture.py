@@ -0,0 +1,197 @@
+"""provenance_capture.py flush hooks, and the bulk endpoints writing their provenance through them."""
+import datetime
+import decimal
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, Numeric, String, create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, declarative_base
+
+import provenance_capture
+from conftest import app_module as m
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "item"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50))
+    price = Column(Numeric(10, 2))
+    seen_at = Column(DateTime)
+
+
+@pytest.fixture
+def captured():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    flushes = []
+    capture = provenance_capture.ProvenanceCapture(lambda session, changes: flushes.append(changes))
+    capture.register(Item)
+    capture.listen(Session)
+    with Session(engine) as session:
+        yield session, flushes
+    event.remove(Session, "before_flush", capture._before_flush)
+    event.remove(Session, "after_flush", capture._after_flush)
+    event.remove(Session, "after_rollback", capture._discard)
+
+
+def test_one_callback_per_flush_with_full_payloads(captured):
+    session, flushes = captured
+    seen = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    a, b = Item(name="a", price=decimal.Decimal("1.50"), seen_at=seen), Item(name="b")
+    session.add_all([a, b])
+    session.flush()
+    assert len(flushes) == 1
+    assert sorted(flushes[0]) == [
+        ("item", "1", "I", {"new": {"id": 1, "name": "a", "price": "1.50", "seen_at": "2026-01-02T03:04:05Z"}}, None),
+        ("item", "2", "I", {"new": {"id": 2, "name": "b", "price": None, "seen_at": None}}, None),
+    ]
+
+    session.commit()          # expires a: its old name is loaded before the change
+    a.name = "a2"
+    session.delete(b)
+    session.flush()
+    update, delete = sorted(flushes[1], key=lambda c: c.operation, reverse=True)
+    assert update.payload["old"]["name"] == "a" and update.payload["new"]["name"] == "a2"
+    assert delete == ("item", "2", "D", {"deleted": {"id": 2, "name": "b", "price": None, "seen_at": None}}, None)
+
+
+def test_unchanged_objects_are_not_captured(captured):
+    session, flushes = captured
+    item = Item(name="a")
+    session.add(item)
+    session.commit()
+    item.name = "a"
+    session.flush()
+    assert len(flushes) == 1
+
+
+def test_per_object_user_applies_to_its_next_change_only(captured):
+    session, flushes = captured
+    a, b = Item(name="a"), Item(name="b")
+    session.add_all([a, b])
+    provenance_capture.attribute(a, "alice")
+    session.flush()
+    assert {c.record_pk: c.user for c in flushes[0]} == {"1": "alice", "2": None}
+    a.name = "a2"
+    session.flush()
+    assert flushes[1][0].user is None
+
+
+def test_capture_can_be_turned_off_and_rollback_discards(captured):
+    session, flushes = captured
+    session.info["provenance_capture"] = False
+    session.add(Item(name="quiet"))
+    session.flush()
+    session.info["provenance_capture"] = True
+    assert flushes == []
+
+    # a failed flush leaves nothing behind for the next one
+    session.execute(Item.__table__.insert().values(id=5, name="taken"))
+    session.add(Item(id=5, name="lost"))
+    with pytest.raises(IntegrityError):
+        session.flush()
+    session.rollback()
+    assert provenance_capture._PENDING not in session.info
+    session.add(Item(name="kept"))
+    session.flush()
+    assert [c.payload["new"]["name"] for c in flushes[0]] == ["kept"]
+
+
+@pytest.fixture
+def flush_count(monkeypatch):
+    """Flushes that wrote provenance rows."""
+    flushes = []
+    write = m.capture.on_changes
+
+    def counted(session, changes):
+        flushes.append(len(changes))
+        write(session, changes)
+
+    monkeypatch.setattr(m.capture, "on_changes", counted)
+    return flushes
+
+
+def bulk(client, method, url, body):
+    resp = getattr(client, method)(url, json=body)
+    assert resp.status_code in (200, 201), resp.get_json()
+    return resp.get_json()
+
+
+def entries(app):
+    with app.app_context():
+        return [(p.record_pk, p.operation, p.user_id, p.record_hash, p.batch_id)
+                for p in m.ProvenanceLog.query.order_by(m.ProvenanceLog.log_id)]
+
+
+def test_bulk_add_writes_through_capture_in_one_flush(app, client, flush_count):
+    body = bulk(client, "post", "/add_bulk",
+                {"user": "alice", "items": [{"data": "a"}, {"data": "b", "user": "bob"}, {}]})
+    assert (body["succeeded"], body["failed"], body["anchor_status"]) == (2, 1, "anchored")
+    assert [r.get("id") for r in body["results"]] == [1, 2, None]
+    assert flush_count == [2]
+    logged = entries(app)
+    assert [(pk, op, user) for pk, op, user, _, _ in logged] == [("1", "I", "alice"), ("2", "I", "bob")]
+    assert [r["hash"] for r in body["results"][:2]] == [h for _, _, _, h, _ in logged]
+    assert {batch for *_, batch in logged} == {body["batch_id"]}
+    assert client.post("/verify_bulk", json={"ids": [1, 2]}).get_json()["verified"] == 2
+
+
+def test_bulk_update_and_delete(app, client, flush_count, monkeypatch):
+    monkeypatch.setattr(m, "PROVENANCE_HASH_CHAIN", True)
+    bulk(client, "post", "/add_bulk", {"user": "alice", "items": [{"data": "a"}, {"data": "b"}, {"data": "c"}]})
+    flush_count.clear()
+
+    body = bulk(client, "put", "/update_bulk", {"user": "bob", "items": [
+        {"id": 1, "data": "a2"}, {"id": 2, "data": "b2", "user": "carol"}, {"id": 99, "data": "x"},
+        {"id": 1, "data": "a3"},     # a repeated id starts a second flush
+    ]})
+    assert [r.get("error") for r in body["results"]] == [None, None, "Record not found", None]
+    assert flush_count == [2, 1]
+    with app.app_context():
+        ones = m.ProvenanceLog.query.filter_by(record_pk="1").order_by(m.ProvenanceLog.log_id).all()
+        assert [p.payload["new"]["data"] for p in ones] == ["a", "a2", "a3"]
+        assert ones[2].payload["old"]["data"] == "a2" and ones[2].prev_hash == ones[1].record_hash
+        assert m.latest_provenances(["2"])["2"].user_id == "carol"
+
+    flush_count.clear()
+    body = bulk(client, "delete", "/delete_bulk", {"user": "dave", "items": [3, {"id": 3}, 2]})
+    assert [r.get("error") for r in body["results"]] == [None, "not found", None]
+    assert flush_count == [2]
+    with app.app_context():
+        assert m.db.session.get(m.Record, 3) is None
+        deleted = m.latest_provenances(["3"])["3"]
+        assert (deleted.operation, deleted.user_id, deleted.payload) == ("D", "dave", {"deleted": {"id": 3, "data": "c"}})
+    assert client.get("/verify/1").get_json()["verified"] is True
+
+
+def test_invalid_items_fail_alone(app, client, flush_count):
+    body = bulk(client, "post", "/add_bulk", {"user": "alice", "items": [
+        {"data": "a"}, {"data": {"x": 1}}, {"data": "b", "user": 5}, {"data": "c" * 256}, {"data": "d", "user": "bob"},
+    ]})
+    assert [r.get("error") for r in body["results"]] == [
+        None, "data (non-empty string) required", "user is required", "data longer than 255 characters", None]
+    assert flush_count == [2]
+    good = [r["id"] for r in body["results"] if "id" in r]
+
+    body = bulk(client, "put", "/update_bulk", {"user": "carol", "items": [
+        {"id": good[0], "data": ["x"]}, {"id": good[1], "user": 7}, {"id": good[1], "data": "d2"},
+    ]})
+    assert [r.get("error") for r in body["results"]] == ["data (non-empty string) required", "user is required", None]
+    resp = client.delete("/delete_bulk", json={"items": [{"id": good[0], "user": 5}]})
+    assert resp.status_code == 400 and resp.get_json()["results"][0]["error"] == "user is required"
+
+    assert client.post("/verify_bulk", json={"ids": good}).get_json()["verified"] == 2
+    with app.app_context():
+        assert m.latest_provenances([str(good[1])])[str(good[1])].payload["new"]["data"] == "d2"
+
+
+def test_unattributed_change_aborts_the_flush(app):
+    with app.app_context():
+        m.ensure_schema()
+        m.db.session.info.pop("provenance_user", None)
+        m.db.session.add(m.Record(data="rogue", modified_by="x"))
+        with pytest.raises(RuntimeError, match="without a provenance user"):
+            m.db.session.flush()
+        m.db.session.rollback()
@@ -0,0 +1,87 @@
+"""chain_cache.ChainReadCache: block-height validity, event-driven invalidation, write-through and LRU."""
+from chain_cache import ChainReadCache, LRUCache
+
+
+class Head:
+    def __init__(self, block=0):
+        self.block = block
+
+    def __call__(self):
+        return self.block
+
+
+def cache_with_head(block=0, **kwargs):
+    head = Head(block)
+    return ChainReadCache(head_fn=head, head_check_seconds=0, **kwargs), head
+
+
+def test_entry_served_until_a_newer_block():
+    cache, head = cache_with_head(5)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return "h1"
+
+    assert cache.get(("getRecordHash", 1), load) == "h1"
+    assert cache.get(("getRecordHash", 1), load) == "h1"
+    assert len(loads) == 1
+
+    head.block = 6
+    cache.get(("getRecordHash", 1), load)
+    assert len(loads) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_indexed_events_keep_untouched_entries_valid():
+    cache, head = cache_with_head(5)
+    cache.get(("getRecordHash", 1), lambda: "a")
+    cache.get(("getRecordHash", 2), lambda: "b")
+    head.block = 7
+    cache.apply_events(6, 7, [("getRecordHash", 2)])
+    assert cache.lookup(("getRecordHash", 1)) == (True, "a")
+    assert cache.lookup(("getRecordHash", 2)) == (False, None)
+    # a gap in the applied events invalidates everything older again
+    head.block = 9
+    cache.apply_events(9, 9, [])
+    assert cache.lookup(("getRecordHash", 1)) == (False, None)
+
+
+def test_uncacheable_values_and_raced_loads_are_not_stored():
+    cache, _ = cache_with_head(1)
+    cache.get(("getBatchRoot", 1), lambda: b"\0" * 32, cacheable=any)
+    assert cache.lookup(("getBatchRoot", 1)) == (False, None)
+
+    token = cache.snapshot()
+    cache.invalidate([("getRecordHash", 1)])
+    cache.store(("getRecordHash", 1), "stale", token)
+    assert cache.lookup(("getRecordHash", 1)) == (False, None)
+
+
+def test_put_writes_through_and_keeps_the_later_value():
+    cache, _ = cache_with_head(1)
+    cache.put(("getRecordHash", 1), "new", 3)
+    cache.put(("getRecordHash", 1), "old", 2)
+    assert cache.lookup(("getRecordHash", 1)) == (True, "new")
+    # two writes in one block: the order is unknown, nothing is served
+    cache.put(("getRecordHash", 1), "other", 3)
+    assert cache.lookup(("getRecordHash", 1)) == (False, None)
+
+
+def test_size_limits():
+    cache, _ = cache_with_head(1, maxsize=2)
+    for i in range(3):
+        cache.get(("getRecordHash", i), lambda: str(i))
+    assert cache.stats()["size"] == 2 and cache.stats()["evictions"] == 1
+    assert cache.lookup(("getRecordHash", 0)) == (False, None)
+
+    disabled, _ = cache_with_head(1, maxsize=0)
+    disabled.get("k", lambda: 1)
+    assert disabled.lookup("k") == (False, None)
+
+    lru = LRUCache(2)
+    lru.put(1, "a")
+    lru.put(2, "b")
+    lru.get(1)
+    lru.put(3, "c")
+    assert (lru.get(1), lru.get(2), lru.get(3)) == ("a", None, "c")
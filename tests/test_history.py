@@ -0,0 +1,53 @@
+"""/history from the provenance log, and the chain fallback over the event index plus unindexed blocks."""
+from conftest import add_records, app_module as m
+
+
+def drop_provenance(app, record_id):
+    with app.app_context():
+        m.ProvenanceHead.query.filter_by(record_pk=str(record_id)).delete()
+        m.ProvenanceLog.query.filter_by(record_pk=str(record_id)).delete()
+        m.db.session.commit()
+
+
+def test_history_from_database(client):
+    [record_id] = add_records(client, "v1")
+    client.put(f"/update/{record_id}", json={"data": "v2", "user": "bob"})
+    body = client.get(f"/history/{record_id}").get_json()
+    assert body["source"] == "database"
+    assert [h["operation"] for h in body["history"]] == ["I", "U"]
+    assert body["history"][1]["payload"]["new"]["data"] == "v2"
+
+
+def test_chain_fallback_reads_unindexed_blocks_without_writing(app, client):
+    [record_id, _] = add_records(client, "v1", "x")
+    client.put(f"/update/{record_id}", json={"data": "v2", "user": "bob"})
+    drop_provenance(app, record_id)
+
+    body = client.get(f"/history/{record_id}").get_json()
+    assert body["source"] == "blockchain"
+    assert [h["operation"] for h in body["history"]] == ["INSERT", "UPDATE"]
+    assert {h["recordId"] for h in body["history"]} == {record_id}
+    assert body["indexed_to_block"] is None and body["index_lag"] == 4   # blocks 0..3
+    with app.app_context():
+        assert m.ChainEvent.query.count() == 0 and m.IndexerCheckpoint.query.count() == 0
+
+
+def test_chain_fallback_combines_index_and_live_tail(app, client):
+    [record_id] = add_records(client, "v1")
+    with app.app_context():
+        m.index_chain_events()
+    client.put(f"/update/{record_id}", json={"data": "v2", "user": "bob"})
+    drop_provenance(app, record_id)
+
+    body = client.get(f"/history/{record_id}").get_json()
+    assert [h["operation"] for h in body["history"]] == ["INSERT", "UPDATE"]
+    assert (body["indexed_to_block"], body["index_lag"]) == (1, 1)
+
+    with app.app_context():
+        m.index_chain_events()
+    body = client.get(f"/history/{record_id}").get_json()
+    assert body["count"] == 2 and body["index_lag"] == 0
+
+
+def test_unknown_record_is_404(client):
+    assert client.get("/history/99").status_code == 404
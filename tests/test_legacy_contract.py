@@ -0,0 +1,92 @@
+"""hash_codec.py, and verification of anchors made on the legacy Provenance.sol after switching to ProvenanceV2."""
+import hashlib
+
+import pytest
+
+import hash_codec
+from conftest import LEGACY_ADDRESS, PROVENANCE_ABI, PROVENANCE_V2_ABI, MockProvenanceChain, add_records, app_module as m
+
+HEX = hashlib.sha256(b"entry").hexdigest()
+
+
+def test_bytes32_round_trip():
+    raw = hash_codec.to_bytes32(HEX)
+    assert len(raw) == 32 and hash_codec.from_bytes32(raw) == HEX
+    assert hash_codec.to_bytes32("0x" + HEX) == raw
+    assert hash_codec.from_bytes32(hash_codec.ZERO_HASH) == ""
+    with pytest.raises(ValueError):
+        hash_codec.to_bytes32(HEX[:62])
+
+
+def test_decode_either_contract_generation():
+    assert hash_codec.decode(HEX) == HEX
+    assert hash_codec.decode(hash_codec.to_bytes32(HEX)) == HEX
+    assert hash_codec.decode(bytearray(hash_codec.to_bytes32(HEX))) == HEX
+    assert hash_codec.decode("") == hash_codec.decode(None) == hash_codec.decode(bytes(32)) == ""
+
+
+def test_format_from_the_abi():
+    assert hash_codec.hash_format(PROVENANCE_ABI) == hash_codec.STRING
+    assert hash_codec.hash_format(PROVENANCE_V2_ABI) == hash_codec.BYTES32
+    assert hash_codec.hash_format([]) == hash_codec.STRING
+    assert hash_codec.HashCodec(PROVENANCE_V2_ABI).encode(HEX) == hash_codec.to_bytes32(HEX)
+    assert hash_codec.HashCodec(PROVENANCE_ABI).encode(HEX) == HEX
+
+
+@pytest.fixture
+def chain():
+    """ProvenanceV2 at the default address, the previous Provenance.sol at LEGACY_ADDRESS."""
+    chain = MockProvenanceChain(hash_format="bytes32")
+    chain.deploy(LEGACY_ADDRESS, "string")
+    return chain
+
+
+@pytest.fixture
+def anchored_on_v1(make_app):
+    """Records anchored one by one and in a Merkle batch, and a blob record, all on the legacy contract."""
+    client = make_app(CONTRACT_ADDRESS=LEGACY_ADDRESS, CONTRACT_ABI=PROVENANCE_ABI).test_client()
+    keyed = add_records(client, "a", "b")
+    body = client.post("/add_bulk", json={"user": "alice", "items": [{"data": "c"}, {"data": "d"}]}).get_json()
+    batched = [r["id"] for r in body["results"]]
+    blob = client.post("/blobs?name=a.txt&user=alice", data=b"content").get_json()["id"]
+    assert client.post("/verify_bulk", json={"ids": keyed + batched}).get_json()["verified"] == 4
+    return keyed, batched, blob
+
+
+def v2_client(make_app, legacy=True):
+    config = {"CONTRACT_LEGACY_ADDRESS": LEGACY_ADDRESS, "CONTRACT_LEGACY_ABI": PROVENANCE_ABI} if legacy else {}
+    return make_app(CONTRACT_ABI=PROVENANCE_V2_ABI, **config).test_client()
+
+
+def app_sweep(client):
+    app = client.application
+    with app.app_context():
+        run = m.run_sweep(m.start_sweep_run(full=True, lease=False), 1)
+        return {"checked": run.checked, "findings": run.findings}
+
+
+def test_v1_anchors_verify_after_switching_to_v2(make_app, chain, anchored_on_v1):
+    keyed, batched, blob = anchored_on_v1
+    client = v2_client(make_app)
+    for record_id in keyed + batched:
+        result = client.get(f"/verify/{record_id}").get_json()
+        assert result["verified"] is True, result
+    assert client.get(f"/verify/{blob}?table=blob_record").get_json()["verified"] is True
+    assert client.post("/verify_bulk", json={"ids": keyed + batched}).get_json()["verified"] == 4
+
+    # new anchors go to V2; both generations verify side by side
+    [new] = add_records(client, "e")
+    client.put(f"/update/{batched[0]}", json={"data": "c2", "user": "bob"})
+    assert chain.contracts[m.CONTRACT_ADDRESS].record_hashes.keys() == {new, batched[0]}
+    assert client.post("/verify_bulk", json={"ids": keyed + batched + [new]}).get_json()["verified"] == 5
+
+    result = app_sweep(client)
+    assert (result["checked"], result["findings"]) == (6, 0)
+
+
+def test_batch_roots_are_only_on_the_legacy_contract(make_app, anchored_on_v1):
+    keyed, batched, blob = anchored_on_v1
+    client = v2_client(make_app, legacy=False)
+    results = client.post("/verify_bulk", json={"ids": keyed + batched}).get_json()["results"]
+    assert {r["reason"] for r in results} == {m.VERIFICATION_REASONS["no_onchain_hash"]}
+    assert client.get(f"/verify/{blob}?table=blob_record").get_json()["verified"] is False
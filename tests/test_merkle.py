@@ -0,0 +1,112 @@
+"""merkle.py proofs, ANCHOR_MODE=merkle round trips and anchorBatch() access control."""
+import hashlib
+
+import pytest
+
+import merkle
+from conftest import add_records, app_module as m
+from mock_chain import CONTRACT_ADDRESS
+
+
+def leaves(n):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 7, 8, 9, 33])
+def test_every_proof_verifies_against_the_root(n):
+    hashes = leaves(n)
+    root, proofs = merkle.build_tree(hashes)
+    assert root == merkle.merkle_root(hashes)
+    for leaf, proof in zip(hashes, proofs):
+        assert merkle.verify_proof(leaf, proof, root)
+        assert merkle.verify_proof(leaf, proof, "0x" + root.upper())
+
+
+def test_proof_rejects_other_leaves_and_roots():
+    hashes = leaves(5)
+    root, proofs = merkle.build_tree(hashes)
+    assert not merkle.verify_proof(hashes[1], proofs[0], root)
+    assert not merkle.verify_proof(hashes[0], proofs[0], merkle.merkle_root(leaves(6)))
+    flipped = [["R" if side == "L" else "L", sibling] for side, sibling in proofs[0]]
+    assert not merkle.verify_proof(hashes[0], flipped, root)
+    assert not merkle.verify_proof("not hex", proofs[0], root)
+
+
+def test_leaf_cannot_pose_as_inner_node():
+    hashes = leaves(2)
+    root, _ = merkle.build_tree(hashes)
+    inner = hashlib.sha256(merkle.LEAF_PREFIX + bytes.fromhex(hashes[0])).hexdigest()
+    assert not merkle.verify_proof(inner, [["R", hashlib.sha256(merkle.LEAF_PREFIX + bytes.fromhex(hashes[1])).hexdigest()]], root)
+
+
+def test_empty_tree_is_an_error():
+    with pytest.raises(ValueError):
+        merkle.build_tree([])
+
+
+@pytest.fixture
+def merkle_mode(monkeypatch):
+    monkeypatch.setattr(m, "ANCHOR_MODE", "merkle")
+    monkeypatch.setattr(m, "ANCHOR_MERKLE_WINDOW_SECONDS", 0.0)
+
+
+def test_merkle_batch_round_trip(app, client, chain, merkle_mode):
+    ids = add_records(client, "a", "b", "c")
+    assert client.get(f"/verify/{ids[0]}").get_json()["verified"] is False
+
+    with app.app_context():
+        assert m.drain_merkle_once() == 1
+        batch = m.AnchorBatch.query.one()
+        assert (batch.anchor_status, batch.leaf_count) == ("anchored", 3)
+    assert chain.contracts[CONTRACT_ADDRESS].batch_roots[batch.batch_id].hex() == batch.merkle_root
+
+    for record_id in ids:
+        body = client.get(f"/verify/{record_id}").get_json()
+        assert body["verified"] is True, body
+    assert client.post("/verify_bulk", json={"ids": ids}).get_json()["verified"] == 3
+
+    client.put(f"/tamper/{ids[1]}")
+    assert client.get(f"/verify/{ids[1]}").get_json()["verified"] is False
+
+
+def test_only_anchorers_may_anchor(chain):
+    outsider = chain.accounts[1]
+    with pytest.raises(ValueError, match="not an anchorer"):
+        chain.transact("anchorBatch", (1, b"\1" * 32, 1), {"from": outsider})
+    with pytest.raises(ValueError, match="not the owner"):
+        chain.transact("setAnchorer", (outsider, True), {"from": outsider})
+
+    chain.transact("setAnchorer", (outsider, True), {"from": chain.accounts[0]})
+    chain.transact("anchorBatch", (1, b"\1" * 32, 1), {"from": outsider})
+    # the same root again is accepted, a different one is not
+    chain.transact("anchorBatch", (1, b"\1" * 32, 1), {"from": outsider})
+    with pytest.raises(ValueError, match="batch already anchored"):
+        chain.transact("anchorBatch", (1, b"\2" * 32, 1), {"from": outsider})
+
+
+def test_retry_of_an_already_anchored_batch_succeeds(app, client, chain, merkle_mode, monkeypatch):
+    add_records(client, "a", "b")
+    transact = chain.transact
+
+    def lost_receipt(name, args, tx, address=CONTRACT_ADDRESS):
+        # the transaction went through but the app never saw it succeed
+        transact(name, args, tx, address)
+        raise ValueError("connection reset")
+
+    monkeypatch.setattr(chain, "transact", lost_receipt)
+    with app.app_context():
+        m.drain_merkle_once()
+        batch = m.AnchorBatch.query.one()
+        assert batch.anchor_status == "pending"
+
+    def old_contract(name, args, tx, address=CONTRACT_ADDRESS):
+        # deployments from before the idempotent anchorBatch() revert instead
+        raise ValueError("execution reverted: batch already anchored")
+
+    monkeypatch.setattr(chain, "transact", old_contract)
+    with app.app_context():
+        m.AnchorBatch.query.update({"anchor_next_at": m.datetime.now(m.timezone.utc)})
+        m.db.session.commit()
+        assert m.drain_batches_once() == 1
+        assert m.db.session.get(m.AnchorBatch, batch.batch_id).anchor_status == "anchored"
+    assert client.get("/verify/1").get_json()["verified"] is True
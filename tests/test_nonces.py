@@ -0,0 +1,109 @@
+"""Local nonce allocation: nonce_manager.NonceManager and how send_transactions() recovers from failures."""
+import pytest
+from sqlalchemy import BigInteger, Column, DateTime, MetaData, String, Table, create_engine
+
+import nonce_manager
+from conftest import add_records, app_module as m
+
+ACCOUNT = "0x" + "11" * 20
+
+
+@pytest.fixture
+def nonces(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nonces.db'}")
+    table = Table(
+        "sender_nonce", MetaData(),
+        Column("account", String(42), primary_key=True),
+        Column("next_nonce", BigInteger, nullable=False),
+        Column("updated_at", DateTime(timezone=True)),
+    )
+    table.metadata.create_all(engine)
+    chain_count = {ACCOUNT: 0}
+    manager = nonce_manager.NonceManager(lambda: engine, table, chain_count.__getitem__)
+    manager.chain_count = chain_count
+    return manager
+
+
+def test_allocations_are_consecutive_and_start_at_the_chain_count(nonces):
+    nonces.chain_count[ACCOUNT] = 4
+    assert nonces.allocate(ACCOUNT, 3) == [4, 5, 6]
+    assert nonces.allocate(ACCOUNT) == [7]
+    assert nonces.snapshot() == {ACCOUNT: 8}
+
+
+def test_release_only_without_later_allocations(nonces):
+    nonces.allocate(ACCOUNT, 3)                  # 0..2, 1 and 2 never sent
+    assert nonces.release(ACCOUNT, 1, 3)
+    assert nonces.allocate(ACCOUNT) == [1]
+
+    nonces.allocate(ACCOUNT, 2)                  # 2..3
+    nonces.allocate(ACCOUNT)                     # 4, another thread
+    assert not nonces.release(ACCOUNT, 2, 4)
+    assert nonces.snapshot() == {ACCOUNT: 5}
+
+
+def test_resync_never_rewinds_below_other_allocations(nonces):
+    nonces.allocate(ACCOUNT, 2)                  # ours: 0..1
+    nonces.allocate(ACCOUNT, 2)                  # someone else's: 2..3
+    nonces.chain_count[ACCOUNT] = 1
+    assert nonces.resync(ACCOUNT, allocated_to=2) == 4
+    # forward moves are always safe
+    nonces.chain_count[ACCOUNT] = 9
+    assert nonces.resync(ACCOUNT, allocated_to=2) == 9
+    # the caller's own allocation is the last one: rewind to the chain
+    nonces.allocate(ACCOUNT, 2)                  # 9..10
+    nonces.chain_count[ACCOUNT] = 10
+    assert nonces.resync(ACCOUNT, allocated_to=11) == 10
+    # a dropped transaction rewinds regardless
+    nonces.allocate(ACCOUNT, 5)
+    assert nonces.resync(ACCOUNT, force=True) == 10
+
+
+def test_nonce_error_classes():
+    assert nonce_manager.is_nonce_error(ValueError("Nonce too low. Expected nonce to be 3 but got 1."))
+    assert nonce_manager.is_nonce_error(ValueError("replacement transaction underpriced"))
+    assert nonce_manager.is_nonce_gap(ValueError("Nonce too high. Expected 1 got 3"))
+    assert not nonce_manager.is_nonce_error(ValueError("execution reverted: empty root"))
+
+
+@pytest.fixture
+def local_nonces(monkeypatch):
+    monkeypatch.setattr(m, "ANCHOR_MODE", "async")
+    monkeypatch.setattr(m, "ANCHOR_LOCAL_NONCES", "1")
+    monkeypatch.setattr(m, "NONCE_GAP_RETRIES", 1)
+
+
+def test_failed_send_hands_unsent_nonces_back(app, client, chain, local_nonces, monkeypatch):
+    add_records(client, "a", "b", "c")
+    transact = chain.transact
+    sent = []
+
+    def revert_second(name, args, tx, address=m.CONTRACT_ADDRESS):
+        if len(sent) == 1:
+            sent.append(None)
+            raise ValueError("execution reverted: boom")
+        sent.append(tx["nonce"])
+        return transact(name, args, tx, address)
+
+    monkeypatch.setattr(chain, "transact", revert_second)
+    with app.app_context():
+        m.drain_outbox_once()
+        sender = m.anchor_senders()[0]
+        # nonce 0 went out; 1 failed and 2 was never sent: both are free again
+        assert chain.nonces[sender] == 1
+        assert m.get_chain().nonces.snapshot()[sender] == 1
+
+
+def test_rejected_nonce_resyncs_from_the_chain(app, client, chain, local_nonces):
+    add_records(client, "a")
+    with app.app_context():
+        sender = m.anchor_senders()[0]
+        m.get_chain().nonces.allocate(sender)   # initialize the counter at the chain count (0)
+        chain.nonces[sender] = 5                # the account was used elsewhere
+        m.drain_outbox_once()
+        assert m.get_chain().nonces.snapshot()[sender] == 5
+        m.ProvenanceLog.query.update({"anchor_next_at": m.datetime.now(m.timezone.utc)})
+        m.db.session.commit()
+        m.drain_outbox_once()
+        m.track_receipts_once()
+        assert m.ProvenanceLog.query.one().anchor_status == "anchored"
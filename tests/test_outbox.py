@@ -0,0 +1,134 @@
+"""Outbox anchoring: pending -> submitting -> sent -> anchored, retries, give-up and supersede."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import add_records, app_module as m
+
+
+@pytest.fixture
+def async_mode(monkeypatch):
+    monkeypatch.setattr(m, "ANCHOR_MODE", "async")
+    monkeypatch.setattr(m, "ANCHOR_BACKOFF_SECONDS", 0.0)
+
+
+def status(log_id):
+    return m.db.session.get(m.ProvenanceLog, log_id).anchor_status
+
+
+def make_due():
+    """Pull every backoff forward so the next drain picks the rows up."""
+    m.ProvenanceLog.query.filter(m.ProvenanceLog.anchor_next_at.isnot(None)).update(
+        {"anchor_next_at": datetime.now(timezone.utc) - timedelta(seconds=1)})
+    m.db.session.commit()
+
+
+def test_async_row_is_sent_then_anchored(app, client, async_mode):
+    resp = client.post("/add", json={"data": "a", "user": "alice"}).get_json()
+    assert resp["anchor_status"] == "pending" and resp["blockchain_tx"] is None
+
+    with app.app_context():
+        assert m.drain_outbox_once() == 1
+        assert status(resp["prov_log_id"]) == "sent"
+        assert m.track_receipts_once() == 1
+        prov = m.db.session.get(m.ProvenanceLog, resp["prov_log_id"])
+        assert prov.anchor_status == "anchored" and prov.blockchain_tx
+
+    assert client.get(f"/verify/{resp['id']}").get_json()["verified"] is True
+
+
+def test_failed_send_is_retried_with_backoff(app, client, chain, async_mode, monkeypatch):
+    [record_id] = add_records(client, "a")
+    transact = chain.transact
+    failures = iter([ValueError("execution reverted: boom")])
+
+    def flaky(*args, **kwargs):
+        for error in failures:
+            raise error
+        return transact(*args, **kwargs)
+
+    monkeypatch.setattr(chain, "transact", flaky)
+    with app.app_context():
+        m.drain_outbox_once()
+        prov = m.latest_provenances([str(record_id)])[str(record_id)]
+        assert (prov.anchor_status, prov.anchor_attempts) == ("pending", 1)
+        assert "boom" in prov.anchor_error
+
+        make_due()
+        m.drain_outbox_once()
+        m.track_receipts_once()
+        assert status(prov.log_id) == "anchored"
+
+
+def test_gives_up_after_max_attempts_and_cli_requeues(app, client, chain, async_mode, monkeypatch):
+    monkeypatch.setattr(m, "ANCHOR_MAX_ATTEMPTS", 2)
+    [record_id] = add_records(client, "a")
+    transact = chain.transact
+
+    def down(*args, **kwargs):
+        raise ValueError("execution reverted: down")
+
+    monkeypatch.setattr(chain, "transact", down)
+    with app.app_context():
+        for _ in range(2):
+            make_due()
+            m.drain_outbox_once()
+        log_id = m.latest_provenances([str(record_id)])[str(record_id)].log_id
+        assert status(log_id) == "failed"
+
+    monkeypatch.setattr(chain, "transact", transact)
+    assert "Re-queued 1 provenance rows" in app.test_cli_runner().invoke(args=["anchor-retry"]).output
+    with app.app_context():
+        m.drain_outbox_once()
+        m.track_receipts_once()
+        assert status(log_id) == "anchored"
+
+
+def test_older_entry_is_superseded_by_anchored_newer_one(app, client, chain, async_mode):
+    [record_id] = add_records(client, "v1")
+    with app.app_context():
+        first = m.latest_provenances([str(record_id)])[str(record_id)].log_id
+        # the first entry gave up while the chain was down
+        m.db.session.get(m.ProvenanceLog, first).anchor_status = "failed"
+        m.db.session.commit()
+
+    client.put(f"/update/{record_id}", json={"data": "v2", "user": "alice"})
+    with app.app_context():
+        m.drain_outbox_once()
+        m.track_receipts_once()
+        second = m.latest_provenances([str(record_id)])[str(record_id)].log_id
+        assert status(second) == "anchored"
+
+    app.test_cli_runner().invoke(args=["anchor-retry"])
+    with app.app_context():
+        m.drain_outbox_once()
+        assert status(first) == "superseded"
+    # the contract still holds the newer hash
+    assert client.get(f"/verify/{record_id}").get_json()["verified"] is True
+
+
+def test_outbox_endpoint_reports_states(app, client, async_mode):
+    add_records(client, "a", "b")
+    body = client.get("/outbox").get_json()
+    assert body["mode"] == "async"
+    assert body["counts"]["pending"] == 2
+    assert body["oldest_pending"]["record_pk"] == "1"
+
+    with app.app_context():
+        m.drain_outbox_once()
+        m.track_receipts_once()
+    body = client.get("/outbox").get_json()
+    # settled rows are not counted, open states are reported even at zero
+    assert body["counts"] == dict.fromkeys(m.OPEN_STATES, 0)
+    assert body["oldest_pending"] is None
+
+
+def test_metrics_gauge_follows_the_backlog(app, client, async_mode):
+    add_records(client, "a", "b")
+    assert 'provenance_outbox_rows{status="pending"} 2' in client.get("/metrics").get_data(as_text=True)
+    with app.app_context():
+        m.drain_outbox_once()
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'provenance_outbox_rows{status="pending"} 0' in text
+    assert 'provenance_outbox_rows{status="sent"} 2' in text
+    assert 'status="anchored"' not in text.split("provenance_outbox_rows", 1)[1].split("# HELP", 1)[0]
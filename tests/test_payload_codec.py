@@ -0,0 +1,110 @@
+"""payload_codec.py diffs and compression, and diff/zlib payloads stored and read back through the app."""
+import pytest
+
+import payload_codec
+from conftest import add_records, app_module as m
+
+OLD = {"id": 1, "data": "v1", "tags": ["a"], "gone": True}
+NEW = {"id": 1, "data": "v2", "tags": ["a"], "added": None}
+
+
+def test_field_diff_round_trip():
+    diff = payload_codec.field_diff(OLD, NEW)
+    assert diff == {"set": {"data": "v2", "added": None}, "unset": ["gone"]}
+    assert payload_codec.apply_field_diff(OLD, diff) == NEW
+    assert payload_codec.field_diff(NEW, NEW) == {}
+
+
+@pytest.mark.parametrize("operation,payload", [
+    ("U", {"old": OLD, "new": NEW}),
+    ("D", {"deleted": OLD}),
+])
+def test_encode_decode_diff(operation, payload):
+    base_state = dict(OLD, data="v0")
+    doc = payload_codec.encode_diff(operation, payload, base_state, 7, 3, 2)
+    assert (doc["base"], doc["root"], doc["depth"]) == (7, 3, 2)
+    assert payload_codec.decode_diff(operation, doc, base_state) == payload
+
+
+def test_payloads_that_cannot_be_diffed_losslessly_stay_full():
+    assert payload_codec.encode_diff("I", {"new": NEW}, OLD, 1, 1, 1) is None
+    assert payload_codec.encode_diff("U", {"new": NEW}, OLD, 1, 1, 1) is None
+    assert payload_codec.encode_diff("U", {"old": OLD, "new": NEW}, None, 1, 1, 1) is None
+    # 1 == True in Python, but the JSON (and so the hash) differs
+    assert payload_codec.encode_diff("U", {"old": {"x": 1}, "new": {"x": 1}}, {"x": True}, 1, 1, 1) is None
+
+
+def test_missing_base_is_unavailable():
+    with pytest.raises(payload_codec.PayloadUnavailable):
+        payload_codec.decode_diff("U", {"base": 4, "old": {}, "new": {}}, None)
+
+
+def test_compression_and_encoding_names():
+    doc = {"old": OLD, "new": NEW}
+    assert payload_codec.decompress(payload_codec.compress(doc)) == doc
+    assert payload_codec.stored_document("diff+zlib", None, payload_codec.compress(doc)) == doc
+    assert payload_codec.stored_document(None, doc, None) == doc
+    assert payload_codec.is_diff("diff+zlib") and not payload_codec.is_diff("json+zlib")
+    assert payload_codec.is_compressed("json+zlib") and not payload_codec.is_compressed("diff")
+    assert not payload_codec.is_diff(None) and not payload_codec.is_compressed(None)
+
+
+@pytest.fixture
+def diff_mode(monkeypatch):
+    monkeypatch.setattr(m, "PROVENANCE_PAYLOAD_ENCODING", "diff")
+    monkeypatch.setattr(m, "PROVENANCE_SNAPSHOT_EVERY", 3)
+
+
+def edit_history(client, record_id, versions):
+    for value in versions:
+        assert client.put(f"/update/{record_id}", json={"data": value, "user": "bob"}).status_code == 200
+
+
+def encodings(app, record_id):
+    with app.app_context():
+        return [p.payload_encoding for p in
+                m.ProvenanceLog.query.filter_by(record_pk=str(record_id)).order_by(m.ProvenanceLog.log_id)]
+
+
+def test_diff_encoded_history_reads_back_in_full(app, client, diff_mode):
+    payload = "x" * 200   # large enough for a diff to be smaller than the snapshot
+    [record_id] = add_records(client, payload)
+    edit_history(client, record_id, [payload + str(i) for i in range(5)])
+    assert client.delete(f"/delete/{record_id}", json={"user": "bob"}).status_code == 200
+
+    # a full snapshot every PROVENANCE_SNAPSHOT_EVERY entries bounds the replay
+    assert encodings(app, record_id) == [None, "diff", "diff", None, "diff", "diff", None]
+
+    history = client.get(f"/history/{record_id}").get_json()["history"]
+    news = [h["payload"]["new"]["data"] for h in history if h["operation"] == "U"]
+    assert news == [payload + str(i) for i in range(5)]
+    assert history[2]["payload"]["old"]["data"] == payload + "0"
+    assert history[-1]["payload"]["deleted"]["data"] == payload + "4"
+
+
+def test_compacted_payloads_still_verify(app, client, diff_mode):
+    payload = "y" * 200
+    [record_id] = add_records(client, payload)
+    edit_history(client, record_id, [payload + "1", payload + "2"])
+    before = client.get(f"/history/{record_id}").get_json()["history"]
+
+    result = app.test_cli_runner().invoke(args=["compact-payloads", "--older-than-days", "-1"])
+    assert "Compressed 3 provenance payloads" in result.output
+    assert encodings(app, record_id) == ["json+zlib", "diff+zlib", "diff+zlib"]
+    with app.app_context():
+        assert all(p.payload is None and p.payload_blob for p in m.ProvenanceLog.query)
+
+    assert client.get(f"/history/{record_id}").get_json()["history"] == before
+    assert client.get(f"/verify/{record_id}").get_json()["verified"] is True
+
+
+def test_missing_diff_base_is_reported_not_raised(app, client, diff_mode):
+    payload = "z" * 200
+    [record_id] = add_records(client, payload)
+    edit_history(client, record_id, [payload + "1"])
+    with app.app_context():
+        first = m.ProvenanceLog.query.filter_by(record_pk=str(record_id)).order_by(m.ProvenanceLog.log_id).first()
+        m.db.session.delete(first)
+        m.db.session.commit()
+        latest = m.latest_provenances([str(record_id)])[str(record_id)]
+        assert latest.payload_encoding == "diff" and m.entry_payload(latest) is None
@@ -0,0 +1,34 @@
+"""/records keyset pages and streaming."""
+import json
+
+from conftest import add_records
+
+
+def test_keyset_pages_cover_every_record_once(client):
+    ids = add_records(client, *[f"r{i}" for i in range(7)])
+    seen, after = [], None
+    while True:
+        query = "/records?limit=3" + (f"&after={after}" if after is not None else "")
+        body = client.get(query).get_json()
+        seen += [r["id"] for r in body["records"]]
+        after = body["next_after"]
+        if after is None:
+            break
+    assert seen == ids
+
+
+def test_page_after_deleted_id_keeps_going(client):
+    ids = add_records(client, "a", "b", "c", "d")
+    client.delete(f"/delete/{ids[1]}", json={"user": "alice"})
+    body = client.get(f"/records?limit=2&after={ids[0]}").get_json()
+    assert [r["id"] for r in body["records"]] == ids[2:]
+    assert body["next_after"] is None
+
+
+def test_stream_as_array_and_ndjson(client):
+    ids = add_records(client, "a", "b", "c")
+    assert [r["id"] for r in client.get("/records").get_json()] == ids
+
+    resp = client.get(f"/records?format=ndjson&after={ids[0]}")
+    assert resp.mimetype == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in resp.get_data(as_text=True).splitlines()] == ids[1:]
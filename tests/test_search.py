@@ -0,0 +1,64 @@
+"""/provenance/search filters, keyset pages and bounded counts."""
+from conftest import add_records, app_module as m
+
+
+def search(client, query):
+    resp = client.get(f"/provenance/search?{query}")
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()
+
+
+def seed(client):
+    ids = add_records(client, "a", "b", "c")
+    add_records(client, "d", user="bob")
+    client.put(f"/update/{ids[0]}", json={"data": "a2", "user": "bob"})
+    client.get(f"/verify/{ids[1]}")
+    return ids
+
+
+def test_filters_and_pages(client):
+    seed(client)
+    assert [e["log_id"] for e in search(client, "user=bob")["entries"]] == [5, 4]
+    assert [e["log_id"] for e in search(client, "verified=1")["entries"]] == [2]
+    assert [e["log_id"] for e in search(client, "verified=0&user=alice")["entries"]] == [3, 1]
+
+    seen, query = [], "operation=I&order=asc&limit=3"
+    while query:
+        body = search(client, query)
+        seen += [e["log_id"] for e in body["entries"]]
+        query = f"cursor={body['next_cursor']}" if body["next_cursor"] else None
+    assert seen == [1, 2, 3, 4]
+
+
+def test_counts_are_bounded(client, monkeypatch):
+    seed(client)
+    assert search(client, "count=1&user=alice") == {"filters": {"user": "alice"}, "count": 3, "exact": True}
+    monkeypatch.setattr(m, "SEARCH_COUNT_LIMIT", 2)
+    assert search(client, "count=1&user=alice")["count"] == 3
+    assert search(client, "count=1")["exact"] is False
+    assert search(client, "count=1&verified=1") == {"filters": {"verified": True}, "count": 1, "exact": True}
+
+
+def test_group_by_covers_the_newest_matches(client, monkeypatch):
+    seed(client)
+    body = search(client, "group_by=user")
+    assert (body["exact"], body["groups"]) == (True, [{"key": "alice", "count": 3}, {"key": "bob", "count": 2}])
+    assert [g["count"] for g in search(client, "group_by=day")["groups"]] == [5]
+
+    monkeypatch.setattr(m, "SEARCH_COUNT_LIMIT", 1)
+    body = search(client, "group_by=operation")
+    # the newest two rows (limit + 1) are the update and bob's insert
+    assert (body["exact"], body["groups"]) == (False, [{"key": "I", "count": 1}, {"key": "U", "count": 1}])
+    assert client.get("/provenance/search?group_by=color").status_code == 400
+
+
+def test_verified_filter_uses_an_index(app):
+    with app.app_context():
+        m.ensure_schema()
+        for filters, index in (({"verified": True}, "ix_provenance_log_verified"),
+                               ({"verified": True, "user": "a"}, "ix_provenance_log_user_verified")):
+            stmt = (m.db.select(m.ProvenanceLog.log_id).where(*m.filter_conditions(filters))
+                    .order_by(m.ProvenanceLog.created_at.desc(), m.ProvenanceLog.log_id.desc()).limit(10))
+            sql = stmt.compile(dialect=m.db.engine.dialect, compile_kwargs={"literal_binds": True})
+            plan = " ".join(row[-1] for row in m.db.session.execute(m.db.text(f"EXPLAIN QUERY PLAN {sql}")))
+            assert index in plan and "TEMP B-TREE" not in plan, plan
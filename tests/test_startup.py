@@ -0,0 +1,79 @@
+"""create_app(): readiness with and without a live outbox worker, and where background threads start."""
+import os
+
+import click
+import pytest
+
+from conftest import app_module as m
+
+
+def test_ready_needs_a_live_outbox_worker(app, client):
+    body = client.get("/ready").get_json()
+    assert client.get("/ready").status_code == 503
+    assert body["checks"]["database"]["ok"] and body["checks"]["chain"]["ok"]
+    assert body["checks"]["outbox_worker"] == {"ok": False, "local_threads": 0, "last_heartbeat": None}
+
+    # a worker in another process checked in
+    with app.app_context():
+        m.last_heartbeats.clear()
+        m.heartbeat("anchor")
+    resp = client.get("/ready")
+    assert resp.status_code == 200, resp.get_json()
+    assert resp.get_json()["checks"]["outbox_worker"]["last_heartbeat"]
+
+
+def test_stale_heartbeat_is_not_ready(app, client, monkeypatch):
+    with app.app_context():
+        m.ensure_schema()
+        m.last_heartbeats.clear()
+        m.heartbeat("anchor")
+    monkeypatch.setattr(m, "WORKER_HEARTBEAT_STALE_SECONDS", -1)
+    assert client.get("/ready").status_code == 503
+
+
+def run_in(command, **params):
+    with click.Context(click.Command(command), info_name=command) as ctx:
+        ctx.params.update(params)
+        return m.serving_process()
+
+
+def test_serving_process_guard(monkeypatch):
+    assert m.serving_process()                          # WSGI server / script
+    assert not run_in("anchor-retry")                   # CLI command
+    assert run_in("run", reload=False)
+    monkeypatch.delenv("WERKZEUG_RUN_MAIN", raising=False)
+    assert not run_in("run", reload=True)               # reloader's watcher process
+    monkeypatch.setenv("WERKZEUG_RUN_MAIN", "true")
+    assert run_in("run", reload=True)                   # its serving child
+
+
+@pytest.fixture
+def fresh_background(monkeypatch, tmp_path):
+    started = []
+    monkeypatch.setattr(m, "background_leader", None)
+    monkeypatch.setattr(m, "background_lock", None)
+    monkeypatch.setattr(m, "start_background_threads", started.append)
+    return started
+
+
+def test_create_app_starts_background_threads_once(make_app, fresh_background, tmp_path):
+    app = make_app(BACKGROUND_WORKERS=True, BACKGROUND_LOCK_FILE=str(tmp_path / "bg.lock"))
+    make_app(BACKGROUND_WORKERS=True, BACKGROUND_LOCK_FILE=str(tmp_path / "bg.lock"))
+    m.background_leader.join(5)
+    assert fresh_background == [app]
+    if m.fcntl is not None:
+        os.close(m.background_lock)
+
+
+@pytest.mark.skipif(m.fcntl is None, reason="needs flock")
+def test_second_process_waits_for_the_lock(tmp_path, monkeypatch):
+    path = str(tmp_path / "bg.lock")
+    monkeypatch.setattr(m, "background_lock", None)
+    assert m.take_background_lock(path)
+    held = m.background_lock
+    # another process: its own descriptor cannot take the lock
+    monkeypatch.setattr(m, "background_lock", None)
+    assert not m.take_background_lock(path)
+    os.close(held)
+    assert m.take_background_lock(path)
+    os.close(m.background_lock)
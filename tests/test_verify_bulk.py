@@ -0,0 +1,23 @@
+"""/verify_bulk by id list and by id range, and its request limits."""
+from conftest import add_records, app_module as m
+
+
+def test_range_and_list_give_the_same_results(client):
+    ids = add_records(client, "a", "b", "c")
+    by_range = client.get(f"/verify_bulk?from_id={ids[0]}&to_id={ids[-1]}").get_json()
+    by_list = client.post("/verify_bulk", json={"ids": ids}).get_json()
+    assert [r["record_id"] for r in by_range["results"]] == ids
+    assert by_range["verified"] == by_list["verified"] == 3
+
+
+def test_oversized_range_is_rejected_before_it_is_built(client, monkeypatch):
+    # a list of 30 billion ids would not fit in memory
+    assert client.get("/verify_bulk?from_id=1&to_id=30000000000").status_code == 413
+    monkeypatch.setattr(m, "VERIFY_BULK_MAX", 10)
+    assert client.post("/verify_bulk", json={"from_id": 1, "to_id": 11}).status_code == 413
+    assert client.post("/verify_bulk", json={"from_id": 1, "to_id": 10}).status_code == 200
+
+
+def test_invalid_ranges_are_400(client):
+    for query in ("from_id=5&to_id=1", "from_id=a&to_id=3", "from_id=1&to_id=", "from_id=1"):
+        assert client.get(f"/verify_bulk?{query}").status_code == 400, query